@@ -1,13 +1,35 @@
 from flask import Flask
-from app.extensions import db, migrate
-from app.config import Config
+from app.extensions import (db, migrate, compress, instrumentation, mail, passwords, query_auditor, replicas,
+                            ratelimiter, response_cache, sessions, uploads)
+from app.config import Config, config_by_name
+from app.database import configure_database, prepare_engine_options
 
 def create_app(config_class=Config):
+    if isinstance(config_class, str):
+        config_class = config_by_name[config_class]
     app = Flask(__name__)
     app.config.from_object(config_class)
 
+    prepare_engine_options(app)
     db.init_app(app)
+    replicas.init_app(app)
+    configure_database(app, db)
     migrate.init_app(app, db)
+    # Registered before the cache and compression so their after_request
+    # hooks run last: instrumentation sees the final response size, and the
+    # query toolbar is added to cache hits rather than stored in the cache.
+    instrumentation.init_app(app, db)
+    query_auditor.init_app(app)
+    # Before the other before_request work, so rejections stay cheap.
+    ratelimiter.init_app(app)
+    # The cache stores responses after compression, so its after_request
+    # hook has to be registered first (Flask runs them in reverse order).
+    response_cache.init_app(app)
+    compress.init_app(app)
+    passwords.init_app(app)
+    mail.init_app(app)
+    uploads.init_app(app)
+    sessions.init_app(app)
 
     from app.auth import bp as auth_bp
     app.register_blueprint(auth_bp, url_prefix='/auth')
@@ -15,6 +37,43 @@ def create_app(config_class=Config):
     from app.main import bp as main_bp
     app.register_blueprint(main_bp)
 
+    from app.assets import bp as assets_bp
+    app.register_blueprint(assets_bp)
+
+    from app.auth.availability import availability
+    availability.init_app(app)
+
+    from app.auth.user_cache import user_cache
+    user_cache.init_app(app)
+
+    from app.auth.bulk import users_cli
+    app.cli.add_command(users_cli)
+
+    from app.cache import cache_cli
+    app.cli.add_command(cache_cli)
+
+    from app.passwords import passwords_cli
+    app.cli.add_command(passwords_cli)
+
+    from app.instrumentation import profiling_cli
+    app.cli.add_command(profiling_cli)
+
+    from app.mail import mail_cli
+    app.cli.add_command(mail_cli)
+
+    from app.ratelimit import ratelimit_cli
+    app.cli.add_command(ratelimit_cli)
+
+    from app.sessions import sessions_cli
+    app.cli.add_command(sessions_cli)
+
+    from app.startup import startup_report
+    app.cli.add_command(startup_report)
+
+    from app.templating import configure_templates, templates_cli
+    app.cli.add_command(templates_cli)
+    configure_templates(app)
+
     return app
 
 from app import models
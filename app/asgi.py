@@ -0,0 +1,173 @@
+import asyncio
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from app import create_app
+
+# Request bodies up to this size stay in memory; larger ones spill to disk.
+BODY_SPOOL_SIZE = 1024 * 1024
+
+
+def build_environ(scope, body):
+    """
+    Builds a WSGI environ from an ASGI HTTP scope.
+
+    Args:
+        scope (dict): The ASGI connection scope.
+        body: A file object holding the complete request body.
+
+    Returns:
+        dict: The WSGI environ.
+    """
+    server_name, server_port = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server_name,
+        'SERVER_PORT': str(server_port),
+        'SERVER_PROTOCOL': f"HTTP/{scope['http_version']}",
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    if scope.get('client'):
+        environ['REMOTE_ADDR'], environ['REMOTE_PORT'] = scope['client'][0], str(scope['client'][1])
+    for name, value in scope['headers']:
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name == 'CONTENT_TYPE':
+            environ['CONTENT_TYPE'] = value
+        elif name == 'CONTENT_LENGTH':
+            environ['CONTENT_LENGTH'] = value
+        else:
+            key = f'HTTP_{name}'
+            environ[key] = f'{environ[key]},{value}' if key in environ else value
+    return environ
+
+
+class FlaskASGI:
+    """
+    Serves the Flask app to ASGI servers such as uvicorn or hypercorn.
+
+    The event loop owns the connections: it reads the whole request body
+    (spooling large bodies to disk) before the request reaches a thread, and
+    it writes the response back, so slow clients and idle keep-alive
+    connections cost no thread. The Flask app itself runs in a pool of
+    ``ASGI_THREADS`` threads, which bounds how many requests execute at
+    once. Views may be ``async def`` (Flask runs them through asgiref); one
+    that awaits several slow calls concurrently holds its thread only for
+    the slowest of them.
+
+    asgiref's own ``WsgiToAsgi`` is not used because it runs every request
+    on a single shared thread.
+
+    Args:
+        app (Flask): The application to serve.
+        threads (int): Size of the request thread pool (defaults to
+            ``ASGI_THREADS``).
+    """
+
+    def __init__(self, app, threads=None):
+        self.app = app
+        self.threads = threads or app.config['ASGI_THREADS']
+        self.executor = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix='asgi')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http':
+            await self.http(scope, receive, send)
+        elif scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+        else:
+            raise ValueError(f"Unsupported ASGI scope type {scope['type']!r}")
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                from app.extensions import mail
+
+                mail.stop_worker(self.app, timeout=5)
+                self.executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def read_body(self, receive):
+        body = tempfile.SpooledTemporaryFile(max_size=BODY_SPOOL_SIZE)
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                body.close()
+                return None
+            body.write(message.get('body', b''))
+            if not message.get('more_body'):
+                body.seek(0)
+                return body
+
+    async def http(self, scope, receive, send):
+        body = await self.read_body(receive)
+        if body is None:
+            return
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(self.executor, self.run_wsgi, build_environ(scope, body), loop, send)
+        finally:
+            body.close()
+
+    def run_wsgi(self, environ, loop, send):
+        """
+        Runs the WSGI app in a pool thread, forwarding the response.
+
+        Every message is handed to the event loop and waited for, so a
+        slow client applies back-pressure to a streamed response instead
+        of letting it pile up in memory.
+        """
+        def forward(message):
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            if exc_info and response.get('started'):
+                raise exc_info[1].with_traceback(exc_info[2])
+            response['status'] = int(status.split(' ', 1)[0])
+            response['headers'] = [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                                   for name, value in headers]
+
+        def start():
+            if not response.get('started'):
+                response['started'] = True
+                forward({'type': 'http.response.start', 'status': response['status'],
+                         'headers': response['headers']})
+
+        result = self.app(environ, start_response)
+        try:
+            for chunk in result:
+                if chunk:
+                    start()
+                    forward({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            start()
+            forward({'type': 'http.response.body', 'body': b'', 'more_body': False})
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+
+
+def create_asgi_app(config_class=None):
+    """
+    Application factory for ASGI servers.
+
+    Args:
+        config_class: Config class or name, as for ``create_app``.
+
+    Returns:
+        FlaskASGI: The ASGI application.
+    """
+    return FlaskASGI(create_app(config_class) if config_class is not None else create_app())
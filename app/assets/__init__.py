@@ -0,0 +1,5 @@
+from flask import Blueprint
+
+bp = Blueprint('assets', __name__, cli_group='assets')
+
+from app.assets import commands, helpers, static
@@ -0,0 +1,96 @@
+import glob
+import os
+import click
+from flask import current_app
+from app.assets import bp
+from app.assets.compress import compress_static
+from app.assets.fonts import build_fonts
+from app.assets.helpers import font_manifest_path, image_manifest_path
+from app.assets.images import build_images
+from app.assets.manifest import build_manifest
+from app.assets.static import asset_manifest_path
+
+
+def _format_bytes(size):
+    for unit in ('B', 'KB', 'MB'):
+        if size < 1024 or unit == 'MB':
+            return f'{size:.0f} {unit}' if unit == 'B' else f'{size:.1f} {unit}'
+        size /= 1024
+
+
+@bp.cli.command('build-images')
+@click.option('--workers', type=int, default=None, help='Size of the process pool.')
+@click.option('--force', is_flag=True, help='Rebuild images even if unchanged.')
+def build_images_command(workers, force):
+    """Build resized WebP/AVIF/JPEG variants of the static images."""
+    config = current_app.config
+    manifest, report = build_images(
+        current_app.static_folder,
+        source_dir=config['IMAGE_SOURCE_DIR'],
+        output_dir=f"{config['ASSETS_BUILD_DIR']}/images",
+        manifest_path=image_manifest_path(current_app),
+        widths=config['IMAGE_WIDTHS'],
+        formats=config['IMAGE_FORMATS'],
+        quality=config['IMAGE_QUALITY'],
+        workers=workers,
+        force=force,
+    )
+
+    total_before = total_after = 0
+    for key, status, before, after in report:
+        total_before += before
+        total_after += after
+        saved = 100 - (after * 100 // before) if before else 0
+        click.echo(f'{key:<32} {status:<10} {_format_bytes(before):>10} -> {_format_bytes(after):>10} ({saved}% saved)')
+    click.echo(f'{len(manifest)} images, {_format_bytes(total_before)} -> {_format_bytes(total_after)}')
+
+
+@bp.cli.command('manifest')
+def manifest_command():
+    """Content-hash the static files into the asset manifest."""
+    manifest = build_manifest(
+        current_app.static_folder,
+        asset_manifest_path(current_app),
+        skip_files=[image_manifest_path(current_app)],
+        skip_suffixes=('.gz', '.br'),
+    )
+    click.echo(f'Fingerprinted {len(manifest)} static files into {asset_manifest_path(current_app)}')
+
+
+@bp.cli.command('compress')
+@click.option('--force', is_flag=True, help='Recompress files even if up to date.')
+def compress_command(force):
+    """Write .gz and .br siblings for the compressible static files."""
+    report = compress_static(
+        current_app.static_folder,
+        min_size=current_app.config['COMPRESS_MIN_SIZE'],
+        force=force,
+    )
+    for key, size, gzip_size, brotli_size in report:
+        gz = _format_bytes(gzip_size) if gzip_size else '-'
+        br = _format_bytes(brotli_size) if brotli_size else '-'
+        click.echo(f'{key:<40} {_format_bytes(size):>10}  gz {gz:>10}  br {br:>10}')
+    click.echo(f'Compressed {len(report)} static files')
+
+
+@bp.cli.command('fonts')
+def fonts_command():
+    """Subset the Roboto fonts to the glyphs and weights the site uses."""
+    templates = glob.glob(os.path.join(current_app.root_path, '**', 'templates', '**', '*.html'), recursive=True)
+    stylesheets = glob.glob(os.path.join(current_app.static_folder, 'css', '*.css'))
+    manifest, report = build_fonts(
+        current_app.static_folder,
+        templates,
+        stylesheets,
+        output_dir=f"{current_app.config['ASSETS_BUILD_DIR']}/fonts",
+        manifest_path=font_manifest_path(current_app),
+        preload_limit=current_app.config['FONT_PRELOAD_LIMIT'],
+    )
+
+    total_before = total_after = 0
+    for name, before, after in report:
+        total_before += before
+        total_after += after or 0
+        result = _format_bytes(after) if after is not None else 'dropped'
+        click.echo(f'{name:<28} {_format_bytes(before):>10} -> {result:>10}')
+    click.echo(f'{len(manifest["files"])} faces kept, {_format_bytes(total_before)} -> {_format_bytes(total_after)}')
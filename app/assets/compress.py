@@ -0,0 +1,105 @@
+import gzip
+import os
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = (
+    '.css', '.js', '.json', '.map', '.svg', '.txt', '.xml', '.html',
+    '.ttf', '.otf', '.eot', '.ico',
+)
+
+ENCODING_SUFFIXES = {
+    'br': '.br',
+    'gzip': '.gz',
+}
+
+
+def _write_if_smaller(path, data, source_size):
+    if len(data) >= source_size:
+        if os.path.exists(path):
+            os.remove(path)
+        return None
+    with open(path, 'wb') as f:
+        f.write(data)
+    return len(data)
+
+
+def compress_static(static_folder, min_size=256, force=False):
+    """
+    Writes ``.gz`` and ``.br`` siblings for the compressible static files.
+
+    Siblings that are newer than their source are left alone, and siblings
+    that would not be smaller than the source are not written at all.
+
+    Args:
+        static_folder (str): The application's static folder.
+        min_size (int): Files smaller than this many bytes are skipped.
+        force (bool): Recompress even if the siblings are up to date.
+
+    Returns:
+        list: Report rows ``(path, source_bytes, gzip_bytes, brotli_bytes)``;
+            the compressed sizes are None when no sibling was written.
+    """
+    report = []
+    for dirpath, dirnames, filenames in os.walk(static_folder):
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith('.'))
+        for name in sorted(filenames):
+            if not name.lower().endswith(COMPRESSIBLE_EXTENSIONS):
+                continue
+            source = os.path.join(dirpath, name)
+            stat = os.stat(source)
+            if stat.st_size < min_size:
+                continue
+
+            sizes = {}
+            data = None
+            for encoding, suffix in ENCODING_SUFFIXES.items():
+                if encoding == 'br' and brotli is None:
+                    continue
+                target = source + suffix
+                if (not force and os.path.exists(target)
+                        and os.stat(target).st_mtime >= stat.st_mtime):
+                    sizes[encoding] = os.path.getsize(target)
+                    continue
+                if data is None:
+                    with open(source, 'rb') as f:
+                        data = f.read()
+                if encoding == 'br':
+                    compressed = brotli.compress(data, quality=11)
+                else:
+                    compressed = gzip.compress(data, compresslevel=9, mtime=0)
+                sizes[encoding] = _write_if_smaller(target, compressed, stat.st_size)
+
+            key = os.path.relpath(source, static_folder).replace(os.sep, '/')
+            report.append((key, stat.st_size, sizes.get('gzip'), sizes.get('br')))
+    return report
+
+
+def scan_precompressed(static_folder):
+    """
+    Indexes which static files have pre-compressed siblings on disk.
+
+    This runs once at startup so that serving a file never has to probe the
+    filesystem for ``.br``/``.gz`` variants.
+
+    Args:
+        static_folder (str): The application's static folder.
+
+    Returns:
+        dict: Mapping of static path to the tuple of available encodings.
+    """
+    index = {}
+    for dirpath, _, filenames in os.walk(static_folder):
+        names = set(filenames)
+        for name in filenames:
+            encodings = tuple(
+                encoding for encoding, suffix in ENCODING_SUFFIXES.items()
+                if name + suffix in names
+            )
+            if encodings:
+                key = os.path.relpath(os.path.join(dirpath, name), static_folder)
+                index[key.replace(os.sep, '/')] = encodings
+    return index
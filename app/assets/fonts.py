@@ -0,0 +1,218 @@
+import hashlib
+import html
+import io
+import json
+import os
+import re
+
+FONT_FAMILY = 'Roboto'
+
+FACES = {
+    (100, 'normal'): 'Roboto-Thin.ttf',
+    (100, 'italic'): 'Roboto-ThinItalic.ttf',
+    (300, 'normal'): 'Roboto-Light.ttf',
+    (300, 'italic'): 'Roboto-LightItalic.ttf',
+    (400, 'normal'): 'Roboto-Regular.ttf',
+    (400, 'italic'): 'Roboto-Italic.ttf',
+    (500, 'normal'): 'Roboto-Medium.ttf',
+    (500, 'italic'): 'Roboto-MediumItalic.ttf',
+    (700, 'normal'): 'Roboto-Bold.ttf',
+    (700, 'italic'): 'Roboto-BoldItalic.ttf',
+    (900, 'normal'): 'Roboto-Black.ttf',
+    (900, 'italic'): 'Roboto-BlackItalic.ttf',
+}
+
+KEYWORD_WEIGHTS = {
+    'normal': 400,
+    'bold': 700,
+    'bolder': 900,
+    'lighter': 300,
+}
+
+# Text that is not in the templates (usernames, form input, flashed
+# messages) is almost always printable ASCII, so it is always kept.
+BASE_CODEPOINTS = set(range(0x20, 0x7f)) | {0xa0, 0xa9, 0x2013, 0x2014, 0x2018, 0x2019, 0x201c, 0x201d, 0x2026}
+
+JINJA_MARKUP = re.compile(r'{{.*?}}|{%.*?%}|{#.*?#}', re.S)
+HTML_COMMENT = re.compile(r'<!--.*?-->', re.S)
+HTML_TAG = re.compile(r'<[^>]+>')
+CSS_COMMENT = re.compile(r'/\*.*?\*/', re.S)
+CSS_RULE = re.compile(r'([^{}]+){([^{}]*)}')
+CSS_CONTENT = re.compile(r'content\s*:\s*(["\'])(.*?)\1')
+CSS_WEIGHT = re.compile(r'font-weight\s*:\s*([a-z0-9]+)', re.I)
+CSS_STYLE = re.compile(r'font-style\s*:\s*(italic|oblique)', re.I)
+BOLD_TAGS = re.compile(r'<(strong|b|h[1-6]|th)[\s>]', re.I)
+ITALIC_TAGS = re.compile(r'<(em|i|cite|var|address)[\s>]', re.I)
+
+
+def _nearest_weight(weight):
+    return min({w for w, _ in FACES}, key=lambda w: (abs(w - weight), w))
+
+
+def scan_usage(template_paths, css_paths):
+    """
+    Works out which glyphs and font faces the site actually uses.
+
+    Characters come from the literal text of the templates (Jinja markup and
+    HTML tags are stripped) and CSS ``content`` strings. Faces come from
+    ``font-weight``/``font-style`` declarations and from tags browsers render
+    bold or italic by default.
+
+    Args:
+        template_paths (iterable): Paths of Jinja templates to scan.
+        css_paths (iterable): Paths of stylesheets to scan.
+
+    Returns:
+        tuple: ``(codepoints, faces)`` where ``codepoints`` is a set of ints and
+            ``faces`` a set of ``(weight, style)`` keys into ``FACES``.
+    """
+    codepoints = set(BASE_CODEPOINTS)
+    weights = {400}
+    styles = {'normal'}
+
+    for path in template_paths:
+        with open(path, encoding='utf-8') as f:
+            source = HTML_COMMENT.sub('', JINJA_MARKUP.sub(' ', f.read()))
+        if BOLD_TAGS.search(source):
+            weights.add(700)
+        if ITALIC_TAGS.search(source):
+            styles.add('italic')
+        codepoints.update(ord(c) for c in html.unescape(HTML_TAG.sub(' ', source)) if not c.isspace())
+
+    for path in css_paths:
+        with open(path, encoding='utf-8') as f:
+            source = CSS_COMMENT.sub('', f.read())
+        for _, text in CSS_CONTENT.findall(source):
+            codepoints.update(ord(c) for c in text)
+        for _, body in CSS_RULE.findall(source):
+            for value in CSS_WEIGHT.findall(body):
+                value = value.lower()
+                if value.isdigit():
+                    weights.add(_nearest_weight(int(value)))
+                elif value in KEYWORD_WEIGHTS:
+                    weights.add(KEYWORD_WEIGHTS[value])
+            if CSS_STYLE.search(body):
+                styles.add('italic')
+
+    faces = {(weight, style) for weight in weights for style in styles}
+    return codepoints, faces
+
+
+def subset_font(source, codepoints):
+    """
+    Subsets a font to the given codepoints and encodes it as WOFF2.
+
+    Args:
+        source (str): Path of the TTF file.
+        codepoints (iterable): Unicode codepoints to keep.
+
+    Returns:
+        bytes: The WOFF2 data.
+    """
+    from fontTools import subset
+
+    options = subset.Options()
+    options.flavor = 'woff2'
+    options.layout_features = ['kern', 'liga', 'calt', 'ccmp', 'locl', 'mark', 'mkmk']
+    options.name_IDs = ['*']
+    options.notdef_outline = True
+    font = subset.load_font(source, options)
+    subsetter = subset.Subsetter(options)
+    subsetter.populate(unicodes=codepoints)
+    subsetter.subset(font)
+
+    buffer = io.BytesIO()
+    subset.save_font(font, buffer, options)
+    return buffer.getvalue()
+
+
+def _unicode_range(codepoints):
+    ranges = []
+    for cp in sorted(codepoints):
+        if ranges and cp == ranges[-1][1] + 1:
+            ranges[-1][1] = cp
+        else:
+            ranges.append([cp, cp])
+    return ', '.join(
+        f'U+{start:04X}' if start == end else f'U+{start:04X}-{end:04X}'
+        for start, end in ranges
+    )
+
+
+def build_fonts(static_folder, template_paths, css_paths, source_dir='fonts',
+                output_dir='build/fonts', manifest_path=None, preload_limit=2):
+    """
+    Writes subsetted WOFF2 fonts plus the matching ``@font-face`` stylesheet.
+
+    Only faces found by :func:`scan_usage` are built; the other weights are
+    dropped from the build output entirely.
+
+    Args:
+        static_folder (str): The application's static folder.
+        template_paths (iterable): Templates to scan for text.
+        css_paths (iterable): Stylesheets to scan for text and faces.
+        source_dir (str): Directory of the TTF sources, relative to ``static_folder``.
+        output_dir (str): Directory for generated files, relative to ``static_folder``.
+        manifest_path (str): Where to write the font manifest JSON.
+        preload_limit (int): Maximum number of upright faces to preload.
+
+    Returns:
+        tuple: The manifest and a list of report rows
+            ``(source, source_bytes, woff2_bytes)``; ``woff2_bytes`` is None
+            for dropped faces.
+    """
+    output_root = os.path.join(static_folder, output_dir)
+    if manifest_path is None:
+        manifest_path = os.path.join(static_folder, 'build', 'fonts.json')
+    os.makedirs(output_root, exist_ok=True)
+    for name in os.listdir(output_root):
+        if name.endswith('.woff2'):
+            os.remove(os.path.join(output_root, name))
+
+    css_path = os.path.join(os.path.dirname(manifest_path), 'fonts.css')
+    codepoints, faces = scan_usage(template_paths, css_paths)
+    unicode_range = _unicode_range(codepoints)
+    rules = []
+    files = []
+    report = []
+
+    for (weight, style), name in sorted(FACES.items()):
+        source = os.path.join(static_folder, source_dir, name)
+        if not os.path.exists(source):
+            continue
+        if (weight, style) not in faces:
+            report.append((name, os.path.getsize(source), None))
+            continue
+
+        data = subset_font(source, codepoints)
+        digest = hashlib.sha256(data).hexdigest()[:10]
+        filename = f'{os.path.splitext(name)[0]}.{digest}.woff2'
+        target = os.path.join(output_root, filename)
+        with open(target, 'wb') as f:
+            f.write(data)
+        url = os.path.relpath(target, os.path.dirname(css_path)).replace(os.sep, '/')
+        report.append((name, os.path.getsize(source), len(data)))
+        files.append({'file': f'{output_dir}/{filename}', 'weight': weight, 'style': style})
+        rules.append(
+            '@font-face {\n'
+            f"    font-family: '{FONT_FAMILY}';\n"
+            f'    font-style: {style};\n'
+            f'    font-weight: {weight};\n'
+            '    font-display: swap;\n'
+            f"    src: url('{url}') format('woff2');\n"
+            f'    unicode-range: {unicode_range};\n'
+            '}\n'
+        )
+
+    with open(css_path, 'w') as f:
+        f.write('\n'.join(rules))
+
+    upright = sorted((f for f in files if f['style'] == 'normal'), key=lambda f: abs(f['weight'] - 400))
+    manifest = {
+        'stylesheet': os.path.relpath(css_path, static_folder).replace(os.sep, '/'),
+        'files': files,
+        'preload': [f['file'] for f in upright[:preload_limit]],
+    }
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest, report
@@ -0,0 +1,129 @@
+import os
+from flask import current_app, url_for
+from markupsafe import Markup, escape
+from app.assets import bp
+from app.assets.images import MIME_TYPES, load_manifest
+
+
+def image_manifest_path(app):
+    """
+    Returns the path of the responsive image manifest for an app.
+
+    Args:
+        app (Flask): The application instance.
+
+    Returns:
+        str: Absolute path of the manifest JSON file.
+    """
+    return os.path.join(app.static_folder, app.config['ASSETS_BUILD_DIR'], 'images.json')
+
+
+def font_manifest_path(app):
+    """
+    Returns the path of the subsetted font manifest for an app.
+
+    Args:
+        app (Flask): The application instance.
+
+    Returns:
+        str: Absolute path of the manifest JSON file.
+    """
+    return os.path.join(app.static_folder, app.config['ASSETS_BUILD_DIR'], 'fonts.json')
+
+
+@bp.record_once
+def load_image_manifest(state):
+    """
+    Loads the image and font manifests once, when the blueprint is registered.
+    """
+    app = state.app
+    app.extensions['image_manifest'] = load_manifest(image_manifest_path(app))
+    app.extensions['font_manifest'] = load_manifest(font_manifest_path(app))
+
+
+@bp.app_template_global()
+def font_links():
+    """
+    Renders preload hints and the stylesheet for the subsetted web fonts.
+
+    Returns:
+        Markup: The ``<link>`` tags, or an empty string when ``flask assets
+            fonts`` has not been run.
+    """
+    manifest = current_app.extensions.get('font_manifest')
+    if not manifest:
+        return Markup('')
+    links = [
+        f'<link rel="preload" href="{url_for("static", filename=path)}" as="font" type="font/woff2" crossorigin>'
+        for path in manifest['preload']
+    ]
+    links.append(f'<link rel="stylesheet" href="{url_for("static", filename=manifest["stylesheet"])}">')
+    return Markup('\n    '.join(links))
+
+
+def _srcset(variants):
+    return ', '.join(
+        f"{url_for('static', filename=v['file'])} {v['width']}w" for v in variants
+    )
+
+
+def _attributes(attrs):
+    parts = []
+    for name, value in attrs.items():
+        if value is None or value is False:
+            continue
+        name = name.rstrip('_').replace('_', '-')
+        if value is True:
+            parts.append(name)
+        else:
+            parts.append(f'{name}="{escape(value)}"')
+    return ' '.join(parts)
+
+
+@bp.app_template_global()
+def responsive_image(filename, alt='', sizes='100vw', loading='lazy', **attrs):
+    """
+    Renders ``<picture>`` markup with ``srcset`` candidates for a static image.
+
+    Falls back to a plain ``<img>`` when the image has not been built by
+    ``flask assets build-images``.
+
+    Args:
+        filename (str): Path of the source image relative to the static folder.
+        alt (str): Alternative text.
+        sizes (str): The ``sizes`` attribute for the candidates.
+        loading (str): The ``loading`` attribute ('lazy' or 'eager').
+        **attrs: Extra attributes for the ``<img>`` tag (``class_`` for class).
+
+    Returns:
+        Markup: The rendered HTML.
+    """
+    entry = current_app.extensions.get('image_manifest', {}).get(filename)
+    img_attrs = {'alt': alt, 'loading': loading, 'decoding': 'async'}
+    img_attrs.update(attrs)
+
+    if not entry:
+        img_attrs = {'src': url_for('static', filename=filename), **img_attrs}
+        return Markup(f'<img {_attributes(img_attrs)}>')
+
+    variants = entry['variants']
+    fallback_format = 'jpeg' if 'jpeg' in variants else list(variants)[-1]
+    fallback = variants[fallback_format]
+
+    sources = []
+    for fmt, mimetype in MIME_TYPES.items():
+        if fmt == fallback_format or fmt not in variants:
+            continue
+        sources.append(
+            f'<source type="{mimetype}" srcset="{_srcset(variants[fmt])}" sizes="{escape(sizes)}">'
+        )
+
+    img_attrs = {
+        'src': url_for('static', filename=fallback[-1]['file']),
+        'srcset': _srcset(fallback),
+        'sizes': sizes,
+        'width': entry['width'],
+        'height': entry['height'],
+        **img_attrs,
+    }
+    return Markup('<picture>{}<img {}></picture>'.format(''.join(sources), _attributes(img_attrs)))
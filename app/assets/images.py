@@ -0,0 +1,291 @@
+import hashlib
+import io
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+SOURCE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+FORMAT_EXTENSIONS = {
+    'avif': 'avif',
+    'webp': 'webp',
+    'jpeg': 'jpg',
+}
+
+MIME_TYPES = {
+    'avif': 'image/avif',
+    'webp': 'image/webp',
+    'jpeg': 'image/jpeg',
+}
+
+
+def file_hash(path, chunk_size=65536):
+    """
+    Computes the SHA-256 hex digest of a file without loading it into memory.
+
+    Args:
+        path (str): Path of the file to hash.
+        chunk_size (int): Number of bytes read per iteration.
+
+    Returns:
+        str: The hex digest.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def supported_formats(formats):
+    """
+    Filters the requested output formats down to the ones Pillow can encode.
+
+    Args:
+        formats (iterable): Format names such as 'avif', 'webp' or 'jpeg'.
+
+    Returns:
+        list: The formats the installed Pillow build supports, in order.
+    """
+    from PIL import features
+
+    supported = []
+    for fmt in formats:
+        if fmt not in FORMAT_EXTENSIONS:
+            continue
+        if fmt in ('avif', 'webp') and not features.check(fmt):
+            continue
+        supported.append(fmt)
+    return supported
+
+
+def width_buckets(original_width, widths):
+    """
+    Picks the resize widths for an image, never upscaling past the original.
+
+    Args:
+        original_width (int): Width of the source image in pixels.
+        widths (iterable): Configured width buckets.
+
+    Returns:
+        list: Sorted widths to generate; always contains at least one entry.
+    """
+    buckets = sorted({w for w in widths if w < original_width})
+    if not buckets or original_width <= max(widths):
+        buckets.append(original_width)
+    return buckets
+
+
+def encode_image(image, fmt, quality):
+    """
+    Encodes an image into the given format.
+
+    Args:
+        image (Image): The (already resized) image to encode.
+        fmt (str): One of 'avif', 'webp' or 'jpeg'.
+        quality (int): Encoder quality setting.
+
+    Returns:
+        bytes: The encoded image.
+    """
+    if fmt == 'jpeg' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    buffer = io.BytesIO()
+    options = {'quality': quality}
+    if fmt == 'jpeg':
+        options.update(optimize=True, progressive=True)
+    elif fmt == 'webp':
+        options['method'] = 6
+    image.save(buffer, format=fmt.upper(), **options)
+    return buffer.getvalue()
+
+
+def process_image(job):
+    """
+    Generates every width/format variant for a single source image.
+
+    This runs inside a worker process, so it only receives and returns plain
+    data structures.
+
+    Args:
+        job (dict): Source path, manifest key, output directory, widths,
+            formats and quality for one image.
+
+    Returns:
+        dict: The manifest entry for the image.
+    """
+    from PIL import Image, ImageOps
+
+    source = job['source']
+    stem = os.path.splitext(os.path.basename(source))[0]
+
+    with Image.open(source) as original:
+        original = ImageOps.exif_transpose(original)
+        if original.mode not in ('RGB', 'RGBA', 'L'):
+            original = original.convert('RGBA' if 'A' in original.getbands() else 'RGB')
+        width, height = original.size
+
+        variants = {}
+        for target_width in width_buckets(width, job['widths']):
+            if target_width == width:
+                resized = original
+            else:
+                target_height = max(1, round(height * target_width / width))
+                resized = original.resize((target_width, target_height), Image.LANCZOS)
+
+            for fmt in job['formats']:
+                data = encode_image(resized, fmt, job['quality'])
+                digest = hashlib.sha256(data).hexdigest()[:10]
+                filename = f'{stem}-{target_width}w.{digest}.{FORMAT_EXTENSIONS[fmt]}'
+                path = os.path.join(job['output_dir'], filename)
+                if not os.path.exists(path):
+                    with open(path, 'wb') as f:
+                        f.write(data)
+                variants.setdefault(fmt, []).append({
+                    'width': target_width,
+                    'file': f"{job['output_prefix']}/{filename}",
+                    'bytes': len(data),
+                })
+
+    return {
+        'key': job['key'],
+        'source_hash': job['source_hash'],
+        'source_bytes': os.path.getsize(source),
+        'width': width,
+        'height': height,
+        'variants': variants,
+    }
+
+
+def load_manifest(path):
+    """
+    Loads an image manifest from disk.
+
+    Args:
+        path (str): Path of the manifest JSON file.
+
+    Returns:
+        dict: The manifest, or an empty dict if it does not exist yet.
+    """
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _variants_exist(entry, static_folder):
+    return all(
+        os.path.exists(os.path.join(static_folder, variant['file']))
+        for variants in entry.get('variants', {}).values()
+        for variant in variants
+    )
+
+
+def _remove_stale_variants(old_entry, new_entry, static_folder):
+    keep = {
+        variant['file']
+        for variants in new_entry['variants'].values()
+        for variant in variants
+    }
+    for variants in old_entry.get('variants', {}).values():
+        for variant in variants:
+            if variant['file'] not in keep:
+                try:
+                    os.remove(os.path.join(static_folder, variant['file']))
+                except OSError:
+                    pass
+
+
+def build_images(static_folder, source_dir='images', output_dir='build/images',
+                 manifest_path=None, widths=(320, 640, 1024, 1600),
+                 formats=('avif', 'webp', 'jpeg'), quality=80, workers=None,
+                 force=False):
+    """
+    Builds responsive variants for every image under ``static_folder/source_dir``.
+
+    Sources whose content hash matches the existing manifest entry (and whose
+    variants are still on disk) are skipped. The remaining images are encoded
+    in parallel across a process pool.
+
+    Args:
+        static_folder (str): The application's static folder.
+        source_dir (str): Directory of source images, relative to ``static_folder``.
+        output_dir (str): Directory for generated files, relative to ``static_folder``.
+        manifest_path (str): Where to write the manifest JSON.
+        widths (iterable): Width buckets in pixels.
+        formats (iterable): Output formats, best first.
+        quality (int): Encoder quality setting.
+        workers (int): Process pool size (defaults to the CPU count).
+        force (bool): Rebuild every image even if unchanged.
+
+    Returns:
+        tuple: The new manifest and a list of report rows
+            ``(key, status, source_bytes, best_bytes)``.
+    """
+    source_root = os.path.join(static_folder, source_dir)
+    output_root = os.path.join(static_folder, output_dir)
+    if manifest_path is None:
+        manifest_path = os.path.join(static_folder, 'build', 'images.json')
+    os.makedirs(output_root, exist_ok=True)
+
+    formats = supported_formats(formats)
+    old_manifest = load_manifest(manifest_path)
+    manifest = {}
+    report = []
+    jobs = []
+
+    for dirpath, _, filenames in os.walk(source_root):
+        for name in sorted(filenames):
+            if not name.lower().endswith(SOURCE_EXTENSIONS):
+                continue
+            source = os.path.join(dirpath, name)
+            key = os.path.relpath(source, static_folder).replace(os.sep, '/')
+            source_hash = file_hash(source)
+            previous = old_manifest.get(key)
+            if (not force and previous
+                    and previous.get('source_hash') == source_hash
+                    and sorted(previous.get('variants', {})) == sorted(formats)
+                    and _variants_exist(previous, static_folder)):
+                manifest[key] = previous
+                report.append((key, 'unchanged', previous['source_bytes'], _best_bytes(previous, formats)))
+                continue
+            jobs.append({
+                'key': key,
+                'source': source,
+                'source_hash': source_hash,
+                'output_dir': output_root,
+                'output_prefix': output_dir,
+                'widths': tuple(widths),
+                'formats': formats,
+                'quality': quality,
+            })
+
+    if jobs:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for entry in executor.map(process_image, jobs):
+                key = entry.pop('key')
+                if key in old_manifest:
+                    _remove_stale_variants(old_manifest[key], entry, static_folder)
+                manifest[key] = entry
+                report.append((key, 'built', entry['source_bytes'], _best_bytes(entry, formats)))
+
+    for key, entry in old_manifest.items():
+        if key not in manifest:
+            _remove_stale_variants(entry, {'variants': {}}, static_folder)
+
+    os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+    report.sort()
+    return manifest, report
+
+
+def _best_bytes(entry, formats):
+    """Size of the full-width variant in the best available format."""
+    for fmt in formats:
+        variants = entry['variants'].get(fmt)
+        if variants:
+            return variants[-1]['bytes']
+    return entry['source_bytes']
@@ -0,0 +1,110 @@
+import json
+import os
+import re
+from app.assets.images import file_hash
+
+DIGEST_LENGTH = 12
+
+FINGERPRINTED = re.compile(r'\.[0-9a-f]{10,}\.[A-Za-z0-9]+$')
+
+
+def fingerprinted_name(path, digest):
+    """
+    Inserts a content digest before the extension of a static path.
+
+    Args:
+        path (str): Path relative to the static folder, e.g. 'css/styles.css'.
+        digest (str): The content digest.
+
+    Returns:
+        str: The fingerprinted path, e.g. 'css/styles.3f2a1b9c0d4e.css'.
+    """
+    root, ext = os.path.splitext(path)
+    return f'{root}.{digest[:DIGEST_LENGTH]}{ext}'
+
+
+def build_manifest(static_folder, manifest_path, skip_files=(), skip_suffixes=()):
+    """
+    Content-hashes every file under the static folder and writes the manifest.
+
+    Files whose names already carry a content hash (such as the output of
+    ``flask assets build-images``) are recorded without being renamed again.
+
+    Args:
+        static_folder (str): The application's static folder.
+        manifest_path (str): Where to write the manifest JSON.
+        skip_files (iterable): Other build artifacts (absolute paths) to ignore.
+        skip_suffixes (iterable): File suffixes to ignore.
+
+    Returns:
+        dict: Mapping of static path to ``{'path': ..., 'digest': ...}``.
+    """
+    skip_files = {os.path.abspath(p) for p in (manifest_path, *skip_files)}
+    manifest = {}
+
+    for dirpath, dirnames, filenames in os.walk(static_folder):
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith('.'))
+        for name in sorted(filenames):
+            source = os.path.join(dirpath, name)
+            if (name.startswith('.') or name.endswith(tuple(skip_suffixes))
+                    or os.path.abspath(source) in skip_files):
+                continue
+            key = os.path.relpath(source, static_folder).replace(os.sep, '/')
+            digest = file_hash(source)
+            if FINGERPRINTED.search(key):
+                path = key
+            else:
+                path = fingerprinted_name(key, digest)
+            manifest[key] = {'path': path, 'digest': digest}
+
+    os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+class AssetManifest:
+    """
+    In-memory view of the static asset manifest with O(1) lookups both ways.
+    """
+
+    def __init__(self, entries=None):
+        entries = entries or {}
+        self.paths = {key: entry['path'] for key, entry in entries.items()}
+        self.originals = {entry['path']: key for key, entry in entries.items()}
+        self.digests = {key: entry['digest'] for key, entry in entries.items()}
+
+    @classmethod
+    def load(cls, path):
+        """
+        Loads the manifest from disk.
+
+        Args:
+            path (str): Path of the manifest JSON file.
+
+        Returns:
+            AssetManifest: The loaded manifest (empty if the file is missing).
+        """
+        try:
+            with open(path) as f:
+                return cls(json.load(f))
+        except (OSError, ValueError):
+            return cls()
+
+    def __bool__(self):
+        return bool(self.paths)
+
+    def __len__(self):
+        return len(self.paths)
+
+    def url_path(self, filename):
+        """Returns the fingerprinted path for a static file, or the path unchanged."""
+        return self.paths.get(filename, filename)
+
+    def original(self, path):
+        """Returns the source file behind a fingerprinted path, or None."""
+        return self.originals.get(path)
+
+    def digest(self, filename):
+        """Returns the content digest of a static file, or None."""
+        return self.digests.get(filename)
@@ -0,0 +1,100 @@
+import mimetypes
+import os
+from flask import current_app, request, send_from_directory
+from app.assets import bp
+from app.assets.compress import ENCODING_SUFFIXES, scan_precompressed
+from app.assets.manifest import AssetManifest
+
+
+def asset_manifest_path(app):
+    """
+    Returns the path of the fingerprinted asset manifest for an app.
+
+    Args:
+        app (Flask): The application instance.
+
+    Returns:
+        str: Absolute path of the manifest JSON file.
+    """
+    return os.path.join(app.static_folder, app.config['ASSETS_BUILD_DIR'], 'manifest.json')
+
+
+@bp.record_once
+def init_static(state):
+    """
+    Loads the asset manifest and installs the fingerprinting static view.
+
+    The manifest is read once here, at create_app() time; requests only do
+    dictionary lookups against it.
+    """
+    app = state.app
+    manifest = AssetManifest()
+    if app.config['ASSETS_FINGERPRINT']:
+        manifest = AssetManifest.load(asset_manifest_path(app))
+    app.extensions['asset_manifest'] = manifest
+    app.extensions['static_encodings'] = scan_precompressed(app.static_folder)
+
+    app.url_defaults(fingerprint_static_url)
+    if 'static' in app.view_functions:
+        app.view_functions['static'] = serve_static
+
+
+def fingerprint_static_url(endpoint, values):
+    """
+    Rewrites ``url_for('static', filename=...)`` to the fingerprinted path.
+    """
+    if endpoint != 'static' or 'filename' not in values:
+        return
+    manifest = current_app.extensions['asset_manifest']
+    if manifest:
+        values['filename'] = manifest.url_path(values['filename'])
+
+
+def serve_static(filename):
+    """
+    Serves a static file with caching headers based on the asset manifest.
+
+    Fingerprinted paths never change content, so they are sent with a
+    one-year ``immutable`` lifetime. Every other path is revalidated with a
+    strong ETag (the manifest digest when known) and answered with a 304 when
+    it matches. When a pre-compressed sibling written by ``flask assets
+    compress`` matches the client's Accept-Encoding it is sent instead, so
+    no compression happens per request.
+
+    Args:
+        filename (str): The requested path relative to the static folder.
+
+    Returns:
+        Response: The file response.
+    """
+    manifest = current_app.extensions['asset_manifest']
+    static_folder = current_app.static_folder
+
+    original = manifest.original(filename)
+    path = original if original is not None else filename
+    digest = manifest.digest(path)
+    options = {'etag': digest or True}
+    if original is not None:
+        options['max_age'] = current_app.config['ASSETS_IMMUTABLE_MAX_AGE']
+
+    encoding = None
+    encodings = current_app.extensions['static_encodings'].get(path)
+    if encodings:
+        encoding = request.accept_encodings.best_match(encodings)
+    if encoding is not None:
+        mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        if digest:
+            options['etag'] = f'{digest}-{encoding}'
+        response = send_from_directory(
+            static_folder, path + ENCODING_SUFFIXES[encoding],
+            mimetype=mimetype, download_name=os.path.basename(path), **options
+        )
+        response.headers['Content-Encoding'] = encoding
+    else:
+        response = send_from_directory(static_folder, path, **options)
+
+    if encodings:
+        response.vary.add('Accept-Encoding')
+    if original is not None:
+        response.cache_control.immutable = True
+    return response
@@ -0,0 +1,294 @@
+import os
+import struct
+import threading
+import time
+from flask import current_app, has_app_context
+from sqlalchemy import event, func, inspect, select
+from sqlalchemy.exc import SQLAlchemyError
+from app.auth.validators import check_availability, normalize
+from app.bloom import BloomFilter
+from app.extensions import db
+from app.models import User
+
+SNAPSHOT_HEADER = struct.Struct('>Q')
+
+
+class _FilterState:
+
+    def __init__(self, bloom, max_id=0):
+        self.bloom = bloom
+        self.max_id = max_id
+        self.ready = False
+        self.load_attempted = False
+        self.load_lock = threading.Lock()
+        self.refreshed_at = time.monotonic()
+        self.snapshot_mtime = None
+        self.lock = threading.Lock()
+        self.stats = {
+            'lookups': 0,
+            'filter_negatives': 0,
+            'db_checks': 0,
+            'false_positives': 0,
+        }
+
+
+class AvailabilityIndex:
+    """
+    Bloom filter of normalized usernames and emails in front of the
+    availability checks.
+
+    A value the filter has never seen is definitely free and is answered
+    without touching the database. Possible positives fall through to
+    check_availability(), the same single-query check the registration
+    validators use. The filter is loaded from a snapshot file when one
+    matches the table, otherwise built from the User table, on the first
+    check rather than at start-up, so CLI commands never pay for it (servers
+    call ``ensure_loaded`` before forking instead). Users created or renamed
+    by this process are added by ``after_insert``/``after_update`` hooks.
+    Every ``AVAILABILITY_FILTER_REFRESH`` seconds, users created by other
+    workers are picked up with an ``id > max_id`` range query, and a
+    snapshot rewritten by another process (e.g. after a bulk import that
+    updated users) is merged in. Answers are advisory: the registration
+    form still runs the authoritative checks on submit.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if not app.config['AVAILABILITY_FILTER_ENABLED']:
+            return
+        app.extensions['availability_filter'] = _FilterState(self._new_filter(app))
+
+    def ensure_loaded(self, app):
+        """
+        Loads the filter unless it is loaded or a load was already attempted.
+
+        Args:
+            app (Flask): The application instance.
+        """
+        state = app.extensions.get('availability_filter')
+        if state is None or state.ready or state.load_attempted:
+            return
+        with state.load_lock:
+            if state.ready or state.load_attempted:
+                return
+            state.load_attempted = True
+            with app.app_context():
+                try:
+                    self.load(app)
+                except SQLAlchemyError:
+                    # The user table does not exist yet (e.g. before 'flask db upgrade').
+                    db.session.rollback()
+
+    def _new_filter(self, app):
+        return BloomFilter(
+            capacity=app.config['AVAILABILITY_FILTER_CAPACITY'],
+            error_rate=app.config['AVAILABILITY_FILTER_ERROR_RATE'],
+        )
+
+    def _state(self):
+        if not has_app_context():
+            return None
+        return current_app.extensions.get('availability_filter')
+
+    def snapshot_path(self, app):
+        return app.config['AVAILABILITY_FILTER_SNAPSHOT'] or os.path.join(
+            app.instance_path, 'availability.bloom')
+
+    def load(self, app):
+        """
+        Loads the filter from its snapshot, or rebuilds it from the table.
+
+        Args:
+            app (Flask): The application instance.
+        """
+        state = app.extensions['availability_filter']
+        db_max_id = db.session.scalar(select(func.max(User.id))) or 0
+        snapshot = self._read_snapshot(app)
+        expected = self._new_filter(app)
+        if (snapshot is not None and snapshot[0].num_bits == expected.num_bits
+                and snapshot[1] <= db_max_id):
+            with state.lock:
+                state.bloom, state.max_id = snapshot
+                state.snapshot_mtime = self._snapshot_mtime(app)
+                self._add_new_users(state)
+                state.ready = True
+        else:
+            self.rebuild(app)
+
+    def rebuild(self, app):
+        """
+        Rebuilds the filter from the whole User table and writes a snapshot.
+
+        Args:
+            app (Flask): The application instance.
+        """
+        state = app.extensions['availability_filter']
+        with state.lock:
+            state.bloom = self._new_filter(app)
+            state.max_id = 0
+            self._add_new_users(state)
+            state.ready = True
+            data = SNAPSHOT_HEADER.pack(state.max_id) + state.bloom.to_bytes()
+        path = self.snapshot_path(app)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        state.snapshot_mtime = self._snapshot_mtime(app)
+
+    def _snapshot_mtime(self, app):
+        try:
+            return os.stat(self.snapshot_path(app)).st_mtime_ns
+        except OSError:
+            return None
+
+    def _merge_snapshot(self, app, state):
+        """
+        ORs a snapshot written by another process into the filter.
+
+        Updates made elsewhere (renames, bulk imports) never get a new id,
+        so the range query misses them; the process that made them rewrites
+        the snapshot instead. Merging rather than replacing keeps what this
+        process added since.
+        """
+        mtime = self._snapshot_mtime(app)
+        if mtime is None or mtime == state.snapshot_mtime:
+            return
+        state.snapshot_mtime = mtime
+        snapshot = self._read_snapshot(app)
+        if snapshot is None:
+            return
+        bloom = snapshot[0]
+        if (bloom.num_bits, bloom.num_hashes) != (state.bloom.num_bits, state.bloom.num_hashes):
+            return
+        size = len(state.bloom.bits)
+        merged = int.from_bytes(state.bloom.bits, 'big') | int.from_bytes(bloom.bits, 'big')
+        state.bloom.bits = bytearray(merged.to_bytes(size, 'big'))
+        state.bloom.count = max(state.bloom.count, bloom.count)
+
+    def _read_snapshot(self, app):
+        try:
+            with open(self.snapshot_path(app), 'rb') as f:
+                data = f.read()
+            (max_id,) = SNAPSHOT_HEADER.unpack_from(data)
+            return BloomFilter.from_bytes(data[SNAPSHOT_HEADER.size:]), max_id
+        except (OSError, ValueError, struct.error):
+            return None
+
+    def _add_new_users(self, state):
+        query = (
+            select(User.id, func.lower(User.username), func.lower(User.email))
+            .where(User.id > state.max_id)
+            .order_by(User.id)
+            .execution_options(yield_per=10000)
+        )
+        for user_id, username, email in db.session.execute(query):
+            state.bloom.add(f'u:{username}')
+            state.bloom.add(f'e:{email}')
+            state.max_id = user_id
+        state.refreshed_at = time.monotonic()
+
+    def _maybe_refresh(self, state):
+        interval = current_app.config['AVAILABILITY_FILTER_REFRESH']
+        if time.monotonic() - state.refreshed_at < interval:
+            return
+        with state.lock:
+            if time.monotonic() - state.refreshed_at >= interval:
+                self._merge_snapshot(current_app._get_current_object(), state)
+                self._add_new_users(state)
+
+    def add(self, username=None, email=None):
+        """
+        Records a newly taken username and/or email in the filter.
+        """
+        state = self._state()
+        if state is None:
+            return
+        with state.lock:
+            if username:
+                state.bloom.add(f'u:{normalize(username)}')
+            if email:
+                state.bloom.add(f'e:{normalize(email)}')
+
+    def check(self, username=None, email=None):
+        """
+        Checks availability, consulting the database only for possible matches.
+
+        Args:
+            username (str): Username to check, or None to skip.
+            email (str): Email to check, or None to skip.
+
+        Returns:
+            dict: ``{'username': bool, 'email': bool}``; True means taken.
+        """
+        state = self._state()
+        if state is not None and not state.ready:
+            self.ensure_loaded(current_app._get_current_object())
+        if state is None or not state.ready:
+            return check_availability(username=username, email=email)
+
+        self._maybe_refresh(state)
+        pending = {}
+        for field, prefix, value in (('username', 'u', username), ('email', 'e', email)):
+            if not value:
+                continue
+            state.stats['lookups'] += 1
+            if f'{prefix}:{normalize(value)}' in state.bloom:
+                pending[field] = value
+            else:
+                state.stats['filter_negatives'] += 1
+
+        result = {'username': False, 'email': False}
+        if pending:
+            result.update(check_availability(**pending))
+            state.stats['db_checks'] += len(pending)
+            state.stats['false_positives'] += sum(1 for field in pending if not result[field])
+        return result
+
+    def stats(self):
+        """
+        Returns the filter's counters and false-positive rates.
+
+        Returns:
+            dict: Lookup counters, the observed false-positive rate (possible
+                positives the database said were free) and the rate expected
+                from the filter's fill level.
+        """
+        state = self._state()
+        if state is None:
+            return {'enabled': False}
+        stats = dict(state.stats)
+        db_checks = stats['db_checks']
+        stats.update(
+            enabled=True,
+            ready=state.ready,
+            items=state.bloom.count,
+            max_id=state.max_id,
+            observed_false_positive_rate=stats['false_positives'] / db_checks if db_checks else 0.0,
+            estimated_false_positive_rate=state.bloom.estimated_error_rate(),
+        )
+        return stats
+
+
+availability = AvailabilityIndex()
+
+
+@event.listens_for(User, 'after_insert')
+def _record_new_user(mapper, connection, target):
+    availability.add(username=target.username, email=target.email)
+
+
+@event.listens_for(User, 'after_update')
+def _record_changed_user(mapper, connection, target):
+    # Only values that changed are added, so unrelated updates do not
+    # inflate the filter's count. The old values stay in the filter; they
+    # only cost a database check.
+    attrs = inspect(target).attrs
+    availability.add(
+        username=target.username if attrs.username.history.has_changes() else None,
+        email=target.email if attrs.email.history.has_changes() else None,
+    )
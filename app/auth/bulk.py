@@ -0,0 +1,437 @@
+import contextlib
+import csv
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice, repeat
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import bindparam, func, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from app.extensions import db
+from app.models import User
+from app.passwords import available_backends
+
+FORMATS = ('csv', 'jsonl')
+EXPORT_FIELDS = ('username', 'email', 'password_hash')
+CONFLICT_STRATEGIES = ('skip', 'update', 'fail')
+
+users_cli = AppGroup('users', help='Bulk user import and export.')
+
+
+class ImportAborted(Exception):
+    """
+    Raised by ``--on-conflict fail`` and by rows the database rejects; the
+    batches committed before it stay in the database.
+    """
+
+
+def detect_format(path, fmt=None):
+    """
+    Picks the file format from ``--format`` or the file extension.
+
+    Raises:
+        click.UsageError: If neither names a supported format.
+    """
+    if fmt:
+        return fmt
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.csv':
+        return 'csv'
+    if extension in ('.jsonl', '.ndjson'):
+        return 'jsonl'
+    raise click.UsageError(f'Cannot tell the format of {path!r}; pass --format csv or --format jsonl.')
+
+
+def open_stream(path, mode):
+    """
+    Opens a file for streaming, or stdin/stdout for ``-``.
+
+    Files are opened with ``newline=''`` so the csv module handles quoted
+    line breaks, and read as ``utf-8-sig`` to drop a spreadsheet's BOM.
+    """
+    if path == '-':
+        return contextlib.nullcontext(sys.stdin if 'r' in mode else sys.stdout)
+    encoding = 'utf-8-sig' if 'r' in mode else 'utf-8'
+    return open(path, mode, encoding=encoding, newline='')
+
+
+def read_rows(stream, fmt):
+    """
+    Yields the records of a CSV or JSONL stream one at a time.
+
+    Args:
+        stream: A text stream.
+        fmt (str): ``'csv'`` (with a header row) or ``'jsonl'``.
+
+    Yields:
+        tuple: ``(line_number, record)``; a JSONL line that does not parse
+            yields its error message instead of a dict.
+    """
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for record in reader:
+            yield reader.line_num, record
+        return
+    for line_number, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except ValueError as e:
+            yield line_number, f'invalid JSON: {e}'
+
+
+def clean_row(record):
+    """
+    Validates one imported record against the User columns.
+
+    A ``password`` is hashed on import; a ``password_hash`` (for example
+    one exported from another instance) is stored as it is. Without either
+    the user has no password until they reset it.
+
+    Returns:
+        tuple: ``(row, None)`` with ``username``, ``email``, ``password``
+            and ``password_hash`` keys, or ``(None, reason)``.
+    """
+    if not isinstance(record, dict):
+        return None, record if isinstance(record, str) else 'not an object'
+    username = str(record.get('username') or '').strip()
+    email = str(record.get('email') or '').strip()
+    password = str(record.get('password') or '') or None
+    password_hash = str(record.get('password_hash') or '').strip() or None
+    if not username or not email:
+        return None, 'username and email are required'
+    if len(username) > User.username.type.length:
+        return None, 'username is too long'
+    if len(email) > User.email.type.length or '@' not in email:
+        return None, 'invalid email'
+    if password_hash and len(password_hash) > User.password_hash.type.length:
+        return None, 'password_hash is too long'
+    return {'username': username, 'email': email, 'password': None if password_hash else password,
+            'password_hash': password_hash}, None
+
+
+def _hash_password(algorithm, params, password):
+    # Runs in a worker process, which has no app to read the backend from.
+    return available_backends()[algorithm].hash(password, params)
+
+
+def _batches(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+class UserImport:
+    """
+    Loads users from a stream of records in batches.
+
+    Each batch is checked against the existing users with one query on the
+    ``lower()`` expression indexes, then written with a single executemany
+    INSERT (and, for ``update``, a single executemany UPDATE); a
+    transaction is committed every ``commit_every`` batches. Plain-text
+    passwords are hashed in a process pool with the current algorithm and
+    parameters, one batch ahead of the database writes, so hashing and
+    writing overlap and at most two batches are held in memory.
+
+    Conflicts are case-insensitive, like registration. ``skip`` keeps the
+    existing user, ``update`` overwrites the user that the username or the
+    email belongs to (rows matching two different users are skipped as
+    conflicts), and ``fail`` stops the import. Repeats of a username or
+    email within one batch are skipped as duplicates.
+
+    Rows are written with Core statements, so ORM events do not fire:
+    running workers see new users in the availability filter on its next
+    refresh, and :meth:`run` rebuilds the filter snapshot after updates,
+    which running workers merge on their next refresh.
+
+    Rejected rows are passed to ``on_error`` as they happen, and the first
+    ``max_errors`` of them are kept in :attr:`errors`; the counters in
+    :attr:`stats` cover all of them, so memory stays bounded however many
+    rows are rejected.
+    """
+
+    def __init__(self, on_conflict='skip', batch_size=1000, commit_every=10, workers=0, progress=None,
+                 on_error=None, max_errors=1000):
+        if on_conflict not in CONFLICT_STRATEGIES:
+            raise ValueError(f'Unknown conflict strategy {on_conflict!r}')
+        self.on_conflict = on_conflict
+        self.batch_size = max(1, batch_size)
+        self.commit_every = max(1, commit_every)
+        self.workers = workers or os.cpu_count() or 1
+        self.progress = progress
+        self.stats = {'read': 0, 'inserted': 0, 'updated': 0, 'skipped': 0, 'conflicts': 0,
+                      'duplicates': 0, 'invalid': 0, 'hashed': 0}
+        self.committed = 0
+        self.on_error = on_error
+        self.max_errors = max_errors
+        self.errors = []
+        self._pool = None
+
+    def run(self, records):
+        """
+        Imports ``(line_number, record)`` pairs, e.g. from :func:`read_rows`.
+
+        Returns:
+            dict: The counters; the first rejected rows are listed in :attr:`errors`.
+
+        Raises:
+            ImportAborted: On a conflict with ``fail``, or when the database
+                rejects a batch; the open transaction is rolled back.
+        """
+        started = time.perf_counter()
+        pending = deque()
+        uncommitted = 0
+        try:
+            for batch in _batches(records, self.batch_size):
+                pending.append(self._prepare(batch))
+                if len(pending) < 2:
+                    continue
+                self._write(*pending.popleft())
+                uncommitted += 1
+                if uncommitted >= self.commit_every:
+                    self._commit()
+                    uncommitted = 0
+                    self._report(started)
+            while pending:
+                self._write(*pending.popleft())
+            self._commit()
+        except BaseException:
+            db.session.rollback()
+            raise
+        finally:
+            if self._pool is not None:
+                self._pool.shutdown(cancel_futures=True)
+                self._pool = None
+        self._report(started)
+
+        if self.stats['updated'] and 'availability_filter' in current_app.extensions:
+            from app.auth.availability import availability
+            availability.rebuild(current_app._get_current_object())
+        return self.stats
+
+    def _reject(self, line_number, reason):
+        if self.on_error is not None:
+            self.on_error(line_number, reason)
+        if len(self.errors) < self.max_errors:
+            self.errors.append((line_number, reason))
+
+    def _commit(self):
+        db.session.commit()
+        self.committed = self.stats['inserted'] + self.stats['updated']
+
+    def _prepare(self, batch):
+        rows = []
+        for line_number, record in batch:
+            self.stats['read'] += 1
+            row, reason = clean_row(record)
+            if row is None:
+                self.stats['invalid'] += 1
+                self._reject(line_number, reason)
+                continue
+            row['line'] = line_number
+            rows.append(row)
+        plain = [row['password'] for row in rows if row['password']]
+        return rows, self._hash(plain) if plain else iter(())
+
+    def _hash(self, passwords):
+        state = current_app.extensions['passwords']
+        algorithm, params = state['backend'].name, state['params']
+        self.stats['hashed'] += len(passwords)
+        if self.workers <= 1:
+            return iter([_hash_password(algorithm, params, password) for password in passwords])
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        # map() submits every password now; the hashes are collected when
+        # the batch is written, after the previous batch.
+        chunksize = max(1, len(passwords) // (self.workers * 4))
+        return self._pool.map(_hash_password, repeat(algorithm), repeat(params), passwords, chunksize=chunksize)
+
+    def _existing(self, rows):
+        usernames = {row['username'].lower() for row in rows}
+        emails = {row['email'].lower() for row in rows}
+        by_username, by_email = {}, {}
+        result = db.session.execute(
+            select(User.id, func.lower(User.username), func.lower(User.email))
+            .where(or_(func.lower(User.username).in_(usernames), func.lower(User.email).in_(emails)))
+        )
+        for user_id, username, email in result:
+            by_username[username] = user_id
+            by_email[email] = user_id
+        return by_username, by_email
+
+    def _write(self, rows, hashes):
+        for row in rows:
+            if row['password']:
+                row['password_hash'] = next(hashes)
+        if not rows:
+            return
+        by_username, by_email = self._existing(rows)
+        inserts, updates = [], []
+        seen_usernames, seen_emails = set(), set()
+        for row in rows:
+            username, email = row['username'].lower(), row['email'].lower()
+            if username in seen_usernames or email in seen_emails:
+                self.stats['duplicates'] += 1
+                self._reject(row['line'], 'repeats a username or email in the same batch')
+                continue
+            seen_usernames.add(username)
+            seen_emails.add(email)
+
+            matches = {by_username.get(username), by_email.get(email)} - {None}
+            if not matches:
+                inserts.append({key: row[key] for key in EXPORT_FIELDS})
+            elif self.on_conflict == 'fail':
+                raise ImportAborted(f"line {row['line']}: username or email already exists")
+            elif self.on_conflict == 'skip':
+                self.stats['skipped'] += 1
+            elif len(matches) > 1:
+                self.stats['conflicts'] += 1
+                self._reject(row['line'], 'username and email belong to different users')
+            else:
+                updates.append({'b_id': matches.pop(), 'b_username': row['username'],
+                                'b_email': row['email'], 'b_password_hash': row['password_hash']})
+
+        try:
+            if inserts:
+                result = db.session.execute(self._insert_statement(), inserts)
+                inserted = result.rowcount if result.rowcount >= 0 else len(inserts)
+                self.stats['inserted'] += inserted
+                self.stats['skipped'] += len(inserts) - inserted
+            if updates:
+                table = User.__table__
+                db.session.execute(
+                    update(table).where(table.c.id == bindparam('b_id')).values(
+                        username=bindparam('b_username'),
+                        email=bindparam('b_email'),
+                        # Rows without a password keep the stored one.
+                        password_hash=func.coalesce(bindparam('b_password_hash'), table.c.password_hash),
+                    ),
+                    updates,
+                )
+                self.stats['updated'] += len(updates)
+        except IntegrityError as e:
+            raise ImportAborted(f"rows from line {rows[0]['line']} were rejected: {e.orig}") from None
+
+    def _insert_statement(self):
+        # A user registered between the conflict check and the INSERT is
+        # skipped rather than failing the batch, except with 'fail'.
+        table = User.__table__
+        dialect = db.engine.dialect.name
+        if self.on_conflict == 'fail':
+            return insert(table)
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+            return sqlite_insert(table).on_conflict_do_nothing()
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+            return postgresql_insert(table).on_conflict_do_nothing()
+        if dialect in ('mysql', 'mariadb'):
+            return insert(table).prefix_with('IGNORE')
+        return insert(table)
+
+    def _report(self, started):
+        if self.progress is None:
+            return
+        elapsed = time.perf_counter() - started
+        stats = self.stats
+        self.progress(
+            f"{stats['read']} rows read, {stats['inserted']} inserted, {stats['updated']} updated, "
+            f"{stats['skipped'] + stats['conflicts'] + stats['duplicates'] + stats['invalid']} rejected "
+            f"({stats['read'] / elapsed if elapsed else 0:.0f} rows/s)"
+        )
+
+
+def export_users(stream, fmt, batch_size=5000, progress=None):
+    """
+    Writes every user to a stream as CSV or JSONL, ordered by id.
+
+    Rows are fetched ``batch_size`` at a time (``yield_per``, which uses a
+    server-side cursor where the driver has one), so memory stays flat
+    however large the table is. The output can be imported again; the
+    password hashes are copied as they are.
+
+    Returns:
+        int: The number of users written.
+    """
+    query = (
+        select(*(getattr(User, field) for field in EXPORT_FIELDS))
+        .order_by(User.id)
+        .execution_options(yield_per=batch_size)
+    )
+    if fmt == 'csv':
+        writer = csv.writer(stream)
+        writer.writerow(EXPORT_FIELDS)
+        write = writer.writerow
+    else:
+        def write(row):
+            stream.write(json.dumps(dict(zip(EXPORT_FIELDS, row)), ensure_ascii=False) + '\n')
+
+    started = time.perf_counter()
+    count = 0
+    for row in db.session.execute(query):
+        write(tuple(row))
+        count += 1
+        if progress is not None and count % (batch_size * 10) == 0:
+            progress(f'{count} users exported ({count / (time.perf_counter() - started):.0f} rows/s)')
+    return count
+
+
+def _progress(message):
+    click.echo(message, err=True)
+
+
+def _rejected(line_number, reason):
+    click.echo(f'line {line_number}: {reason}', err=True)
+
+
+@users_cli.command('import')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False, allow_dash=True))
+@click.option('--format', 'fmt', type=click.Choice(FORMATS), help='Defaults to the file extension.')
+@click.option('--on-conflict', type=click.Choice(CONFLICT_STRATEGIES), default='skip', show_default=True,
+              help='What to do with rows whose username or email exists.')
+@click.option('--batch-size', type=int, default=None, help='Rows per INSERT (USERS_IMPORT_BATCH_SIZE).')
+@click.option('--commit-every', type=int, default=None,
+              help='Batches per transaction (USERS_IMPORT_COMMIT_EVERY).')
+@click.option('--workers', type=int, default=None,
+              help='Password hashing processes (USERS_IMPORT_WORKERS, 0 for one per CPU).')
+def import_command(path, fmt, on_conflict, batch_size, commit_every, workers):
+    """Import users from a CSV or JSONL file ('-' for stdin)."""
+    config = current_app.config
+    importer = UserImport(
+        on_conflict=on_conflict,
+        batch_size=batch_size or config['USERS_IMPORT_BATCH_SIZE'],
+        commit_every=commit_every or config['USERS_IMPORT_COMMIT_EVERY'],
+        workers=config['USERS_IMPORT_WORKERS'] if workers is None else workers,
+        progress=_progress,
+        on_error=_rejected,
+        max_errors=0,
+    )
+    fmt = detect_format(path, fmt)
+    try:
+        with open_stream(path, 'r') as stream:
+            stats = importer.run(read_rows(stream, fmt))
+    except ImportAborted as e:
+        raise click.ClickException(f'{e} ({importer.committed} users were imported or updated before this)')
+    click.echo(
+        f"Imported {stats['inserted']} users, updated {stats['updated']}, skipped {stats['skipped']} existing, "
+        f"{stats['conflicts']} conflicting, {stats['duplicates']} duplicate and {stats['invalid']} invalid rows"
+    )
+
+
+@users_cli.command('export')
+@click.argument('path', type=click.Path(dir_okay=False, allow_dash=True))
+@click.option('--format', 'fmt', type=click.Choice(FORMATS), help='Defaults to the file extension.')
+@click.option('--batch-size', type=int, default=None, help='Rows fetched at a time (USERS_EXPORT_BATCH_SIZE).')
+def export_command(path, fmt, batch_size):
+    """Export users to a CSV or JSONL file ('-' for stdout)."""
+    fmt = detect_format(path, fmt)
+    with open_stream(path, 'w') as stream:
+        count = export_users(stream, fmt, batch_size or current_app.config['USERS_EXPORT_BATCH_SIZE'], _progress)
+    click.echo(f'Exported {count} users', err=path == '-')
@@ -0,0 +1,52 @@
+from datetime import datetime, timedelta, timezone
+import click
+from flask import current_app
+from sqlalchemy import delete, select
+from app.auth import bp
+from app.extensions import db
+from app.models import PasswordResetRequest
+
+
+def prune_reset_requests(older_than, batch_size=1000):
+    """
+    Deletes password reset requests older than a cutoff, in batches.
+
+    Each batch selects the oldest ids through the ``timestamp`` index and
+    deletes them by primary key in its own transaction, so the job never
+    holds a long write lock on the table.
+
+    Args:
+        older_than (timedelta): Age beyond which requests are deleted.
+        batch_size (int): Rows deleted per transaction.
+
+    Returns:
+        int: The number of rows deleted.
+    """
+    cutoff = datetime.now(timezone.utc) - older_than
+    deleted = 0
+    while True:
+        ids = db.session.scalars(
+            select(PasswordResetRequest.id)
+            .where(PasswordResetRequest.timestamp < cutoff)
+            .order_by(PasswordResetRequest.timestamp)
+            .limit(batch_size)
+        ).all()
+        if not ids:
+            break
+        db.session.execute(delete(PasswordResetRequest).where(PasswordResetRequest.id.in_(ids)))
+        db.session.commit()
+        deleted += len(ids)
+        if len(ids) < batch_size:
+            break
+    return deleted
+
+
+@bp.cli.command('prune-resets')
+@click.option('--older-than', type=int, default=None,
+              help='Age in seconds (defaults to RESET_TOKEN_MAX_AGE).')
+@click.option('--batch-size', type=int, default=1000, show_default=True)
+def prune_resets_command(older_than, batch_size):
+    """Delete expired password reset requests in batches."""
+    seconds = older_than or current_app.config['RESET_TOKEN_MAX_AGE']
+    deleted = prune_reset_requests(timedelta(seconds=seconds), batch_size)
+    click.echo(f'Deleted {deleted} password reset requests older than {seconds}s')
@@ -1,5 +1,5 @@
 from flask_wtf import FlaskForm
-from wtforms import StringField, PasswordField, SubmitField
+from wtforms import BooleanField, StringField, PasswordField, SubmitField
 from wtforms.validators import DataRequired, Email, EqualTo, Length
 from app.auth.validators import UniqueUsername, UniqueEmail
 
@@ -15,6 +15,7 @@ class LoginForm(FlaskForm):
     password = PasswordField('Password', validators=[
         DataRequired(message='Password is required.')
     ])
+    remember = BooleanField('Remember me')
     submit = SubmitField('Login')
 
 
@@ -43,3 +44,30 @@ class RegistrationForm(FlaskForm):
     ])
     submit = SubmitField('Register')
 
+
+
+class RequestResetForm(FlaskForm):
+    """
+    Form for users to request a password reset link.
+    """
+    email = StringField('Email', validators=[
+        DataRequired(message='Email is required.'),
+        Email(message='Enter a valid email address.'),
+        Length(max=120, message='Email must be less than 120 characters.')
+    ])
+    submit = SubmitField('Request Password Reset')
+
+
+class ResetPasswordForm(FlaskForm):
+    """
+    Form for users to choose a new password.
+    """
+    password = PasswordField('New Password', validators=[
+        DataRequired(message='Password is required.'),
+        Length(min=8, message='Password must be at least 8 characters long.')
+    ])
+    confirm_password = PasswordField('Confirm Password', validators=[
+        DataRequired(message='Please confirm your password.'),
+        EqualTo('password', message='Passwords must match.')
+    ])
+    submit = SubmitField('Reset Password')
@@ -1,19 +1,126 @@
-from flask import render_template
+from flask import flash, g, jsonify, redirect, render_template, request, session, url_for
+from sqlalchemy import func
 from app.auth import bp
+from app.auth.availability import availability
+from app.auth.forms import LoginForm, RegistrationForm, RequestResetForm, ResetPasswordForm
+from app.auth.tokens import revoke_reset_token, verify_reset_token
+from app.auth.user_cache import user_cache
+from app.auth.validators import normalize
+from app.extensions import db, passwords
+from app.models import User
+from app.passwords import PasswordHasherBusy
+from app.utils import send_reset_email
 
-@bp.route('/login')
+class AnonymousUser:
+    is_authenticated = False
+    is_active = False
+    is_anonymous = True
+    username = None
+
+
+def load_current_user():
+    """
+    Returns the logged-in user, loaded at most once per request.
+
+    Returns:
+        UserSnapshot: The user from ``session['user_id']`` (see
+            ``app.auth.user_cache``), or an AnonymousUser.
+    """
+    if 'current_user' not in g:
+        user_id = session.get('user_id')
+        user = user_cache.get(user_id) if user_id is not None else None
+        g.current_user = user or AnonymousUser()
+    return g.current_user
+
+@bp.app_context_processor
+def inject_current_user():
+    return {'current_user': load_current_user()}
+
+@bp.route('/login', methods=['GET', 'POST'])
 def login():
-    return render_template('auth/login.html')
+    form = LoginForm()
+    if form.validate_on_submit():
+        user = db.session.execute(
+            db.select(User).where(func.lower(User.email) == normalize(form.email.data))
+        ).scalar_one_or_none()
+        try:
+            if user is None:
+                valid = passwords.verify_dummy(form.password.data)
+            else:
+                valid = user.check_password(form.password.data)
+        except PasswordHasherBusy:
+            return render_template('auth/login.html', form=form), 503, {'Retry-After': '5'}
+
+        if valid:
+            session.clear()
+            session['user_id'] = user.id
+            session.permanent = form.remember.data
+            # check_password may have upgraded the stored hash.
+            db.session.commit()
+            return redirect(url_for('main.home'))
+        flash('Invalid email or password.', 'error')
+    return render_template('auth/login.html', form=form)
+
+@bp.route('/logout')
+def logout():
+    session.clear()
+    return redirect(url_for('main.home'))
 
 @bp.route('/register')
 def register():
-    return render_template('auth/register.html')
+    return render_template('auth/register.html', form=RegistrationForm())
 
-@bp.route('/reset_password')
-def reset_password():
-    return render_template('auth/reset_password.html')
+@bp.route('/check-availability')
+def check_availability():
+    """
+    Reports whether a username and/or email is already taken.
 
-@bp.route('/reset_request')
-def reset_request():
-    return render_template('auth/reset_request.html')
+    Query args ``username`` and ``email`` are both optional. Values the
+    availability filter has never seen are answered without a database query.
+    """
+    username = request.args.get('username', '').strip()
+    email = request.args.get('email', '').strip()
+    if not username and not email:
+        return jsonify(error='Pass a username and/or email.'), 400
+    if len(username) > 50 or len(email) > 120:
+        return jsonify(error='Value too long.'), 400
+
+    taken = availability.check(username=username or None, email=email or None)
+    result = {}
+    if username:
+        result['username'] = {'value': username, 'available': not taken['username']}
+    if email:
+        result['email'] = {'value': email, 'available': not taken['email']}
+    return jsonify(result)
 
+@bp.route('/reset_password/<token>', methods=['GET', 'POST'])
+def reset_password(token):
+    user = verify_reset_token(token)
+    if user is None:
+        flash('That reset link is invalid or has expired.', 'error')
+        return redirect(url_for('auth.reset_request'))
+
+    form = ResetPasswordForm()
+    if form.validate_on_submit():
+        user.set_password(form.password.data)
+        revoke_reset_token(token)
+        db.session.commit()
+        flash('Your password has been updated. You can now log in.', 'success')
+        return redirect(url_for('auth.login'))
+    return render_template('auth/reset_password.html', form=form, token=token)
+
+@bp.route('/reset_request', methods=['GET', 'POST'])
+def reset_request():
+    form = RequestResetForm()
+    if form.validate_on_submit():
+        user = db.session.execute(
+            db.select(User).where(func.lower(User.email) == normalize(form.email.data))
+        ).scalar_one_or_none()
+        if user is None:
+            flash('That email is not registered. Please register first.', 'error')
+            return render_template('auth/reset_request.html', form=form)
+        # Only queues the message; the mail worker talks to SMTP.
+        send_reset_email(user)
+        flash('Check your email for the instructions to reset your password.', 'info')
+        return redirect(url_for('auth.login'))
+    return render_template('auth/reset_request.html', form=form)
@@ -0,0 +1,113 @@
+import hashlib
+import hmac
+import secrets
+from functools import lru_cache
+from flask import current_app
+from itsdangerous import BadData, URLSafeTimedSerializer
+from app.auth import bp
+from app.cache import LRUCacheBackend
+from app.extensions import db
+from app.models import User
+
+TOKEN_SALT = 'password-reset'
+
+
+@bp.record_once
+def init_reset_tokens(state):
+    config = state.app.config
+    state.app.extensions['reset_token_revocations'] = LRUCacheBackend(
+        max_entries=config['RESET_TOKEN_REVOCATION_MAX'],
+        max_bytes=config['RESET_TOKEN_REVOCATION_MAX'],
+        default_ttl=config['RESET_TOKEN_MAX_AGE'],
+        sizeof=lambda value: 1,
+    )
+
+
+@lru_cache(maxsize=4)
+def _serializer(secret_key):
+    return URLSafeTimedSerializer(secret_key, salt=TOKEN_SALT)
+
+
+def password_fingerprint(user):
+    """
+    Derives a short fingerprint of the user's current password hash.
+
+    Embedding it in a token ties the token to the password it was issued
+    for: once the password changes, every outstanding token stops verifying.
+
+    Args:
+        user (User): The user.
+
+    Returns:
+        str: 16 hex characters.
+    """
+    key = current_app.config['SECRET_KEY'].encode('utf-8')
+    message = (user.password_hash or '').encode('utf-8')
+    return hmac.new(key, message, hashlib.sha256).hexdigest()[:16]
+
+
+def generate_reset_token(user):
+    """
+    Issues a signed, timestamped password reset token.
+
+    Validity comes from the signature, the timestamp and the password
+    fingerprint, so no database row is needed to check the token later.
+
+    Args:
+        user (User): The user who requested the reset.
+
+    Returns:
+        str: The URL-safe token.
+    """
+    payload = {'uid': user.id, 'fp': password_fingerprint(user), 'jti': secrets.token_hex(8)}
+    return _serializer(current_app.config['SECRET_KEY']).dumps(payload)
+
+
+def _load(token, max_age):
+    try:
+        payload = _serializer(current_app.config['SECRET_KEY']).loads(token, max_age=max_age)
+    except BadData:
+        return None
+    if not isinstance(payload, dict) or not {'uid', 'fp', 'jti'} <= payload.keys():
+        return None
+    return payload
+
+
+def verify_reset_token(token, max_age=None):
+    """
+    Verifies a password reset token.
+
+    Args:
+        token (str): The token to verify.
+        max_age (int): Maximum token age in seconds (defaults to
+            ``RESET_TOKEN_MAX_AGE``).
+
+    Returns:
+        User: The user the token was issued to, or None if the token is
+            invalid, expired, revoked or issued for an older password.
+    """
+    payload = _load(token, max_age or current_app.config['RESET_TOKEN_MAX_AGE'])
+    if payload is None:
+        return None
+    if current_app.extensions['reset_token_revocations'].get(payload['jti']) is not None:
+        return None
+    user = db.session.get(User, payload['uid'])
+    if user is None or not hmac.compare_digest(payload['fp'], password_fingerprint(user)):
+        return None
+    return user
+
+
+def revoke_reset_token(token):
+    """
+    Marks a token as used so it cannot be replayed in this worker.
+
+    Changing the password already invalidates the token everywhere through
+    its fingerprint; the revocation cache covers the window before the
+    change is committed and tokens that must be withdrawn without one.
+
+    Args:
+        token (str): The token to revoke.
+    """
+    payload = _load(token, None)
+    if payload is not None:
+        current_app.extensions['reset_token_revocations'].set(payload['jti'], True)
@@ -0,0 +1,168 @@
+from flask import current_app, g, has_app_context
+from sqlalchemy import event, select
+from sqlalchemy.orm import object_session
+from app.cache import LRUCacheBackend
+from app.extensions import db
+from app.models import User
+
+
+class UserSnapshot:
+    """
+    The fields of a User that pages need on every request.
+
+    Detached from the database session, so it can be shared between
+    requests and threads; code that changes a user loads the ORM row.
+    """
+    __slots__ = ('id', 'username', 'email')
+
+    is_authenticated = True
+    is_active = True
+    is_anonymous = False
+
+    def __init__(self, id, username, email):
+        self.id = id
+        self.username = username
+        self.email = email
+
+    def __repr__(self):
+        return f'<UserSnapshot {self.username}>'
+
+
+class UserCache:
+    """
+    Cache of :class:`UserSnapshot` objects in front of the user lookups.
+
+    A user is looked up at most once per request (memoised on ``g``) and,
+    across requests, served from a per-process LRU for ``USER_CACHE_TTL``
+    seconds. A miss selects only the snapshot columns instead of building
+    an ORM instance. Changes made through the ORM in this process drop the
+    user's entry (``after_update``/``after_delete``, and again after the
+    commit); changes made by other processes or by bulk UPDATE statements
+    show up once the entry expires.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if not app.config['USER_CACHE_ENABLED']:
+            return
+        app.extensions['user_cache'] = {
+            'backend': LRUCacheBackend(
+                max_entries=app.config['USER_CACHE_MAX_ENTRIES'],
+                max_bytes=app.config['USER_CACHE_MAX_ENTRIES'],
+                default_ttl=app.config['USER_CACHE_TTL'],
+                sizeof=lambda snapshot: 1,
+            ),
+            'stats': {'request_hits': 0, 'hits': 0, 'misses': 0, 'invalidations': 0},
+        }
+
+    def _state(self):
+        if not has_app_context():
+            return None
+        return current_app.extensions.get('user_cache')
+
+    def _query(self, user_id):
+        row = db.session.execute(
+            select(User.id, User.username, User.email).where(User.id == user_id)
+        ).one_or_none()
+        return UserSnapshot(*row) if row is not None else None
+
+    def get(self, user_id):
+        """
+        Returns the snapshot of a user.
+
+        Args:
+            user_id (int): The user's primary key.
+
+        Returns:
+            UserSnapshot: The user, or None if there is no such user.
+        """
+        memo = g.setdefault('_user_snapshots', {})
+        if user_id in memo:
+            state = self._state()
+            if state is not None:
+                state['stats']['request_hits'] += 1
+            return memo[user_id]
+
+        state = self._state()
+        if state is None:
+            memo[user_id] = self._query(user_id)
+            return memo[user_id]
+        snapshot = state['backend'].get(user_id)
+        if snapshot is not None:
+            state['stats']['hits'] += 1
+        else:
+            state['stats']['misses'] += 1
+            snapshot = self._query(user_id)
+            if snapshot is not None:
+                state['backend'].set(user_id, snapshot)
+        memo[user_id] = snapshot
+        return snapshot
+
+    def invalidate(self, user_id):
+        """
+        Drops a user's cached snapshot.
+
+        Args:
+            user_id (int): The user's primary key.
+        """
+        state = self._state()
+        if state is not None:
+            state['backend'].delete(user_id)
+            state['stats']['invalidations'] += 1
+        if has_app_context():
+            g.get('_user_snapshots', {}).pop(user_id, None)
+
+    def clear(self):
+        state = self._state()
+        if state is not None:
+            state['backend'].clear()
+
+    def stats(self):
+        """
+        Returns the cache counters of the current worker.
+
+        Returns:
+            dict: Request-level and cross-request hits, misses,
+                invalidations, the number of cached users and the hit rate.
+        """
+        state = self._state()
+        if state is None:
+            return {'enabled': False}
+        stats = dict(state['stats'])
+        lookups = stats['request_hits'] + stats['hits'] + stats['misses']
+        stats.update(
+            enabled=True,
+            size=len(state['backend']),
+            hit_rate=(stats['request_hits'] + stats['hits']) / lookups if lookups else 0.0,
+        )
+        return stats
+
+
+user_cache = UserCache()
+
+_PENDING_KEY = 'user_cache_invalidate'
+
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _invalidate_user(mapper, connection, target):
+    user_cache.invalidate(target.id)
+    # Another request may re-cache the old row before this transaction
+    # commits, so the entry is dropped once more after the commit.
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault(_PENDING_KEY, set()).add(target.id)
+
+
+@event.listens_for(db.session, 'after_commit')
+def _invalidate_committed(session):
+    for user_id in session.info.pop(_PENDING_KEY, ()):
+        user_cache.invalidate(user_id)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _forget_rolled_back(session):
+    session.info.pop(_PENDING_KEY, None)
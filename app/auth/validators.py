@@ -1,6 +1,75 @@
+from sqlalchemy import exists, func, select
 from wtforms.validators import ValidationError
+from app.extensions import db
 from app.models import User
 
+
+def normalize(value):
+    """
+    Normalizes a username or email for case-insensitive comparison.
+
+    Args:
+        value (str): The raw value.
+
+    Returns:
+        str: The stripped, lower-cased value.
+    """
+    return (value or '').strip().lower()
+
+
+def check_availability(username=None, email=None):
+    """
+    Checks whether a username and/or email is already taken.
+
+    Both checks are ``EXISTS`` subqueries against the ``lower()`` expression
+    indexes, combined into a single SELECT, so no User rows are loaded and
+    the database is hit once.
+
+    Args:
+        username (str): Username to check, or None to skip.
+        email (str): Email to check, or None to skip.
+
+    Returns:
+        dict: ``{'username': bool, 'email': bool}``; True means taken. A
+            skipped check is reported as False.
+    """
+    columns = []
+    if username:
+        columns.append(exists().where(func.lower(User.username) == normalize(username)).label('username'))
+    if email:
+        columns.append(exists().where(func.lower(User.email) == normalize(email)).label('email'))
+    if not columns:
+        return {'username': False, 'email': False}
+
+    row = db.session.execute(select(*columns)).one()._mapping
+    return {'username': bool(row.get('username')), 'email': bool(row.get('email'))}
+
+
+def form_availability(form):
+    """
+    Returns the availability of the form's username and email fields.
+
+    The result is memoized on the form, so UniqueUsername and UniqueEmail
+    share one round trip when a form such as RegistrationForm validates.
+
+    Args:
+        form (Form): The form being validated.
+
+    Returns:
+        dict: As returned by :func:`check_availability`.
+    """
+    availability = getattr(form, '_availability', None)
+    if availability is None:
+        username = getattr(form, 'username', None)
+        email = getattr(form, 'email', None)
+        availability = check_availability(
+            username=username.data if username is not None else None,
+            email=email.data if email is not None else None,
+        )
+        form._availability = availability
+    return availability
+
+
 class UniqueUsername:
     """
     Custom validator to check if the username is already in use.
@@ -13,7 +82,7 @@ class UniqueUsername:
 
     def __call__(self, form, field):
         """
-        Check if the username exists in the database.
+        Check if the username exists in the database, ignoring case.
 
         Args:
             form (Form): The form instance.
@@ -22,7 +91,11 @@ class UniqueUsername:
         Raises:
             ValidationError: If the username already exists.
         """
-        if User.query.filter_by(username=field.data).first():
+        if field is getattr(form, 'username', None):
+            taken = form_availability(form)['username']
+        else:
+            taken = check_availability(username=field.data)['username']
+        if taken:
             raise ValidationError(self.message)
 
 
@@ -38,7 +111,7 @@ class UniqueEmail:
 
     def __call__(self, form, field):
         """
-        Check if the email exists in the database.
+        Check if the email exists in the database, ignoring case.
 
         Args:
             form (Form): The form instance.
@@ -47,6 +120,9 @@ class UniqueEmail:
         Raises:
             ValidationError: If the email already exists.
         """
-        if User.query.filter_by(email=field.data).first():
+        if field is getattr(form, 'email', None):
+            taken = form_availability(form)['email']
+        else:
+            taken = check_availability(email=field.data)['email']
+        if taken:
             raise ValidationError(self.message)
-
@@ -0,0 +1,92 @@
+import hashlib
+import math
+import struct
+
+HEADER = struct.Struct('>4sQIQ')
+MAGIC = b'BLM1'
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter over strings.
+
+    Membership tests never give false negatives; false positives happen at
+    roughly ``error_rate`` once ``capacity`` items have been added. Bit
+    positions come from one BLAKE2b digest split into two 64-bit hashes
+    (Kirsch-Mitzenmacher double hashing).
+
+    Args:
+        capacity (int): Number of items the filter is sized for.
+        error_rate (float): Target false-positive probability at capacity.
+    """
+
+    def __init__(self, capacity=100000, error_rate=0.01, num_bits=None, num_hashes=None):
+        if num_bits is None:
+            num_bits = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        if num_hashes is None:
+            num_hashes = max(1, round(num_bits / capacity * math.log(2)))
+        self.num_bits = num_bits
+        self.num_hashes = num_hashes
+        self.bits = bytearray((num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1, h2 = struct.unpack('>QQ', digest)
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def add(self, item):
+        """
+        Adds an item to the filter.
+
+        Args:
+            item (str): The item to add.
+        """
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        bits = self.bits
+        return all(bits[p >> 3] & (1 << (p & 7)) for p in self._positions(item))
+
+    def estimated_error_rate(self):
+        """
+        Estimates the current false-positive probability from the fill level.
+
+        Returns:
+            float: The expected false-positive rate for a random lookup.
+        """
+        return (1 - math.exp(-self.num_hashes * self.count / self.num_bits)) ** self.num_hashes
+
+    def to_bytes(self):
+        """
+        Serializes the filter.
+
+        Returns:
+            bytes: A header followed by the bit array.
+        """
+        return HEADER.pack(MAGIC, self.num_bits, self.num_hashes, self.count) + bytes(self.bits)
+
+    @classmethod
+    def from_bytes(cls, data):
+        """
+        Restores a filter serialized with :meth:`to_bytes`.
+
+        Args:
+            data (bytes): The serialized filter.
+
+        Returns:
+            BloomFilter: The restored filter.
+
+        Raises:
+            ValueError: If the data is not a serialized filter.
+        """
+        magic, num_bits, num_hashes, count = HEADER.unpack_from(data)
+        if magic != MAGIC or len(data) - HEADER.size != (num_bits + 7) // 8:
+            raise ValueError('Not a serialized Bloom filter')
+        bloom = cls(num_bits=num_bits, num_hashes=num_hashes)
+        bloom.bits = bytearray(data[HEADER.size:])
+        bloom.count = count
+        return bloom
@@ -0,0 +1,357 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+import click
+from flask import current_app, g, request, session
+from flask.cli import AppGroup
+from app.compression import available_encodings
+
+
+class CacheBackend:
+    """
+    Interface for the key/value stores behind the response cache.
+    """
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def set(self, key, value, ttl=None):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def delete_prefix(self, prefix):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+
+class NullCacheBackend(CacheBackend):
+    """
+    Backend that stores nothing; used when caching is disabled.
+    """
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value, ttl=None):
+        pass
+
+    def delete(self, key):
+        pass
+
+    def delete_prefix(self, prefix):
+        pass
+
+    def clear(self):
+        pass
+
+
+class LRUCacheBackend(CacheBackend):
+    """
+    In-process LRU cache bounded by entry count, total size and TTL.
+
+    Args:
+        max_entries (int): Maximum number of entries kept.
+        max_bytes (int): Maximum total size of the entries, as reported by
+            ``sizeof``.
+        default_ttl (float): Lifetime in seconds for entries stored without one.
+        sizeof (callable): Returns the size of a value (defaults to ``len``).
+    """
+
+    def __init__(self, max_entries=1024, max_bytes=32 * 1024 * 1024, default_ttl=300, sizeof=len):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.sizeof = sizeof
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, size, value = entry
+            if expires < time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        size = self.sizeof(value)
+        if size > self.max_bytes:
+            return
+        expires = time.monotonic() + (self.default_ttl if ttl is None else ttl)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (expires, size, value)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def delete_prefix(self, prefix):
+        with self._lock:
+            for key in [k for k in self._entries if k.startswith(prefix)]:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+
+class SQLiteCacheBackend(CacheBackend):
+    """
+    Cache stored in a SQLite file so that every worker process shares it.
+
+    Args:
+        path (str): Path of the SQLite database file.
+        default_ttl (float): Lifetime in seconds for entries stored without one.
+    """
+
+    def __init__(self, path, default_ttl=300):
+        self.path = path
+        self.default_ttl = default_ttl
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connection()
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS cache ('
+            'key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL NOT NULL)'
+        )
+        conn.execute('CREATE INDEX IF NOT EXISTS ix_cache_expires ON cache (expires)')
+
+    def _connection(self):
+        # Connections must not cross a fork, so they are keyed by pid too.
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key):
+        row = self._connection().execute(
+            'SELECT value FROM cache WHERE key = ? AND expires >= ?', (key, time.time())
+        ).fetchone()
+        return pickle.loads(row[0]) if row else None
+
+    def set(self, key, value, ttl=None):
+        expires = time.time() + (self.default_ttl if ttl is None else ttl)
+        self._connection().execute(
+            'INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)',
+            (key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), expires),
+        )
+
+    def delete(self, key):
+        self._connection().execute('DELETE FROM cache WHERE key = ?', (key,))
+
+    def delete_prefix(self, prefix):
+        self._connection().execute(
+            'DELETE FROM cache WHERE substr(key, 1, ?) = ?', (len(prefix), prefix)
+        )
+
+    def clear(self):
+        self._connection().execute('DELETE FROM cache')
+
+    def purge_expired(self):
+        """
+        Deletes every expired entry.
+
+        Returns:
+            int: The number of rows removed.
+        """
+        return self._connection().execute('DELETE FROM cache WHERE expires < ?', (time.time(),)).rowcount
+
+
+def _response_size(value):
+    return len(value[2])
+
+
+def is_authenticated():
+    """
+    Reports whether the current request belongs to a logged-in user.
+
+    Returns:
+        bool: True when the session carries a user id.
+    """
+    return session.get('user_id') is not None
+
+
+class ResponseCache:
+    """
+    Full-page cache for views that render the same output for every
+    anonymous visitor.
+
+    Responses are stored after the ``after_request`` hooks have run, so a
+    hit skips both the template render and any response compression. Keys
+    include the negotiated content coding and the auth state; requests from
+    logged-in users always bypass the cache, and responses whose render
+    wrote to the session or generated a CSRF token are never stored.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        config = app.config
+        backend = config['RESPONSE_CACHE_BACKEND']
+        ttl = config['RESPONSE_CACHE_DEFAULT_TTL']
+        if backend == 'memory':
+            backend = LRUCacheBackend(
+                max_entries=config['RESPONSE_CACHE_MAX_ENTRIES'],
+                max_bytes=config['RESPONSE_CACHE_MAX_BYTES'],
+                default_ttl=ttl,
+                sizeof=_response_size,
+            )
+        elif backend == 'sqlite':
+            path = config['RESPONSE_CACHE_PATH'] or os.path.join(app.instance_path, 'response_cache.db')
+            backend = SQLiteCacheBackend(path, default_ttl=ttl)
+        else:
+            backend = NullCacheBackend()
+
+        app.extensions['response_cache'] = {
+            'backend': backend,
+            'stats': {'hits': 0, 'misses': 0, 'bypasses': 0, 'stores': 0},
+        }
+        app.after_request(self._store)
+
+    @property
+    def backend(self):
+        return current_app.extensions['response_cache']['backend']
+
+    def stats(self):
+        """
+        Returns the hit/miss counters of the current worker.
+
+        Returns:
+            dict: Counts of hits, misses, bypasses and stores.
+        """
+        return dict(current_app.extensions['response_cache']['stats'])
+
+    def _count(self, name):
+        current_app.extensions['response_cache']['stats'][name] += 1
+
+    def make_key(self):
+        """
+        Builds the cache key for the current request.
+
+        Returns:
+            str: ``endpoint:full_path|coding|auth``.
+        """
+        coding = request.accept_encodings.best_match(available_encodings()) or 'identity'
+        auth = 'user' if is_authenticated() else 'anon'
+        return f'{request.endpoint}:{request.full_path}|{coding}|{auth}'
+
+    def cached(self, timeout=None):
+        """
+        Decorator that serves a view from the response cache.
+
+        Args:
+            timeout (float): Lifetime of cached entries in seconds (defaults to
+                ``RESPONSE_CACHE_DEFAULT_TTL``).
+        """
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if request.method not in ('GET', 'HEAD') or is_authenticated():
+                    self._count('bypasses')
+                    return view(*args, **kwargs)
+
+                key = self.make_key()
+                entry = self.backend.get(key)
+                if entry is not None:
+                    self._count('hits')
+                    g._response_cache_hit = True
+                    status, headers, body = entry
+                    response = current_app.response_class(body, status=status, headers=headers)
+                    response.headers['X-Cache'] = 'HIT'
+                    return response
+
+                self._count('misses')
+                g._response_cache_key = (key, timeout)
+                return view(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def _store(self, response):
+        pending = g.pop('_response_cache_key', None)
+        if pending is None or g.get('_response_cache_hit'):
+            return response
+        if (response.status_code != 200 or response.is_streamed
+                or 'Set-Cookie' in response.headers
+                or response.cache_control.private or response.cache_control.no_store):
+            return response
+        # The session cookie is only written after the after_request hooks,
+        # so a render that touched the session (or embedded a CSRF token,
+        # which is per-visitor even when the session already held it) is
+        # caught here rather than by the Set-Cookie check.
+        if session.modified or current_app.config.get('WTF_CSRF_FIELD_NAME', 'csrf_token') in g:
+            return response
+
+        key, timeout = pending
+        headers = [(k, v) for k, v in response.headers.items() if k.lower() not in ('set-cookie', 'x-cache')]
+        self.backend.set(key, (response.status_code, headers, response.get_data()), timeout)
+        self._count('stores')
+        response.headers['X-Cache'] = 'MISS'
+        return response
+
+    def invalidate(self, endpoint):
+        """
+        Drops every cached response of an endpoint.
+
+        Args:
+            endpoint (str): The endpoint name, e.g. 'main.home'.
+        """
+        self.backend.delete_prefix(f'{endpoint}:')
+
+    def clear(self):
+        """
+        Drops every cached response.
+        """
+        self.backend.clear()
+
+
+cache_cli = AppGroup('cache', help='Manage the full-page response cache.')
+
+
+@cache_cli.command('clear')
+@click.argument('endpoints', nargs=-1)
+def clear_command(endpoints):
+    """Drop cached pages, optionally only for the given ENDPOINTS."""
+    from app.extensions import response_cache
+
+    if endpoints:
+        for endpoint in endpoints:
+            response_cache.invalidate(endpoint)
+        click.echo(f"Invalidated {', '.join(endpoints)}")
+    else:
+        response_cache.clear()
+        click.echo('Cleared the response cache')
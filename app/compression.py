@@ -0,0 +1,122 @@
+import zlib
+from flask import current_app, request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def available_encodings():
+    """
+    Returns the content codings this process can produce, best first.
+
+    Returns:
+        list: 'br' (when the brotli package is installed) and 'gzip'.
+    """
+    return ['br', 'gzip'] if brotli is not None else ['gzip']
+
+
+def gzip_compressor(level):
+    """
+    Creates an incremental gzip encoder.
+
+    Args:
+        level (int): zlib compression level.
+
+    Returns:
+        tuple: ``(compress, finish)`` callables. ``compress`` flushes after
+            each chunk so the client can start decoding immediately.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+
+    def compress(chunk):
+        return compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    return compress, compressor.flush
+
+
+def brotli_compressor(quality):
+    """
+    Creates an incremental brotli encoder.
+
+    Args:
+        quality (int): Brotli quality (0-11).
+
+    Returns:
+        tuple: ``(compress, finish)`` callables.
+    """
+    compressor = brotli.Compressor(quality=quality)
+
+    def compress(chunk):
+        return compressor.process(chunk) + compressor.flush()
+
+    return compress, compressor.finish
+
+
+class Compress:
+    """
+    Optional on-the-fly gzip/brotli compression of dynamic responses.
+
+    Only responses from the blueprints listed in ``COMPRESS_BLUEPRINTS`` are
+    considered. Streamed responses are compressed chunk by chunk, so they
+    keep streaming; buffered responses smaller than ``COMPRESS_MIN_SIZE``
+    are sent as-is.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if app.config['COMPRESS_RESPONSES']:
+            app.after_request(self.after_request)
+
+    def after_request(self, response):
+        config = current_app.config
+        if (request.blueprint not in config['COMPRESS_BLUEPRINTS']
+                or response.status_code < 200 or response.status_code in (204, 304)
+                or response.direct_passthrough
+                or 'Content-Encoding' in response.headers
+                or response.mimetype not in config['COMPRESS_MIMETYPES']):
+            return response
+
+        length = response.content_length
+        if not response.is_streamed and (length or 0) < config['COMPRESS_MIN_SIZE']:
+            return response
+
+        response.vary.add('Accept-Encoding')
+        encoding = request.accept_encodings.best_match(available_encodings())
+        if encoding is None:
+            return response
+
+        if encoding == 'br':
+            compress, finish = brotli_compressor(config['COMPRESS_BROTLI_QUALITY'])
+        else:
+            compress, finish = gzip_compressor(config['COMPRESS_LEVEL'])
+
+        if response.is_streamed:
+            response.response = self._stream(response.response, compress, finish)
+            response.headers.pop('Content-Length', None)
+        else:
+            response.set_data(compress(response.get_data()) + finish())
+
+        response.headers['Content-Encoding'] = encoding
+        etag, weak = response.get_etag()
+        if etag:
+            response.set_etag(f'{etag}-{encoding}', weak)
+        return response
+
+    @staticmethod
+    def _stream(iterable, compress, finish):
+        try:
+            for chunk in iterable:
+                if isinstance(chunk, str):
+                    chunk = chunk.encode('utf-8')
+                data = compress(chunk)
+                if data:
+                    yield data
+            yield finish()
+        finally:
+            if hasattr(iterable, 'close'):
+                iterable.close()
@@ -7,6 +7,209 @@ class Config:
     SECRET_KEY = os.getenv('SECRET_KEY', 'default_secret_key')
     SQLALCHEMY_DATABASE_URI = os.getenv('SQLALCHEMY_DATABASE_URI', 'sqlite:///default.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ENGINE_OPTIONS = {}
+    SQLITE_PRAGMAS = {}
+
+    DATABASE_REPLICA_URIS = tuple(filter(None, os.getenv('DATABASE_REPLICA_URIS', '').split(',')))
+    REPLICA_MAX_LAG = float(os.getenv('REPLICA_MAX_LAG', '5'))
+    REPLICA_LAG_CHECK_INTERVAL = 5
+    REPLICA_PIN_SECONDS = 5
     DEBUG = os.getenv('DEBUG', 'False').lower() in ('true', '1', 't')
     TESTING = os.getenv('TESTING', 'False').lower() in ('true', '1', 't')
 
+    ASSETS_BUILD_DIR = 'build'
+    ASSETS_FINGERPRINT = os.getenv('ASSETS_FINGERPRINT', 'True').lower() in ('true', '1', 't')
+    ASSETS_IMMUTABLE_MAX_AGE = 31536000
+    IMAGE_SOURCE_DIR = 'images'
+    IMAGE_WIDTHS = (320, 640, 1024, 1600)
+    IMAGE_FORMATS = ('avif', 'webp', 'jpeg')
+    IMAGE_QUALITY = int(os.getenv('IMAGE_QUALITY', '80'))
+    FONT_PRELOAD_LIMIT = 2
+
+    COMPRESS_RESPONSES = os.getenv('COMPRESS_RESPONSES', 'False').lower() in ('true', '1', 't')
+    COMPRESS_BLUEPRINTS = ('main', 'auth')
+    COMPRESS_MIMETYPES = ('text/html', 'text/plain', 'application/json')
+    COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', '500'))
+    COMPRESS_LEVEL = 6
+    COMPRESS_BROTLI_QUALITY = 5
+
+    RESPONSE_CACHE_BACKEND = os.getenv('RESPONSE_CACHE_BACKEND', 'memory')
+    RESPONSE_CACHE_PATH = os.getenv('RESPONSE_CACHE_PATH')
+    RESPONSE_CACHE_DEFAULT_TTL = int(os.getenv('RESPONSE_CACHE_DEFAULT_TTL', '300'))
+    RESPONSE_CACHE_MAX_ENTRIES = 1024
+    RESPONSE_CACHE_MAX_BYTES = 32 * 1024 * 1024
+
+    TEMPLATE_BYTECODE_CACHE_DIR = os.getenv('TEMPLATE_BYTECODE_CACHE_DIR')
+    TEMPLATE_WARM_ON_STARTUP = os.getenv('TEMPLATE_WARM_ON_STARTUP', 'False').lower() in ('true', '1', 't')
+    STREAM_TEMPLATES = os.getenv('STREAM_TEMPLATES', 'False').lower() in ('true', '1', 't')
+    STREAM_CHUNK_SIZE = 8192
+
+    AVAILABILITY_FILTER_ENABLED = os.getenv('AVAILABILITY_FILTER_ENABLED', 'True').lower() in ('true', '1', 't')
+    AVAILABILITY_FILTER_CAPACITY = int(os.getenv('AVAILABILITY_FILTER_CAPACITY', '1000000'))
+    AVAILABILITY_FILTER_ERROR_RATE = float(os.getenv('AVAILABILITY_FILTER_ERROR_RATE', '0.01'))
+    AVAILABILITY_FILTER_SNAPSHOT = os.getenv('AVAILABILITY_FILTER_SNAPSHOT')
+    AVAILABILITY_FILTER_REFRESH = 30
+
+    USER_CACHE_ENABLED = os.getenv('USER_CACHE_ENABLED', 'True').lower() in ('true', '1', 't')
+    USER_CACHE_TTL = int(os.getenv('USER_CACHE_TTL', '60'))
+    USER_CACHE_MAX_ENTRIES = 10000
+
+    # flask users import/export: rows per INSERT, INSERT batches per
+    # transaction, password hashing processes (0 = one per CPU) and rows
+    # fetched per round trip when exporting.
+    USERS_IMPORT_BATCH_SIZE = int(os.getenv('USERS_IMPORT_BATCH_SIZE', '1000'))
+    USERS_IMPORT_COMMIT_EVERY = int(os.getenv('USERS_IMPORT_COMMIT_EVERY', '10'))
+    USERS_IMPORT_WORKERS = int(os.getenv('USERS_IMPORT_WORKERS', '0'))
+    USERS_EXPORT_BATCH_SIZE = 5000
+
+    # Limits per endpoint: 'SCOPE COUNT/[N]PERIOD [ALGORITHM]', where SCOPE is
+    # ip, account or route and ALGORITHM sliding-window (default) or
+    # token-bucket. Only RATELIMIT_METHODS requests are counted, unless
+    # RATELIMIT_ENDPOINT_METHODS lists other methods for the endpoint.
+    RATELIMIT_ENABLED = os.getenv('RATELIMIT_ENABLED', 'True').lower() in ('true', '1', 't')
+    RATELIMIT_BACKEND = os.getenv('RATELIMIT_BACKEND', 'memory')
+    RATELIMIT_PATH = os.getenv('RATELIMIT_PATH')
+    RATELIMIT_SHARDS = 64
+    RATELIMIT_PURGE_INTERVAL = 3600
+    RATELIMIT_METHODS = ('POST',)
+    # The availability check is a GET that answers whether an email is
+    # registered, so it is throttled to stop bulk enumeration.
+    RATELIMIT_ENDPOINT_METHODS = {'auth.check_availability': ('GET',)}
+    RATELIMIT_ACCOUNT_FIELDS = ('email', 'username')
+    RATELIMIT_LIMITS = {
+        'auth.login': ('ip 20/minute', 'account 10/15minutes token-bucket'),
+        'auth.reset_request': ('ip 5/15minutes', 'account 3/hour'),
+        'auth.reset_password': ('ip 10/15minutes',),
+        'auth.check_availability': ('ip 60/minute',),
+    }
+
+    PASSWORD_HASH_ALGORITHM = os.getenv('PASSWORD_HASH_ALGORITHM', 'argon2id')
+    PASSWORD_HASH_PARAMS = None
+    PASSWORD_HASH_TARGET_MS = float(os.getenv('PASSWORD_HASH_TARGET_MS', '100'))
+    PASSWORD_CALIBRATE_ON_STARTUP = os.getenv('PASSWORD_CALIBRATE_ON_STARTUP', 'False').lower() in ('true', '1', 't')
+    PASSWORD_CALIBRATION_FILE = os.getenv('PASSWORD_CALIBRATION_FILE')
+    PASSWORD_VERIFY_WORKERS = int(os.getenv('PASSWORD_VERIFY_WORKERS', '0'))
+    PASSWORD_VERIFY_QUEUE = int(os.getenv('PASSWORD_VERIFY_QUEUE', '16'))
+    PASSWORD_VERIFY_TIMEOUT = 10
+
+    RESET_TOKEN_MAX_AGE = 1800
+    RESET_TOKEN_REVOCATION_MAX = 10000
+
+    MAIL_SERVER = os.getenv('MAIL_SERVER', 'localhost')
+    MAIL_PORT = int(os.getenv('MAIL_PORT', '25'))
+    MAIL_USE_TLS = os.getenv('MAIL_USE_TLS', 'False').lower() in ('true', '1', 't')
+    MAIL_USE_SSL = os.getenv('MAIL_USE_SSL', 'False').lower() in ('true', '1', 't')
+    MAIL_USERNAME = os.getenv('MAIL_USERNAME')
+    MAIL_PASSWORD = os.getenv('MAIL_PASSWORD')
+    MAIL_DEFAULT_SENDER = os.getenv('MAIL_DEFAULT_SENDER', MAIL_USERNAME or 'noreply@localhost')
+    MAIL_TIMEOUT = 10
+    MAIL_WORKER_ENABLED = os.getenv('MAIL_WORKER_ENABLED', 'False').lower() in ('true', '1', 't')
+    MAIL_BATCH_SIZE = int(os.getenv('MAIL_BATCH_SIZE', '50'))
+    MAIL_POLL_INTERVAL = 2
+    MAIL_CLAIM_SECONDS = 300
+    MAIL_MAX_ATTEMPTS = int(os.getenv('MAIL_MAX_ATTEMPTS', '5'))
+    MAIL_RETRY_BACKOFF = 30
+    MAIL_RETRY_MAX_DELAY = 3600
+    MAIL_POOL_SIZE = 1
+    MAIL_CONNECTION_IDLE = 30
+
+    UPLOAD_PICTURE_DIR = 'profile_pics'
+    UPLOAD_PICTURE_SIZES = (64, 125, 256)
+    UPLOAD_PLACEHOLDER = 'images/avatar-placeholder.svg'
+    UPLOAD_SPOOL_DIR = os.getenv('UPLOAD_SPOOL_DIR')
+    UPLOAD_MAX_BYTES = int(os.getenv('UPLOAD_MAX_BYTES', str(20 * 1024 * 1024)))
+    UPLOAD_MAX_PIXELS = int(os.getenv('UPLOAD_MAX_PIXELS', '40000000'))
+    UPLOAD_WORKERS = int(os.getenv('UPLOAD_WORKERS', '2'))
+
+    INSTRUMENTATION_ENABLED = os.getenv('INSTRUMENTATION_ENABLED', 'False').lower() in ('true', '1', 't')
+    METRICS_PATH = '/metrics'
+    SERVER_TIMING_HEADER = True
+    PROFILE_DIR = os.getenv('PROFILE_DIR')
+    PROFILE_CONTROL_FILE = os.getenv('PROFILE_CONTROL_FILE')
+    PROFILE_CONTROL_INTERVAL = 2
+
+    QUERY_AUDIT_ENABLED = os.getenv('QUERY_AUDIT_ENABLED', 'False').lower() in ('true', '1', 't')
+    QUERY_AUDIT_SLOW_MS = float(os.getenv('QUERY_AUDIT_SLOW_MS', '100'))
+    QUERY_AUDIT_N_PLUS_ONE = 5
+    QUERY_AUDIT_HISTORY = 50
+    QUERY_AUDIT_PATH = '/_queries'
+    QUERY_AUDIT_TOOLBAR = True
+
+    # memory (this process only), sqlite or filesystem (shared by workers),
+    # or cookie for Flask's signed-cookie sessions.
+    SESSION_BACKEND = os.getenv('SESSION_BACKEND', 'memory')
+    SESSION_PATH = os.getenv('SESSION_PATH')
+    SESSION_MEMORY_MAX_ENTRIES = 10000
+    SESSION_IDLE_TIMEOUT = int(os.getenv('SESSION_IDLE_TIMEOUT', str(24 * 3600)))
+    SESSION_TOUCH_INTERVAL = 300
+    SESSION_TOUCH_BATCH = 100
+    SESSION_TOUCH_FLUSH_INTERVAL = 30
+    SESSION_PURGE_INTERVAL = 3600
+
+    ASGI_THREADS = int(os.getenv('ASGI_THREADS', '32'))
+
+    # python -m app.serve; 0 workers/threads means sized to the host.
+    SERVER_BIND = os.getenv('SERVER_BIND', '0.0.0.0:8000')
+    SERVER_WORKERS = int(os.getenv('SERVER_WORKERS', '0'))
+    SERVER_THREADS = int(os.getenv('SERVER_THREADS', '0'))
+    SERVER_PRELOAD = True
+    SERVER_MAX_REQUESTS = int(os.getenv('SERVER_MAX_REQUESTS', '1000'))
+    SERVER_MAX_REQUESTS_JITTER = 100
+    SERVER_TIMEOUT = 30
+    SERVER_GRACEFUL_TIMEOUT = 30
+    SERVER_KEEPALIVE = 5
+
+
+class DevelopmentConfig(Config):
+    DEBUG = True
+    QUERY_AUDIT_ENABLED = True
+
+
+class TestingConfig(Config):
+    DEBUG = True
+    TESTING = True
+    WTF_CSRF_ENABLED = False
+    SQLALCHEMY_DATABASE_URI = os.getenv('TEST_DATABASE_URI', 'sqlite://')
+    # Fast hashes so tests that create users do not spend seconds hashing.
+    PASSWORD_HASH_ALGORITHM = 'pbkdf2'
+    PASSWORD_HASH_PARAMS = {'iterations': 1000}
+
+
+class ProductionConfig(Config):
+    DEBUG = False
+    TESTING = False
+    PASSWORD_CALIBRATE_ON_STARTUP = True
+    SESSION_BACKEND = os.getenv('SESSION_BACKEND', 'sqlite')
+    RATELIMIT_BACKEND = os.getenv('RATELIMIT_BACKEND', 'sqlite')
+
+    # Pool settings for server databases (PostgreSQL, MySQL). pool_recycle
+    # stays below typical server/proxy idle timeouts; pre-ping replaces
+    # connections that were dropped while idle in the pool.
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': int(os.getenv('DATABASE_POOL_SIZE', '10')),
+        'max_overflow': int(os.getenv('DATABASE_MAX_OVERFLOW', '20')),
+        'pool_timeout': 30,
+        'pool_recycle': 1800,
+        'pool_pre_ping': True,
+    }
+
+    # Per-connection SQLite tuning. WAL lets readers run alongside the single
+    # writer, busy_timeout makes writers wait for the lock instead of failing
+    # with "database is locked", and synchronous=NORMAL is durable in WAL
+    # mode except for the last transactions on power loss.
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT', '5000')),
+        'mmap_size': 256 * 1024 * 1024,
+        'cache_size': -64000,
+        'temp_store': 'MEMORY',
+    }
+
+
+config_by_name = {
+    'development': DevelopmentConfig,
+    'testing': TestingConfig,
+    'production': ProductionConfig,
+    'default': Config,
+}
@@ -0,0 +1,86 @@
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+# Pool sizing options that StaticPool (used for in-memory SQLite) rejects.
+POOL_SIZING_OPTIONS = ('pool_size', 'max_overflow', 'pool_timeout')
+
+
+def is_memory_sqlite(uri):
+    """
+    Reports whether a database URI points at an in-memory SQLite database.
+
+    Args:
+        uri (str): The SQLAlchemy database URI.
+
+    Returns:
+        bool: True for ``sqlite://`` and ``sqlite:///:memory:``.
+    """
+    url = make_url(uri)
+    return url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:')
+
+
+def prepare_engine_options(app):
+    """
+    Drops pool sizing options the configured database cannot use.
+
+    Flask-SQLAlchemy puts in-memory SQLite on a StaticPool, which rejects
+    ``pool_size`` and friends, so a profile written for a server database
+    still works when a test points it at ``sqlite://``. Must run before
+    ``db.init_app``.
+
+    Args:
+        app (Flask): The application instance.
+    """
+    options = app.config.get('SQLALCHEMY_ENGINE_OPTIONS')
+    if options and is_memory_sqlite(app.config['SQLALCHEMY_DATABASE_URI']):
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+            key: value for key, value in options.items() if key not in POOL_SIZING_OPTIONS
+        }
+
+
+def sqlite_pragma_listener(pragmas):
+    """
+    Builds a ``connect`` event listener that applies SQLite PRAGMAs.
+
+    Args:
+        pragmas (dict): PRAGMA names mapped to their values, applied in order.
+
+    Returns:
+        callable: The listener.
+    """
+    statements = [f'PRAGMA {name}={value}' for name, value in pragmas.items()]
+
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for statement in statements:
+                cursor.execute(statement)
+        finally:
+            cursor.close()
+
+    return set_pragmas
+
+
+def configure_database(app, db):
+    """
+    Applies ``SQLITE_PRAGMAS`` to every new connection of the app's SQLite
+    engines, replicas included.
+
+    PRAGMAs such as ``synchronous``, ``busy_timeout`` and ``cache_size`` are
+    per connection, so they are set from a ``connect`` event rather than once.
+    ``journal_mode=WAL`` is persistent but cheap to repeat. Must run after
+    ``db.init_app`` and ``replicas.init_app``, which create the engines
+    without connecting.
+
+    Args:
+        app (Flask): The application instance.
+        db (SQLAlchemy): The Flask-SQLAlchemy extension.
+    """
+    pragmas = app.config['SQLITE_PRAGMAS']
+    if not pragmas:
+        return
+    with app.app_context():
+        replica_engines = app.extensions['replicas']['engines'].values()
+        for engine in [*db.engines.values(), *replica_engines]:
+            if engine.dialect.name == 'sqlite':
+                event.listen(engine, 'connect', sqlite_pragma_listener(pragmas))
@@ -1,6 +1,25 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
+from app.cache import ResponseCache
+from app.compression import Compress
+from app.instrumentation import Instrumentation
+from app.mail import Mailer
+from app.passwords import Passwords
+from app.query_audit import QueryAuditor
+from app.ratelimit import RateLimiter
+from app.replicas import ReplicaRouter, RoutingSession
+from app.sessions import Sessions
+from app.uploads import Uploads
 
-db = SQLAlchemy()
+replicas = ReplicaRouter()
+db = SQLAlchemy(session_options={'class_': RoutingSession, 'router': replicas})
 migrate = Migrate()
-
+compress = Compress()
+instrumentation = Instrumentation()
+response_cache = ResponseCache()
+passwords = Passwords()
+query_auditor = QueryAuditor()
+mail = Mailer()
+uploads = Uploads()
+sessions = Sessions()
+ratelimiter = RateLimiter()
@@ -0,0 +1,356 @@
+import cProfile
+import itertools
+import json
+import os
+import threading
+import time
+import click
+from flask import current_app, g, has_request_context, request
+from flask.cli import AppGroup
+from flask.signals import before_render_template, template_rendered
+from sqlalchemy import event
+
+# Upper bounds (seconds) of the request duration histogram buckets.
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# Exported counters: metric name, EndpointMetrics attribute, help text.
+COUNTERS = (
+    ('requests_total', 'requests', 'Requests handled.'),
+    ('request_seconds_total', 'seconds', 'Wall time spent handling requests.'),
+    ('template_seconds_total', 'template_seconds', 'Time spent rendering templates.'),
+    ('sql_queries_total', 'sql_queries', 'SQL statements executed.'),
+    ('sql_seconds_total', 'sql_seconds', 'Time spent executing SQL statements.'),
+    ('response_bytes_total', 'response_bytes', 'Response body bytes, where the length is known.'),
+)
+
+
+class EndpointMetrics:
+    """
+    Running totals for one endpoint.
+    """
+
+    __slots__ = ('requests', 'seconds', 'template_seconds', 'sql_queries', 'sql_seconds',
+                 'response_bytes', 'buckets')
+
+    def __init__(self):
+        self.requests = 0
+        self.seconds = 0.0
+        self.template_seconds = 0.0
+        self.sql_queries = 0
+        self.sql_seconds = 0.0
+        self.response_bytes = 0
+        self.buckets = [0] * len(DURATION_BUCKETS)
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__ if name != 'buckets'}
+
+
+class Instrumentation:
+    """
+    Opt-in per-request metrics and sampling profiler.
+
+    With ``INSTRUMENTATION_ENABLED`` off, :meth:`init_app` installs nothing,
+    so there is no per-request cost at all. With it on, every request
+    records its wall time, template render time (from Flask's template
+    signals), SQL statement count and time (from cursor events on every
+    engine, replicas included) and response size, aggregated per endpoint.
+    Streamed responses are recorded once their body has been sent.
+
+    The totals are exported in Prometheus text format at ``METRICS_PATH``
+    and, with ``SERVER_TIMING_HEADER``, each response carries a
+    ``Server-Timing`` header for the browser's dev tools. Metrics are per
+    process; scrape every worker.
+
+    The profiler is controlled at runtime through ``PROFILE_CONTROL_FILE``
+    (written by ``flask profiling start``), which workers re-read at most
+    every ``PROFILE_CONTROL_INTERVAL`` seconds. While it is active, every
+    Nth request runs under cProfile and is dumped as a ``.pstats`` file in
+    ``PROFILE_DIR`` (open it with snakeviz, or turn it into a flame graph
+    with flameprof or gprof2dot).
+    """
+
+    def __init__(self, app=None, db=None):
+        if app is not None:
+            self.init_app(app, db)
+
+    def init_app(self, app, db):
+        """
+        Installs the hooks. Must run after ``db.init_app`` and
+        ``replicas.init_app``, and before extensions whose ``after_request``
+        hooks change the body (compression, the response cache), so the
+        recorded size is what goes over the wire.
+
+        Args:
+            app (Flask): The application instance.
+            db (SQLAlchemy): The Flask-SQLAlchemy extension.
+        """
+        if not app.config['INSTRUMENTATION_ENABLED']:
+            return
+        app.extensions['instrumentation'] = {
+            'endpoints': {},
+            'lock': threading.Lock(),
+            'profile': {'every': 0, 'endpoints': (), 'checked_at': 0.0, 'mtime': None},
+            'counter': itertools.count(1),
+            'profiler_lock': threading.Lock(),
+        }
+
+        # Runs first, so the wall time covers the other before_request hooks.
+        app.before_request_funcs.setdefault(None, []).insert(0, self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+        before_render_template.connect(self._before_render, app)
+        template_rendered.connect(self._after_render, app)
+
+        with app.app_context():
+            replica_engines = app.extensions['replicas']['engines'].values()
+            for engine in [*db.engines.values(), *replica_engines]:
+                event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+                event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+
+        app.add_url_rule(app.config['METRICS_PATH'], 'metrics', self.metrics_view)
+
+    def _before_request(self):
+        # Scrapes are neither timed nor profiled, so they do not skew the
+        # metrics they report or take the profiler from a real request.
+        if request.endpoint == 'metrics':
+            return
+        g._instrument = {'start': time.perf_counter(), 'template': 0.0, 'sql_queries': 0, 'sql': 0.0}
+        sample = self._profile_sample()
+        if sample:
+            state = current_app.extensions['instrumentation']
+            # cProfile can only trace one request at a time per process.
+            if state['profiler_lock'].acquire(blocking=False):
+                profiler = cProfile.Profile()
+                g._instrument.update(profiler=profiler, sample=sample)
+                profiler.enable()
+
+    def _before_render(self, sender, template, context, **extra):
+        if has_request_context() and '_instrument' in g:
+            g._instrument['template_start'] = time.perf_counter()
+
+    def _after_render(self, sender, template, context, **extra):
+        if has_request_context() and '_instrument' in g:
+            start = g._instrument.pop('template_start', None)
+            if start is not None:
+                g._instrument['template'] += time.perf_counter() - start
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if has_request_context() and '_instrument' in g:
+            context._instrument_start = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        start = getattr(context, '_instrument_start', None)
+        if start is not None and has_request_context() and '_instrument' in g:
+            g._instrument['sql_queries'] += 1
+            g._instrument['sql'] += time.perf_counter() - start
+
+    def _after_request(self, response):
+        if response.is_streamed and '_instrument' in g:
+            return self._finish_on_close(response)
+        timing = g.pop('_instrument', None)
+        if timing is None:
+            return response
+        elapsed = time.perf_counter() - timing['start']
+        self._finish(current_app._get_current_object(), request.endpoint, elapsed, timing,
+                     response.content_length or 0)
+        self._add_server_timing(response, elapsed, timing)
+        return response
+
+    def _finish_on_close(self, response):
+        """
+        Defers recording a streamed response until its body has been sent.
+
+        The template renders while the body is iterated, after this hook,
+        so the timing stays in ``g`` for the render and SQL hooks and is
+        recorded from ``call_on_close`` with the bytes actually sent. The
+        ``Server-Timing`` header goes out before the body and only covers
+        the time up to the first byte.
+        """
+        app = current_app._get_current_object()
+        endpoint = request.endpoint
+        timing = g._instrument
+        timing['streamed'] = True
+        self._add_server_timing(response, time.perf_counter() - timing['start'], timing)
+
+        # Files sent with direct passthrough know their length and are left
+        # untouched for the server's file wrapper.
+        sent = [response.content_length or 0]
+        if not response.direct_passthrough:
+            response.response = self._count_bytes(response.response, response.iter_encoded(), sent)
+
+        def finish():
+            with app.app_context():
+                self._finish(app, endpoint, time.perf_counter() - timing['start'], timing, sent[0])
+
+        response.call_on_close(finish)
+        return response
+
+    def _count_bytes(self, body, chunks, sent):
+        try:
+            for chunk in chunks:
+                sent[0] += len(chunk)
+                yield chunk
+        finally:
+            close = getattr(body, 'close', None)
+            if close is not None:
+                close()
+
+    def _finish(self, app, endpoint, elapsed, timing, size):
+        profiler = timing.get('profiler')
+        if profiler is not None:
+            profiler.disable()
+            app.extensions['instrumentation']['profiler_lock'].release()
+            self._dump_profile(endpoint, profiler, timing['sample'], elapsed)
+        self._record(endpoint or 'unmatched', elapsed, timing, size)
+
+    def _add_server_timing(self, response, elapsed, timing):
+        if current_app.config['SERVER_TIMING_HEADER']:
+            response.headers.add('Server-Timing', ', '.join((
+                f"app;dur={elapsed * 1000:.1f}",
+                f"db;dur={timing['sql'] * 1000:.1f};desc=\"{timing['sql_queries']} queries\"",
+                f"tpl;dur={timing['template'] * 1000:.1f}",
+            )))
+
+    def _teardown_request(self, exc):
+        # Only reached with the timing still in g when after_request did not
+        # run, or for a streamed response, whose close callback owns the
+        # profiler; make sure a sampled request never leaves it on.
+        timing = g.pop('_instrument', None)
+        if timing is None or timing.get('streamed'):
+            return
+        profiler = timing.get('profiler')
+        if profiler is not None:
+            profiler.disable()
+            current_app.extensions['instrumentation']['profiler_lock'].release()
+
+    def _record(self, endpoint, elapsed, timing, size):
+        state = current_app.extensions['instrumentation']
+        with state['lock']:
+            metrics = state['endpoints'].get(endpoint)
+            if metrics is None:
+                metrics = state['endpoints'][endpoint] = EndpointMetrics()
+            metrics.requests += 1
+            metrics.seconds += elapsed
+            metrics.template_seconds += timing['template']
+            metrics.sql_queries += timing['sql_queries']
+            metrics.sql_seconds += timing['sql']
+            metrics.response_bytes += size
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if elapsed <= bound:
+                    metrics.buckets[i] += 1
+                    break
+
+    def profile_control_path(self, app):
+        return app.config['PROFILE_CONTROL_FILE'] or os.path.join(app.instance_path, 'profiling.json')
+
+    def _profile_sample(self):
+        """Returns the request's sequence number if it is to be profiled, else 0."""
+        app = current_app._get_current_object()
+        settings = app.extensions['instrumentation']['profile']
+        now = time.monotonic()
+        if now - settings['checked_at'] >= app.config['PROFILE_CONTROL_INTERVAL']:
+            settings['checked_at'] = now
+            self._reload_profile_settings(app, settings)
+        if not settings['every']:
+            return 0
+        if settings['endpoints'] and request.endpoint not in settings['endpoints']:
+            return 0
+        number = next(app.extensions['instrumentation']['counter'])
+        return number if number % settings['every'] == 0 else 0
+
+    def _reload_profile_settings(self, app, settings):
+        path = self.profile_control_path(app)
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            settings.update(every=0, endpoints=(), mtime=None)
+            return
+        if mtime == settings['mtime']:
+            return
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        settings.update(every=int(data.get('every', 0)), endpoints=tuple(data.get('endpoints', ())), mtime=mtime)
+
+    def _dump_profile(self, endpoint, profiler, sample, elapsed):
+        directory = current_app.config['PROFILE_DIR'] or os.path.join(current_app.instance_path, 'profiles')
+        os.makedirs(directory, exist_ok=True)
+        name = f"{endpoint or 'unmatched'}-{os.getpid()}-{sample}-{elapsed * 1000:.0f}ms.pstats"
+        profiler.dump_stats(os.path.join(directory, name))
+
+    def snapshot(self):
+        """
+        Returns the per-endpoint totals.
+
+        Returns:
+            dict: Endpoint name mapped to its counters.
+        """
+        state = current_app.extensions['instrumentation']
+        with state['lock']:
+            return {endpoint: metrics.as_dict() for endpoint, metrics in state['endpoints'].items()}
+
+    def render_prometheus(self):
+        """
+        Renders the totals in the Prometheus text exposition format.
+
+        Returns:
+            str: The exposition text.
+        """
+        state = current_app.extensions['instrumentation']
+        with state['lock']:
+            endpoints = sorted(state['endpoints'].items())
+            lines = []
+            for name, attribute, help_text in COUNTERS:
+                lines.append(f'# HELP flask_{name} {help_text}')
+                lines.append(f'# TYPE flask_{name} counter')
+                for endpoint, metrics in endpoints:
+                    lines.append(f'flask_{name}{{endpoint="{endpoint}"}} {getattr(metrics, attribute)}')
+
+            lines.append('# HELP flask_request_duration_seconds Request wall time.')
+            lines.append('# TYPE flask_request_duration_seconds histogram')
+            for endpoint, metrics in endpoints:
+                cumulative = 0
+                for bound, count in zip(DURATION_BUCKETS, metrics.buckets):
+                    cumulative += count
+                    lines.append(f'flask_request_duration_seconds_bucket{{endpoint="{endpoint}",le="{bound}"}} {cumulative}')
+                lines.append(f'flask_request_duration_seconds_bucket{{endpoint="{endpoint}",le="+Inf"}} {metrics.requests}')
+                lines.append(f'flask_request_duration_seconds_sum{{endpoint="{endpoint}"}} {metrics.seconds}')
+                lines.append(f'flask_request_duration_seconds_count{{endpoint="{endpoint}"}} {metrics.requests}')
+        return '\n'.join(lines) + '\n'
+
+    def metrics_view(self):
+        return current_app.response_class(self.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
+
+profiling_cli = AppGroup('profiling', help='Switch the sampling profiler on and off at runtime.')
+
+
+@profiling_cli.command('start')
+@click.option('--every', type=int, default=100, show_default=True, help='Profile every Nth request.')
+@click.option('--endpoint', 'endpoints', multiple=True, help='Only profile these endpoints.')
+def start_command(every, endpoints):
+    """Start sampling requests in every running worker."""
+    from app.extensions import instrumentation
+
+    path = instrumentation.profile_control_path(current_app)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump({'every': every, 'endpoints': list(endpoints)}, f)
+    os.replace(tmp_path, path)
+    click.echo(f'Profiling every {every}th request; workers pick this up within '
+               f"{current_app.config['PROFILE_CONTROL_INTERVAL']}s")
+
+
+@profiling_cli.command('stop')
+def stop_command():
+    """Stop sampling requests."""
+    from app.extensions import instrumentation
+
+    try:
+        os.remove(instrumentation.profile_control_path(current_app))
+    except FileNotFoundError:
+        pass
+    click.echo('Profiling stopped')
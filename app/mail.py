@@ -0,0 +1,450 @@
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import func, select, update
+
+QUEUED = 'queued'
+SENT = 'sent'
+DEAD = 'dead'
+
+def smtp_connect(config):
+    """
+    Opens an authenticated SMTP connection from the ``MAIL_*`` settings.
+
+    Args:
+        config (Config): The application config.
+
+    Returns:
+        smtplib.SMTP: The open connection.
+    """
+    # smtplib (and ssl with it) is only needed by the process that sends.
+    import smtplib
+
+    smtp_class = smtplib.SMTP_SSL if config['MAIL_USE_SSL'] else smtplib.SMTP
+    connection = smtp_class(config['MAIL_SERVER'], config['MAIL_PORT'], timeout=config['MAIL_TIMEOUT'])
+    if config['MAIL_USE_TLS'] and not config['MAIL_USE_SSL']:
+        connection.starttls()
+    if config['MAIL_USERNAME']:
+        connection.login(config['MAIL_USERNAME'], config['MAIL_PASSWORD'])
+    return connection
+
+
+def is_transient(error):
+    """
+    Reports whether a send error should be retried.
+
+    Args:
+        error (Exception): The error raised while sending.
+
+    Returns:
+        bool: True for connection problems and 4xx replies.
+    """
+    import smtplib
+
+    # Network and server-side failures are worth another attempt. Anything
+    # else raised while sending (a 5xx reply, refused recipients, a
+    # malformed message) will fail the same way again and goes straight to
+    # dead.
+    # SMTPException subclasses OSError, so it has to be handled first or
+    # every refusal would look like a network error.
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return bool(error.recipients) and all(
+            400 <= code < 500 for code, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPServerDisconnected):
+        return True
+    if isinstance(error, smtplib.SMTPException):
+        return False
+    return isinstance(error, OSError)
+
+
+class SMTPConnectionPool:
+    """
+    Keeps SMTP connections open between batches.
+
+    A connection is checked out for a batch and returned afterwards. Idle
+    connections older than ``MAIL_CONNECTION_IDLE`` seconds are closed
+    instead of reused, since servers drop idle clients after a while.
+
+    Args:
+        connect (callable): ``connect(config) -> SMTP``.
+        config (Config): The application config.
+        size (int): Maximum number of idle connections kept.
+        idle (float): Seconds an idle connection stays reusable.
+    """
+
+    def __init__(self, connect, config, size=1, idle=30):
+        self.connect = connect
+        self.config = config
+        self.size = size
+        self.idle = idle
+        self.opened = 0
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        now = time.monotonic()
+        with self._lock:
+            while self._idle:
+                returned_at, connection = self._idle.pop()
+                if now - returned_at < self.idle and self._alive(connection):
+                    return connection
+                self._close(connection)
+        self.opened += 1
+        return self.connect(self.config)
+
+    def release(self, connection, broken=False):
+        with self._lock:
+            if broken or len(self._idle) >= self.size:
+                self._close(connection)
+            else:
+                self._idle.append((time.monotonic(), connection))
+
+    def close(self):
+        with self._lock:
+            while self._idle:
+                self._close(self._idle.pop()[1])
+
+    def _alive(self, connection):
+        try:
+            return connection.noop()[0] == 250
+        except Exception:
+            return False
+
+    def _close(self, connection):
+        try:
+            connection.quit()
+        except Exception:
+            pass
+
+
+class Mailer:
+    """
+    Outbound mail through a persistent queue and a background worker.
+
+    :meth:`send` stores the message in the ``mail_queue`` table and returns;
+    nothing touches the network during the request. A worker, either a
+    thread started when ``MAIL_WORKER_ENABLED`` is set or a separate
+    ``flask mail worker`` process, claims up to ``MAIL_BATCH_SIZE`` due
+    messages at a time and sends them over pooled SMTP connections.
+
+    Claiming a message pushes its ``next_attempt_at`` forward by
+    ``MAIL_CLAIM_SECONDS``, so several workers can share the queue and a
+    message held by a worker that died becomes due again. Transient failures
+    are retried with exponential backoff (``MAIL_RETRY_BACKOFF`` doubled per
+    attempt, capped at ``MAIL_RETRY_MAX_DELAY``, with jitter); permanent
+    failures and messages that used up ``MAIL_MAX_ATTEMPTS`` are marked
+    dead and kept for inspection.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['mail'] = {
+            'pool': SMTPConnectionPool(smtp_connect, app.config, size=app.config['MAIL_POOL_SIZE'],
+                                       idle=app.config['MAIL_CONNECTION_IDLE']),
+            'wakeup': threading.Event(),
+            'stop': threading.Event(),
+            'thread': None,
+            'stats': {'enqueued': 0, 'sent': 0, 'retried': 0, 'dead': 0, 'batches': 0,
+                      'send_seconds': 0.0},
+        }
+        if app.config['MAIL_WORKER_ENABLED']:
+            self.start_worker(app)
+
+    def _state(self):
+        return current_app.extensions['mail']
+
+    def send(self, subject, recipients, body, sender=None):
+        """
+        Queues a plain-text message and commits it.
+
+        Args:
+            subject (str): The subject line.
+            recipients (list): Recipient addresses.
+            body (str): The message text.
+            sender (str): The From address (defaults to ``MAIL_DEFAULT_SENDER``).
+
+        Returns:
+            OutgoingMail: The queued message.
+        """
+        from app.extensions import db
+        from app.models import OutgoingMail
+
+        message = OutgoingMail(
+            sender=sender or current_app.config['MAIL_DEFAULT_SENDER'],
+            recipients=','.join(recipients),
+            subject=subject,
+            body=body,
+            next_attempt_at=datetime.utcnow(),
+        )
+        db.session.add(message)
+        db.session.commit()
+        state = self._state()
+        state['stats']['enqueued'] += 1
+        state['wakeup'].set()
+        return message
+
+    def _claim(self, limit):
+        from app.extensions import db
+        from app.models import OutgoingMail
+
+        now = datetime.utcnow()
+        candidates = db.session.execute(
+            select(OutgoingMail.id, OutgoingMail.next_attempt_at)
+            .where(OutgoingMail.status == QUEUED, OutgoingMail.next_attempt_at <= now)
+            .order_by(OutgoingMail.next_attempt_at)
+            .limit(limit)
+        ).all()
+        lease = now + timedelta(seconds=current_app.config['MAIL_CLAIM_SECONDS'])
+        claimed = []
+        for message_id, due in candidates:
+            # Only the worker whose update still sees the old due time wins.
+            result = db.session.execute(
+                update(OutgoingMail)
+                .where(OutgoingMail.id == message_id, OutgoingMail.next_attempt_at == due)
+                .values(next_attempt_at=lease)
+            )
+            if result.rowcount:
+                claimed.append(message_id)
+        db.session.commit()
+        if not claimed:
+            return []
+        return db.session.scalars(
+            select(OutgoingMail).where(OutgoingMail.id.in_(claimed)).order_by(OutgoingMail.id)
+        ).all()
+
+    def _fail(self, message, error, stats):
+        config = current_app.config
+        message.attempts += 1
+        message.last_error = str(error)[:500]
+        if not is_transient(error) or message.attempts >= config['MAIL_MAX_ATTEMPTS']:
+            message.status = DEAD
+            stats['dead'] += 1
+            current_app.logger.warning('Mail %s dead-lettered: %s', message.id, error)
+            return
+        delay = min(config['MAIL_RETRY_BACKOFF'] * 2 ** (message.attempts - 1), config['MAIL_RETRY_MAX_DELAY'])
+        message.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay * random.uniform(0.8, 1.2))
+        stats['retried'] += 1
+
+    def _defer(self, messages, when):
+        # Hands claimed messages back to the queue without counting an attempt.
+        for message in messages:
+            message.next_attempt_at = when
+
+    def process_batch(self):
+        """
+        Sends one batch of due messages.
+
+        The batch shares one pooled connection. When the connection breaks,
+        the message being sent is retried later and the rest of the batch
+        continues on a fresh connection. When no connection can be opened,
+        the rest of the batch is deferred along with the failed message
+        instead of waiting out ``MAIL_TIMEOUT`` once per message.
+
+        Sending stops while the claim still has ``2 * MAIL_TIMEOUT`` seconds
+        to run; the unsent messages become due again at once, so a slow batch
+        never outlives its lease and no other worker sends them twice.
+
+        Returns:
+            int: The number of messages claimed.
+        """
+        from app.extensions import db
+
+        config = current_app.config
+        state = self._state()
+        stats = state['stats']
+        deadline = time.monotonic() + config['MAIL_CLAIM_SECONDS'] - 2 * config['MAIL_TIMEOUT']
+        messages = self._claim(config['MAIL_BATCH_SIZE'])
+        if not messages:
+            return 0
+        pool = state['pool']
+        start = time.perf_counter()
+        connection = None
+        for index, message in enumerate(messages):
+            if time.monotonic() >= deadline:
+                self._defer(messages[index:], datetime.utcnow())
+                break
+            if connection is None:
+                try:
+                    connection = pool.acquire()
+                except Exception as error:
+                    self._fail(message, error, stats)
+                    self._defer(messages[index + 1:], message.next_attempt_at)
+                    break
+            try:
+                connection.send_message(self.build_message(message))
+            except Exception as error:
+                self._fail(message, error, stats)
+                if is_transient(error):
+                    pool.release(connection, broken=True)
+                    connection = None
+                continue
+            message.attempts += 1
+            message.status = SENT
+            message.sent_at = datetime.utcnow()
+            stats['sent'] += 1
+        if connection is not None:
+            pool.release(connection)
+        db.session.commit()
+        stats['batches'] += 1
+        stats['send_seconds'] += time.perf_counter() - start
+        return len(messages)
+
+    def build_message(self, message):
+        """
+        Builds the MIME message for a queued row.
+
+        Args:
+            message (OutgoingMail): The queued message.
+
+        Returns:
+            EmailMessage: The message ready for ``send_message``.
+        """
+        from email.message import EmailMessage
+
+        email = EmailMessage()
+        email['Subject'] = message.subject
+        email['From'] = message.sender
+        email['To'] = message.recipients.replace(',', ', ')
+        email.set_content(message.body)
+        return email
+
+    def flush(self):
+        """
+        Sends batches until no message is due.
+
+        Returns:
+            int: The number of messages claimed.
+        """
+        total = 0
+        while True:
+            claimed = self.process_batch()
+            if not claimed:
+                return total
+            total += claimed
+
+    def run_worker(self, app):
+        """
+        Processes the queue until :meth:`stop_worker` is called.
+
+        Sleeps up to ``MAIL_POLL_INTERVAL`` seconds between empty polls and
+        wakes immediately when this process queues a message.
+
+        Args:
+            app (Flask): The application instance.
+        """
+        state = app.extensions['mail']
+        while not state['stop'].is_set():
+            state['wakeup'].clear()
+            with app.app_context():
+                try:
+                    self.flush()
+                except Exception:
+                    app.logger.exception('Mail worker batch failed')
+            state['wakeup'].wait(app.config['MAIL_POLL_INTERVAL'])
+        state['pool'].close()
+
+    def start_worker(self, app):
+        """
+        Starts the worker in a daemon thread of this process.
+
+        Args:
+            app (Flask): The application instance.
+        """
+        state = app.extensions['mail']
+        if state['thread'] is not None and state['thread'].is_alive():
+            return
+        state['stop'].clear()
+        state['thread'] = threading.Thread(target=self.run_worker, args=(app,), name='mail-worker', daemon=True)
+        state['thread'].start()
+
+    def stop_worker(self, app, timeout=None):
+        """
+        Stops the worker thread after its current batch.
+
+        Args:
+            app (Flask): The application instance.
+            timeout (float): Seconds to wait for the thread.
+        """
+        state = app.extensions['mail']
+        state['stop'].set()
+        state['wakeup'].set()
+        if state['thread'] is not None:
+            state['thread'].join(timeout)
+            state['thread'] = None
+
+    def stats(self):
+        """
+        Returns the worker counters, queue depth by status and throughput.
+
+        Returns:
+            dict: Counters, ``queue`` (messages per status), and
+                ``messages_per_second`` over the time spent sending.
+        """
+        from app.extensions import db
+        from app.models import OutgoingMail
+
+        state = self._state()
+        counts = db.session.execute(
+            select(OutgoingMail.status, func.count()).group_by(OutgoingMail.status)
+        ).all()
+        stats = dict(state['stats'], queue=dict(counts), connections_opened=state['pool'].opened)
+        seconds = stats['send_seconds']
+        stats['messages_per_second'] = round(stats['sent'] / seconds, 1) if seconds else 0.0
+        return stats
+
+
+mail_cli = AppGroup('mail', help='Run and inspect the outbound mail queue.')
+
+
+@mail_cli.command('worker')
+def worker_command():
+    """Send queued mail until interrupted."""
+    from app.extensions import mail
+
+    click.echo('Mail worker started')
+    try:
+        mail.run_worker(current_app._get_current_object())
+    except KeyboardInterrupt:
+        pass
+
+
+@mail_cli.command('flush')
+def flush_command():
+    """Send every due message once and exit."""
+    from app.extensions import mail
+
+    claimed = mail.flush()
+    click.echo(f'Processed {claimed} messages')
+
+
+@mail_cli.command('stats')
+def stats_command():
+    """Show queue depth and worker throughput."""
+    from app.extensions import mail
+
+    for key, value in mail.stats().items():
+        click.echo(f'{key}: {value}')
+
+
+@mail_cli.command('requeue-dead')
+def requeue_dead_command():
+    """Give dead-lettered messages a fresh set of attempts."""
+    from app.extensions import db
+    from app.models import OutgoingMail
+
+    result = db.session.execute(
+        update(OutgoingMail)
+        .where(OutgoingMail.status == DEAD)
+        .values(status=QUEUED, attempts=0, next_attempt_at=datetime.utcnow())
+    )
+    db.session.commit()
+    click.echo(f'Requeued {result.rowcount} messages')
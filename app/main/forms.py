@@ -0,0 +1,22 @@
+from flask_wtf import FlaskForm
+from wtforms import StringField, SubmitField, TextAreaField
+from wtforms.validators import DataRequired, Email, Length
+
+class ContactForm(FlaskForm):
+    """
+    Form for visitors to send a message from the contact page.
+    """
+    name = StringField('Name', validators=[
+        DataRequired(message='Name is required.'),
+        Length(max=100, message='Name must be less than 100 characters.')
+    ])
+    email = StringField('Email', validators=[
+        DataRequired(message='Email is required.'),
+        Email(message='Enter a valid email address.'),
+        Length(max=120, message='Email must be less than 120 characters.')
+    ])
+    message = TextAreaField('Message', validators=[
+        DataRequired(message='Message is required.'),
+        Length(max=5000, message='Message must be less than 5000 characters.')
+    ])
+    submit = SubmitField('Send Message')
@@ -1,19 +1,24 @@
 from flask import render_template
+from app.extensions import response_cache
 from app.main import bp
+from app.main.forms import ContactForm
+from app.templating import render_template_streamed
 
 @bp.route('/')
-def index():
+@response_cache.cached()
+def home():
     return render_template('core/index.html')
 
 @bp.route('/about')
+@response_cache.cached()
 def about():
     return render_template('core/about.html')
 
 @bp.route('/dashboard')
 def dashboard():
-    return render_template('core/dashboard.html')
+    return render_template_streamed('core/dashboard.html')
 
 @bp.route('/contact')
+@response_cache.cached()
 def contact():
-    return render_template('core/contact.html')
-
+    return render_template('core/contact.html', form=ContactForm())
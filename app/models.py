@@ -1,10 +1,51 @@
-from app.extensions import db
+from app.extensions import db, passwords
 
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(64), unique=True, nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
-    password_hash = db.Column(db.String(128))
+    password_hash = db.Column(db.String(255))
+
+    # Case-insensitive lookups compare lower(column) and are served by these
+    # expression indexes (see migration 5f3c2a1b9d7e).
+    __table_args__ = (
+        db.Index('ix_user_username_lower', db.func.lower(username)),
+        db.Index('ix_user_email_lower', db.func.lower(email)),
+    )
+
+    is_authenticated = True
+
+    def set_password(self, password):
+        """
+        Hashes and stores a new password.
+
+        Args:
+            password (str): The plain-text password.
+        """
+        self.password_hash = passwords.hash(password)
+
+    def check_password(self, password):
+        """
+        Verifies a password, upgrading the stored hash if it is outdated.
+
+        When the hash was made with another algorithm or weaker parameters
+        than the current ones, it is replaced; the caller commits.
+
+        Args:
+            password (str): The plain-text password.
+
+        Returns:
+            bool: True if the password matches.
+
+        Raises:
+            PasswordHasherBusy: If the verification pool is saturated.
+        """
+        if not self.password_hash or not passwords.verify(self.password_hash, password):
+            return False
+        if passwords.needs_rehash(self.password_hash):
+            self.set_password(password)
+            passwords.count_rehash()
+        return True
 
     def __repr__(self):
         return f'<User {self.username}>'
@@ -13,8 +54,34 @@ class PasswordResetRequest(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
     token = db.Column(db.String(128), unique=True, nullable=False)
-    timestamp = db.Column(db.DateTime, index=True, default=db.func.now())
+    timestamp = db.Column(db.DateTime(timezone=True), index=True, default=db.func.now())
 
     def __repr__(self):
         return f'<PasswordResetRequest {self.token}>'
 
+
+class OutgoingMail(db.Model):
+    """
+    A message in the outbound mail queue (see app.mail.Mailer).
+    """
+    __tablename__ = 'mail_queue'
+
+    id = db.Column(db.Integer, primary_key=True)
+    sender = db.Column(db.String(120), nullable=False)
+    recipients = db.Column(db.Text, nullable=False)
+    subject = db.Column(db.String(255), nullable=False)
+    body = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(16), nullable=False, default='queued')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=db.func.now())
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=db.func.now())
+    sent_at = db.Column(db.DateTime)
+
+    # The worker polls for queued messages in due order.
+    __table_args__ = (
+        db.Index('ix_mail_queue_status_next_attempt_at', status, next_attempt_at),
+    )
+
+    def __repr__(self):
+        return f'<OutgoingMail {self.id} {self.status}>'
@@ -0,0 +1,383 @@
+import json
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from werkzeug.security import check_password_hash, generate_password_hash
+
+try:
+    import argon2
+except ImportError:  # pragma: no cover - optional dependency
+    argon2 = None
+
+
+class PasswordHasherBusy(Exception):
+    """
+    Raised when the verification pool is full; the caller should answer 503.
+    """
+
+
+class Pbkdf2Backend:
+    """
+    PBKDF2-HMAC-SHA256 in Werkzeug's ``pbkdf2:sha256:<iterations>$salt$hash``
+    format. The cost parameter is the iteration count.
+    """
+
+    name = 'pbkdf2'
+    cost_param = 'iterations'
+    minimum = {'iterations': 600000}
+
+    def hash(self, password, params):
+        return generate_password_hash(password, method=f"pbkdf2:sha256:{params['iterations']}")
+
+    def verify(self, stored, password):
+        return check_password_hash(stored, password)
+
+    def identify(self, stored):
+        return stored.startswith('pbkdf2:')
+
+    def params(self, stored):
+        method = stored.split('$', 1)[0].split(':')
+        return {'iterations': int(method[2]) if len(method) > 2 else 0}
+
+    def scale(self, params, factor):
+        return {'iterations': max(1, int(params['iterations'] * factor))}
+
+
+class ScryptBackend:
+    """
+    scrypt in Werkzeug's ``scrypt:<n>:<r>:<p>$salt$hash`` format. The cost
+    parameter is ``n`` (a power of two); ``r`` and ``p`` stay fixed.
+    """
+
+    name = 'scrypt'
+    cost_param = 'n'
+    minimum = {'n': 2 ** 15, 'r': 8, 'p': 1}
+
+    def hash(self, password, params):
+        return generate_password_hash(password, method=f"scrypt:{params['n']}:{params['r']}:{params['p']}")
+
+    def verify(self, stored, password):
+        return check_password_hash(stored, password)
+
+    def identify(self, stored):
+        return stored.startswith('scrypt:')
+
+    def params(self, stored):
+        method = stored.split('$', 1)[0].split(':')
+        n, r, p = (int(v) for v in method[1:4]) if len(method) > 3 else (0, 0, 0)
+        return {'n': n, 'r': r, 'p': p}
+
+    def scale(self, params, factor):
+        return {**params, 'n': 2 ** max(1, round(math.log2(params['n'] * factor)))}
+
+
+class Argon2Backend:
+    """
+    argon2id via argon2-cffi in the standard PHC string format. The cost
+    parameter is the time cost; memory cost and parallelism stay fixed.
+    """
+
+    name = 'argon2id'
+    cost_param = 'time_cost'
+    minimum = {'time_cost': 2, 'memory_cost': 19456, 'parallelism': 1}
+
+    def _hasher(self, params):
+        return argon2.PasswordHasher(
+            time_cost=params['time_cost'],
+            memory_cost=params['memory_cost'],
+            parallelism=params['parallelism'],
+        )
+
+    def hash(self, password, params):
+        return self._hasher(params).hash(password)
+
+    def verify(self, stored, password):
+        try:
+            return self._hasher(self.params(stored)).verify(stored, password)
+        except argon2.exceptions.VerificationError:
+            return False
+        except argon2.exceptions.InvalidHashError:
+            return False
+
+    def identify(self, stored):
+        return stored.startswith('$argon2')
+
+    def params(self, stored):
+        parameters = argon2.extract_parameters(stored)
+        return {
+            'time_cost': parameters.time_cost,
+            'memory_cost': parameters.memory_cost,
+            'parallelism': parameters.parallelism,
+        }
+
+    def scale(self, params, factor):
+        return {**params, 'time_cost': max(1, round(params['time_cost'] * factor))}
+
+
+def available_backends():
+    """
+    Returns the hashing backends usable in this environment.
+
+    Returns:
+        dict: Backends keyed by algorithm name.
+    """
+    backends = {'pbkdf2': Pbkdf2Backend(), 'scrypt': ScryptBackend()}
+    if argon2 is not None:
+        backends['argon2id'] = Argon2Backend()
+    return backends
+
+
+def calibrate(backend, target, minimum=None, rounds=3):
+    """
+    Finds cost parameters for which one hash takes about ``target`` seconds.
+
+    Starts from the backend's minimum (OWASP-recommended) parameters and
+    scales the cost parameter by the measured ratio until a hash lands
+    within 20% of the target. The result is never below ``minimum``.
+
+    Args:
+        backend: The hashing backend.
+        target (float): Target hashing time in seconds.
+        minimum (dict): Floor for the parameters (defaults to the backend's).
+        rounds (int): Maximum number of rescaling rounds.
+
+    Returns:
+        tuple: ``(params, seconds)`` with the chosen parameters and the
+            measured time of one hash with them.
+    """
+    minimum = minimum or backend.minimum
+    params = dict(minimum)
+    elapsed = 0.0
+    for _ in range(rounds):
+        start = time.perf_counter()
+        backend.hash('calibration-password', params)
+        elapsed = time.perf_counter() - start
+        if abs(elapsed - target) <= target * 0.2:
+            break
+        scaled = backend.scale(params, target / elapsed)
+        if scaled[backend.cost_param] < minimum[backend.cost_param]:
+            break
+        if scaled == params:
+            break
+        params = scaled
+    return params, elapsed
+
+
+class Passwords:
+    """
+    Password hashing service with calibrated cost and bounded verification.
+
+    The algorithm comes from ``PASSWORD_HASH_ALGORITHM`` (``argon2id``,
+    ``scrypt`` or ``pbkdf2``; argon2id falls back to scrypt without
+    argon2-cffi). Cost parameters come from ``PASSWORD_HASH_PARAMS``, else
+    from a calibration file written by ``flask passwords calibrate``, else
+    from calibrating at startup when ``PASSWORD_CALIBRATE_ON_STARTUP`` is
+    set, else from the backend's minimums. Stored hashes from any backend
+    still verify; :meth:`needs_rehash` flags hashes made with another
+    algorithm or a weaker cost so logins can upgrade them.
+
+    Verification runs in a bounded thread pool (hashlib and argon2-cffi
+    release the GIL while hashing). At most ``PASSWORD_VERIFY_WORKERS``
+    hashes run at once and at most ``PASSWORD_VERIFY_QUEUE`` more wait;
+    beyond that :class:`PasswordHasherBusy` is raised immediately, so a
+    login storm cannot tie up every request thread.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        backends = available_backends()
+        algorithm = app.config['PASSWORD_HASH_ALGORITHM']
+        if algorithm not in backends:
+            app.logger.warning('Password hash algorithm %s unavailable, using scrypt', algorithm)
+            algorithm = 'scrypt'
+        backend = backends[algorithm]
+
+        params = app.config['PASSWORD_HASH_PARAMS']
+        if params:
+            params = {**backend.minimum, **params}
+        else:
+            params = self._load_calibration(app, algorithm)
+        if params is None and app.config['PASSWORD_CALIBRATE_ON_STARTUP']:
+            params, _ = calibrate(backend, app.config['PASSWORD_HASH_TARGET_MS'] / 1000)
+            self._save_calibration(app, algorithm, params)
+        if params is None:
+            params = dict(backend.minimum)
+
+        workers = app.config['PASSWORD_VERIFY_WORKERS'] or max(1, (os.cpu_count() or 2) // 2)
+        app.extensions['passwords'] = {
+            'backends': backends,
+            'backend': backend,
+            'params': params,
+            'executor': ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-verify'),
+            'slots': threading.BoundedSemaphore(workers + app.config['PASSWORD_VERIFY_QUEUE']),
+            'stats': {'hashes': 0, 'verifications': 0, 'rehashes': 0, 'rejected': 0},
+        }
+
+    def _state(self):
+        return current_app.extensions['passwords']
+
+    def calibration_path(self, app):
+        return app.config['PASSWORD_CALIBRATION_FILE'] or os.path.join(
+            app.instance_path, 'password_params.json')
+
+    def _load_calibration(self, app, algorithm):
+        try:
+            with open(self.calibration_path(app)) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return data.get(algorithm)
+
+    def _save_calibration(self, app, algorithm, params):
+        path = self.calibration_path(app)
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+        data[algorithm] = params
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_path, path)
+
+    def _backend_for(self, stored):
+        for backend in self._state()['backends'].values():
+            if backend.identify(stored):
+                return backend
+        return None
+
+    def hash(self, password):
+        """
+        Hashes a password with the current algorithm and parameters.
+
+        Args:
+            password (str): The plain-text password.
+
+        Returns:
+            str: The self-describing hash string.
+        """
+        state = self._state()
+        state['stats']['hashes'] += 1
+        return state['backend'].hash(password, state['params'])
+
+    def verify(self, stored, password):
+        """
+        Checks a password against a stored hash in the verification pool.
+
+        Args:
+            stored (str): The stored hash.
+            password (str): The plain-text password.
+
+        Returns:
+            bool: True if the password matches.
+
+        Raises:
+            PasswordHasherBusy: If the pool and its queue are full, or the
+                check did not finish within ``PASSWORD_VERIFY_TIMEOUT``.
+        """
+        state = self._state()
+        backend = self._backend_for(stored or '')
+        if backend is None:
+            return False
+        if not state['slots'].acquire(blocking=False):
+            state['stats']['rejected'] += 1
+            raise PasswordHasherBusy()
+        try:
+            future = state['executor'].submit(backend.verify, stored, password)
+            future.add_done_callback(lambda _: state['slots'].release())
+        except BaseException:
+            state['slots'].release()
+            raise
+        state['stats']['verifications'] += 1
+        try:
+            return future.result(timeout=current_app.config['PASSWORD_VERIFY_TIMEOUT'])
+        except FutureTimeout:
+            raise PasswordHasherBusy() from None
+
+    def verify_dummy(self, password):
+        """
+        Spends the cost of a verification without a stored hash.
+
+        Login calls this for unknown accounts so response times do not
+        reveal which emails are registered.
+
+        Args:
+            password (str): The submitted password.
+
+        Returns:
+            bool: Always False.
+
+        Raises:
+            PasswordHasherBusy: If the verification pool is saturated.
+        """
+        state = self._state()
+        if state.get('dummy') is None:
+            state['dummy'] = state['backend'].hash('dummy-password', state['params'])
+        self.verify(state['dummy'], password)
+        return False
+
+    def needs_rehash(self, stored):
+        """
+        Reports whether a hash should be replaced with a fresh one.
+
+        Hashes made with another algorithm or with a lower cost than the
+        current parameters need a rehash. Stronger hashes are kept, so
+        workers with slightly different calibrations do not undo each
+        other's work.
+
+        Args:
+            stored (str): The stored hash.
+
+        Returns:
+            bool: True if the hash should be upgraded.
+        """
+        state = self._state()
+        backend = self._backend_for(stored or '')
+        if backend is not state['backend']:
+            return True
+        current = backend.params(stored)
+        return any(current.get(key, 0) < value for key, value in state['params'].items())
+
+    def count_rehash(self):
+        self._state()['stats']['rehashes'] += 1
+
+    def stats(self):
+        """
+        Returns the hashing counters and the active algorithm and parameters.
+
+        Returns:
+            dict: Counters plus ``algorithm`` and ``params``.
+        """
+        state = self._state()
+        return dict(state['stats'], algorithm=state['backend'].name, params=dict(state['params']))
+
+
+passwords_cli = AppGroup('passwords', help='Tune password hashing.')
+
+
+@passwords_cli.command('calibrate')
+@click.option('--target-ms', type=float, help='Target hashing time (defaults to PASSWORD_HASH_TARGET_MS).')
+@click.option('--algorithm', help='Algorithm to calibrate (defaults to PASSWORD_HASH_ALGORITHM).')
+def calibrate_command(target_ms, algorithm):
+    """Measure hashing cost and save parameters for every worker to load."""
+    from app.extensions import passwords
+
+    backends = available_backends()
+    algorithm = algorithm or current_app.config['PASSWORD_HASH_ALGORITHM']
+    if algorithm not in backends:
+        raise click.UsageError(f"Unknown or unavailable algorithm '{algorithm}'.")
+    target = (target_ms or current_app.config['PASSWORD_HASH_TARGET_MS']) / 1000
+    params, elapsed = calibrate(backends[algorithm], target)
+    passwords._save_calibration(current_app, algorithm, params)
+    click.echo(f'{algorithm}: {params} ({elapsed * 1000:.0f} ms per hash)')
+    click.echo(f'Saved to {passwords.calibration_path(current_app)}')
@@ -0,0 +1,328 @@
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from flask import current_app, g, has_request_context, jsonify, request
+from markupsafe import escape
+from sqlalchemy import event
+
+# String and numeric literals, and placeholder lists such as IN (?, ?, ?),
+# are collapsed so statements that differ only in their values share a shape.
+LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+PLACEHOLDER = r'(?:\?|%s|%\(\w+\)s|:\w+)'
+PLACEHOLDER_LIST = re.compile(rf'\(\s*{PLACEHOLDER}(?:\s*,\s*{PLACEHOLDER})*\s*\)')
+WHITESPACE = re.compile(r'\s+')
+
+_local = threading.local()
+
+
+def statement_shape(statement):
+    """
+    Normalises a SQL statement so repeats of the same query compare equal.
+
+    Args:
+        statement (str): The SQL sent to the driver.
+
+    Returns:
+        str: The statement with literals and placeholder lists collapsed.
+    """
+    shape = LITERALS.sub('?', statement)
+    shape = PLACEHOLDER_LIST.sub('(?)', shape)
+    return WHITESPACE.sub(' ', shape).strip()
+
+
+def explain_sqlite(cursor, statement, parameters):
+    """
+    Runs ``EXPLAIN QUERY PLAN`` and ``EXPLAIN`` for a SQLite statement.
+
+    The statements go through the raw DB-API connection, so they neither
+    show up in the audit nor fire engine events.
+
+    Args:
+        cursor: The DB-API cursor the statement ran on.
+        statement (str): The statement.
+        parameters: Its bound parameters.
+
+    Returns:
+        dict: ``plan`` (query plan rows as text) and ``opcodes`` (the full
+            VDBE program), or an ``error`` if EXPLAIN failed.
+    """
+    explain_cursor = cursor.connection.cursor()
+    try:
+        plan = explain_cursor.execute(f'EXPLAIN QUERY PLAN {statement}', parameters).fetchall()
+        opcodes = explain_cursor.execute(f'EXPLAIN {statement}', parameters).fetchall()
+    except Exception as error:
+        return {'error': str(error)}
+    finally:
+        explain_cursor.close()
+    return {
+        'plan': [row[-1] for row in plan],
+        'opcodes': [' '.join(str(value) for value in row) for row in opcodes],
+    }
+
+
+class QueryAudit:
+    """
+    The statements run during one request or one block of test code.
+
+    Args:
+        slow_ms (float): Statements at least this slow are reported as slow.
+        n_plus_one (int): A SELECT shape repeated this many times is
+            reported as a likely N+1 pattern.
+        explain (bool): Capture EXPLAIN output for slow SQLite SELECTs.
+    """
+
+    def __init__(self, slow_ms=100, n_plus_one=5, explain=True):
+        self.slow_ms = slow_ms
+        self.n_plus_one = n_plus_one
+        self.explain = explain
+        self.queries = []
+
+    def __len__(self):
+        return len(self.queries)
+
+    def record(self, statement, parameters, seconds, explain=None):
+        self.queries.append({
+            'statement': statement,
+            'shape': statement_shape(statement),
+            'parameters': repr(parameters)[:200],
+            'ms': round(seconds * 1000, 3),
+            'explain': explain,
+        })
+
+    def is_slow(self, seconds):
+        return seconds * 1000 >= self.slow_ms
+
+    def shapes(self):
+        """
+        Groups the statements by shape.
+
+        Returns:
+            dict: Shape mapped to ``count`` and total ``ms``, in first-seen order.
+        """
+        shapes = {}
+        for query in self.queries:
+            entry = shapes.setdefault(query['shape'], {'count': 0, 'ms': 0.0})
+            entry['count'] += 1
+            entry['ms'] = round(entry['ms'] + query['ms'], 3)
+        return shapes
+
+    def n_plus_one_suspects(self):
+        return [
+            {'shape': shape, **entry}
+            for shape, entry in self.shapes().items()
+            if entry['count'] >= self.n_plus_one and shape.upper().startswith('SELECT')
+        ]
+
+    def slow_queries(self):
+        return [query for query in self.queries if query['ms'] >= self.slow_ms]
+
+    def report(self):
+        """
+        Summarises the audit.
+
+        Returns:
+            dict: ``count``, total ``ms``, ``n_plus_one`` suspects, ``slow``
+                queries (with EXPLAIN output where captured) and ``shapes``.
+        """
+        return {
+            'count': len(self.queries),
+            'ms': round(sum(query['ms'] for query in self.queries), 3),
+            'n_plus_one': self.n_plus_one_suspects(),
+            'slow': self.slow_queries(),
+            'shapes': self.shapes(),
+        }
+
+    def format(self):
+        lines = [f"{len(self.queries)} queries:"]
+        for shape, entry in self.shapes().items():
+            lines.append(f"  {entry['count']:>3}x {entry['ms']:8.2f} ms  {shape}")
+        return '\n'.join(lines)
+
+
+def _active_audits():
+    audits = list(getattr(_local, 'audits', ()))
+    if has_request_context():
+        audit = g.get('_query_audit')
+        if audit is not None:
+            audits.append(audit)
+    return audits
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._query_audit_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, '_query_audit_start', None)
+    if start is None:
+        return
+    audits = _active_audits()
+    if not audits:
+        return
+    seconds = time.perf_counter() - start
+    explain = None
+    if (not executemany and conn.dialect.name == 'sqlite'
+            and statement.lstrip().upper().startswith('SELECT')
+            and any(audit.explain and audit.is_slow(seconds) for audit in audits)):
+        explain = explain_sqlite(cursor, statement, parameters)
+    for audit in audits:
+        audit.record(statement, parameters, seconds, explain)
+
+
+def listen(engines):
+    """
+    Attaches the audit listeners to engines that do not have them yet.
+
+    Args:
+        engines (iterable): SQLAlchemy engines.
+
+    Returns:
+        list: The engines that were newly attached.
+    """
+    attached = []
+    for engine in engines:
+        if not event.contains(engine, 'after_cursor_execute', _after_cursor_execute):
+            event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+            attached.append(engine)
+    return attached
+
+
+def _app_engines(app):
+    from app.extensions import db
+
+    with app.app_context():
+        return [*db.engines.values(), *app.extensions['replicas']['engines'].values()]
+
+
+@contextmanager
+def audit_queries(slow_ms=100, n_plus_one=5, explain=True):
+    """
+    Records the statements the current thread runs inside the block.
+
+    Works on the current app's engines, replicas included, whether or not
+    ``QUERY_AUDIT_ENABLED`` is set.
+
+    Yields:
+        QueryAudit: The audit, filled in as the block runs.
+    """
+    app = current_app._get_current_object()
+    attached = listen(_app_engines(app))
+    audit = QueryAudit(slow_ms=slow_ms, n_plus_one=n_plus_one, explain=explain)
+    stack = _local.__dict__.setdefault('audits', [])
+    stack.append(audit)
+    try:
+        yield audit
+    finally:
+        stack.remove(audit)
+        for engine in attached:
+            event.remove(engine, 'before_cursor_execute', _before_cursor_execute)
+            event.remove(engine, 'after_cursor_execute', _after_cursor_execute)
+
+
+@contextmanager
+def assert_max_queries(n, allow_n_plus_one=False, **options):
+    """
+    Fails if the block runs more than ``n`` statements or an N+1 pattern.
+
+    Usable from unittest and pytest alike::
+
+        with assert_max_queries(3):
+            client.get('/dashboard')
+
+    Args:
+        n (int): Maximum number of statements.
+        allow_n_plus_one (bool): Do not fail on repeated SELECT shapes.
+        **options: Passed on to :func:`audit_queries`.
+
+    Yields:
+        QueryAudit: The audit.
+
+    Raises:
+        AssertionError: With the grouped statements, if a limit is exceeded.
+    """
+    with audit_queries(**options) as audit:
+        yield audit
+    if len(audit) > n:
+        raise AssertionError(f'Expected at most {n} queries, got {audit.format()}')
+    suspects = audit.n_plus_one_suspects()
+    if suspects and not allow_n_plus_one:
+        raise AssertionError(f"Likely N+1 query ({suspects[0]['count']}x): {suspects[0]['shape']}")
+
+
+class QueryAuditor:
+    """
+    Development-time audit of every request's SQL.
+
+    With ``QUERY_AUDIT_ENABLED``, each request's statements are grouped by
+    shape. Responses get ``X-Query-Count`` and ``X-Query-Time`` headers;
+    repeated SELECT shapes (``QUERY_AUDIT_N_PLUS_ONE`` or more) and
+    statements slower than ``QUERY_AUDIT_SLOW_MS`` are logged as warnings,
+    the latter with SQLite's EXPLAIN output. The last
+    ``QUERY_AUDIT_HISTORY`` reports are served as JSON at
+    ``QUERY_AUDIT_PATH``, and with ``QUERY_AUDIT_TOOLBAR`` HTML pages get a
+    one-line summary bar linking to them.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Installs the hooks. Must run after ``db.init_app`` and
+        ``replicas.init_app``.
+
+        Args:
+            app (Flask): The application instance.
+        """
+        if not app.config['QUERY_AUDIT_ENABLED']:
+            return
+        listen(_app_engines(app))
+        app.extensions['query_audit'] = {'history': deque(maxlen=app.config['QUERY_AUDIT_HISTORY'])}
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.add_url_rule(app.config['QUERY_AUDIT_PATH'], 'query_audit', self.report_view)
+
+    def _before_request(self):
+        config = current_app.config
+        g._query_audit = QueryAudit(slow_ms=config['QUERY_AUDIT_SLOW_MS'],
+                                    n_plus_one=config['QUERY_AUDIT_N_PLUS_ONE'])
+
+    def _after_request(self, response):
+        audit = g.pop('_query_audit', None)
+        if audit is None or request.endpoint == 'query_audit':
+            return response
+        report = audit.report()
+        response.headers['X-Query-Count'] = str(report['count'])
+        response.headers['X-Query-Time'] = f"{report['ms']:.1f}ms"
+        for suspect in report['n_plus_one']:
+            current_app.logger.warning('Likely N+1 in %s (%dx): %s', request.endpoint, suspect['count'], suspect['shape'])
+        for query in report['slow']:
+            current_app.logger.warning('Slow query in %s (%.1f ms): %s\n%s', request.endpoint, query['ms'],
+                                       query['statement'], '\n'.join((query['explain'] or {}).get('plan', [])))
+        current_app.extensions['query_audit']['history'].append(
+            dict(report, method=request.method, path=request.full_path.rstrip('?'), endpoint=request.endpoint))
+
+        if (current_app.config['QUERY_AUDIT_TOOLBAR'] and response.mimetype == 'text/html'
+                and not response.is_streamed and not response.headers.get('Content-Encoding')):
+            self._inject_toolbar(response, report)
+        return response
+
+    def _inject_toolbar(self, response, report):
+        warnings = len(report['n_plus_one']) + len(report['slow'])
+        color = '#c62828' if warnings else '#2e7d32'
+        bar = (
+            f'<div style="position:fixed;bottom:0;right:0;z-index:9999;padding:4px 8px;'
+            f'font:12px monospace;color:#fff;background:{color}">'
+            f"{report['count']} queries, {report['ms']:.1f} ms, {warnings} warnings "
+            f'<a style="color:#fff" href="{escape(current_app.config["QUERY_AUDIT_PATH"])}">details</a></div>'
+        )
+        body = response.get_data(as_text=True)
+        if '</body>' in body:
+            response.set_data(body.replace('</body>', bar + '</body>', 1))
+
+    def report_view(self):
+        return jsonify(list(current_app.extensions['query_audit']['history'])[::-1])
@@ -0,0 +1,395 @@
+import collections
+import hashlib
+import math
+import os
+import re
+import sqlite3
+import struct
+import threading
+import time
+import click
+from flask import current_app, request
+from flask.cli import AppGroup
+
+RATE = re.compile(r'^(\d+)\s*/\s*(\d*)\s*(second|minute|hour|day)s?$')
+PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+SCOPES = ('ip', 'account', 'route')
+
+
+class TokenBucket:
+    """
+    Allows bursts of up to ``limit`` requests, refilled at ``limit`` per
+    ``period`` seconds.
+
+    State is ``(tokens, updated_at)``.
+    """
+    name = 'token-bucket'
+    STATE = struct.Struct('>dd')
+
+    def __init__(self, limit, period):
+        self.limit = limit
+        self.period = period
+        self.rate = limit / period
+
+    def hit(self, state, now):
+        """
+        Takes one token.
+
+        Args:
+            state: The key's state, or None for a new key.
+            now (float): The current time.
+
+        Returns:
+            tuple: ``(state, allowed, retry_after)``.
+        """
+        tokens, updated = state if state is not None else (self.limit, now)
+        tokens = min(self.limit, tokens + (now - updated) * self.rate)
+        if tokens >= 1:
+            return (tokens - 1, now), True, 0.0
+        return (tokens, now), False, (1 - tokens) / self.rate
+
+    def dumps(self, state):
+        return self.STATE.pack(*state)
+
+    def loads(self, data):
+        return self.STATE.unpack(data)
+
+
+class SlidingWindowLog:
+    """
+    Allows ``limit`` requests in any ``period``-second window.
+
+    State is a deque of the accepted requests' timestamps, oldest first;
+    it never holds more than ``limit`` entries and a rejection does not add
+    one, so each hit is amortised O(1).
+    """
+    name = 'sliding-window'
+
+    def __init__(self, limit, period):
+        self.limit = limit
+        self.period = period
+
+    def hit(self, state, now):
+        log = state if state is not None else collections.deque()
+        cutoff = now - self.period
+        while log and log[0] <= cutoff:
+            log.popleft()
+        if len(log) >= self.limit:
+            return log, False, log[0] + self.period - now
+        log.append(now)
+        return log, True, 0.0
+
+    def dumps(self, state):
+        return struct.pack(f'>{len(state)}d', *state)
+
+    def loads(self, data):
+        return collections.deque(struct.unpack(f'>{len(data) // 8}d', data))
+
+
+ALGORITHMS = {algorithm.name: algorithm for algorithm in (TokenBucket, SlidingWindowLog)}
+
+
+class Limit:
+    """
+    One parsed limit, e.g. ``'ip 20/minute'`` or
+    ``'account 10/15minutes token-bucket'``.
+
+    Args:
+        spec (str): ``SCOPE COUNT/[N]PERIOD [ALGORITHM]``. SCOPE is ``ip``,
+            ``account`` (the submitted email or username) or ``route`` (all
+            clients together); ALGORITHM defaults to ``sliding-window``.
+
+    Raises:
+        ValueError: If the spec is malformed.
+    """
+
+    def __init__(self, spec):
+        parts = spec.split()
+        if len(parts) not in (2, 3) or parts[0] not in SCOPES:
+            raise ValueError(f'Invalid rate limit {spec!r}')
+        match = RATE.match(parts[1])
+        algorithm = ALGORITHMS.get(parts[2] if len(parts) == 3 else SlidingWindowLog.name)
+        if match is None or algorithm is None:
+            raise ValueError(f'Invalid rate limit {spec!r}')
+        count, multiplier, unit = match.groups()
+        self.spec = spec
+        self.scope = parts[0]
+        self.period = int(multiplier or 1) * PERIODS[unit]
+        self.algorithm = algorithm(int(count), self.period)
+
+    def __repr__(self):
+        return f'<Limit {self.spec}>'
+
+
+class MemoryRateLimitBackend:
+    """
+    Rate-limit state in this process, split over ``shards`` dicts with a
+    lock each so concurrent requests for different keys rarely contend.
+
+    Only suitable for a single worker process. Idle keys are swept from a
+    shard once it holds more than ``max_keys`` entries.
+    """
+
+    def __init__(self, shards=64, max_keys=10000):
+        self.max_keys = max_keys
+        self._shards = [(threading.Lock(), {}) for _ in range(shards)]
+
+    def hit(self, key, algorithm, now):
+        lock, entries = self._shards[hash(key) % len(self._shards)]
+        with lock:
+            entry = entries.get(key)
+            state, allowed, retry_after = algorithm.hit(entry[0] if entry else None, now)
+            entries[key] = (state, now + algorithm.period)
+            if entry is None and len(entries) > self.max_keys:
+                for stale in [k for k, (_, expires) in entries.items() if expires < now]:
+                    del entries[stale]
+                # Still full of live keys: drop the oldest down to nine
+                # tenths, so the sweep is not repeated on every new key.
+                if len(entries) > self.max_keys:
+                    for oldest in list(entries)[:max(0, len(entries) - self.max_keys * 9 // 10)]:
+                        del entries[oldest]
+        return allowed, retry_after
+
+    def purge_expired(self):
+        now = time.time()
+        removed = 0
+        for lock, entries in self._shards:
+            with lock:
+                for stale in [k for k, (_, expires) in entries.items() if expires < now]:
+                    del entries[stale]
+                    removed += 1
+        return removed
+
+
+class SQLiteRateLimitBackend:
+    """
+    Rate-limit state in a SQLite file shared by every worker process.
+
+    Each hit is one ``BEGIN IMMEDIATE`` transaction reading and writing a
+    single row, so concurrent workers see each other's requests.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connection().execute(
+            'CREATE TABLE IF NOT EXISTS ratelimit ('
+            'key TEXT PRIMARY KEY, state BLOB NOT NULL, expires REAL NOT NULL) WITHOUT ROWID'
+        )
+
+    def _connection(self):
+        # Connections must not cross a fork, so they are keyed by pid too.
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def hit(self, key, algorithm, now):
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT state FROM ratelimit WHERE key = ?', (key,)).fetchone()
+            state, allowed, retry_after = algorithm.hit(algorithm.loads(row[0]) if row else None, now)
+            conn.execute('INSERT OR REPLACE INTO ratelimit (key, state, expires) VALUES (?, ?, ?)',
+                         (key, algorithm.dumps(state), now + algorithm.period))
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+        return allowed, retry_after
+
+    def purge_expired(self):
+        return self._connection().execute('DELETE FROM ratelimit WHERE expires < ?', (time.time(),)).rowcount
+
+
+class FileSystemRateLimitBackend:
+    """
+    Rate-limit state in one file per key, shared by every worker process.
+
+    Updates hold an exclusive ``flock`` on the key's file, so only requests
+    for the same key wait for each other. The file's modification time is
+    the key's expiry. Needs ``fcntl`` (not available on Windows).
+    """
+
+    def __init__(self, directory):
+        import fcntl
+
+        self._fcntl = fcntl
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def hit(self, key, algorithm, now):
+        name = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        fd = os.open(os.path.join(self.directory, name), os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            self._fcntl.flock(fd, self._fcntl.LOCK_EX)
+            data = os.read(fd, 1 << 16)
+            state, allowed, retry_after = algorithm.hit(algorithm.loads(data) if data else None, now)
+            data = algorithm.dumps(state)
+            os.lseek(fd, 0, os.SEEK_SET)
+            os.write(fd, data)
+            os.ftruncate(fd, len(data))
+            expires = now + algorithm.period
+            os.utime(fd, (expires, expires))
+        finally:
+            os.close(fd)
+        return allowed, retry_after
+
+    def purge_expired(self):
+        now = time.time()
+        removed = 0
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                try:
+                    if entry.stat().st_mtime < now:
+                        os.remove(entry.path)
+                        removed += 1
+                except FileNotFoundError:
+                    pass
+        return removed
+
+
+def client_ip():
+    return request.remote_addr or 'unknown'
+
+
+def submitted_account():
+    """
+    Returns the normalised email or username the request submits, if any.
+    """
+    for field in current_app.config['RATELIMIT_ACCOUNT_FIELDS']:
+        value = request.form.get(field, '').strip().lower()
+        if value:
+            return value[:254]
+    return None
+
+
+class RateLimiter:
+    """
+    Throttles the endpoints listed in ``RATELIMIT_LIMITS``.
+
+    Each endpoint maps to limit specs (see :class:`Limit`) checked, in
+    order, in a ``before_request`` hook for ``RATELIMIT_METHODS`` requests
+    (or the methods ``RATELIMIT_ENDPOINT_METHODS`` lists for the endpoint),
+    before the view runs: a rejected request costs one backend lookup and
+    never reaches the user table or the password hasher. It gets a 429
+    with ``Retry-After``. ``RATELIMIT_BACKEND`` is ``memory`` (this process
+    only), or ``sqlite`` or ``filesystem`` (shared by every worker, at
+    ``RATELIMIT_PATH``, by default in the instance folder); keys whose
+    window has passed are purged every ``RATELIMIT_PURGE_INTERVAL``
+    seconds. If a shared backend fails the request is let through.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if not app.config['RATELIMIT_ENABLED']:
+            return
+        backend = app.config['RATELIMIT_BACKEND']
+        path = app.config['RATELIMIT_PATH']
+        if backend == 'memory':
+            backend = MemoryRateLimitBackend(shards=app.config['RATELIMIT_SHARDS'])
+        elif backend == 'sqlite':
+            backend = SQLiteRateLimitBackend(path or os.path.join(app.instance_path, 'ratelimit.db'))
+        elif backend == 'filesystem':
+            backend = FileSystemRateLimitBackend(path or os.path.join(app.instance_path, 'ratelimit'))
+        else:
+            raise ValueError(f'Unknown RATELIMIT_BACKEND {backend!r}')
+
+        app.extensions['ratelimit'] = {
+            'backend': backend,
+            'limits': {endpoint: [Limit(spec) for spec in specs]
+                       for endpoint, specs in app.config['RATELIMIT_LIMITS'].items()},
+            'methods': frozenset(app.config['RATELIMIT_METHODS']),
+            'endpoint_methods': {endpoint: frozenset(methods) for endpoint, methods
+                                 in app.config['RATELIMIT_ENDPOINT_METHODS'].items()},
+            'purged_at': time.monotonic(),
+            'stats': {'checked': 0, 'rejected': 0, 'errors': 0},
+        }
+        app.before_request(self._before_request)
+
+    def _before_request(self):
+        state = current_app.extensions['ratelimit']
+        limits = state['limits'].get(request.endpoint)
+        if not limits or request.method not in state['endpoint_methods'].get(request.endpoint, state['methods']):
+            return None
+        retry_after = self.check(request.endpoint, limits)
+        if retry_after is None:
+            return None
+        seconds = max(1, math.ceil(retry_after))
+        return current_app.response_class(
+            f'Too many requests. Try again in {seconds} seconds.\n', 429,
+            {'Retry-After': str(seconds)}, mimetype='text/plain')
+
+    def check(self, endpoint, limits):
+        """
+        Counts the current request against limits.
+
+        Args:
+            endpoint (str): The endpoint the limits belong to.
+            limits (list): :class:`Limit` objects.
+
+        Returns:
+            float: Seconds until a retry can succeed if a limit is exceeded,
+                otherwise None.
+        """
+        state = current_app.extensions['ratelimit']
+        state['stats']['checked'] += 1
+        if time.monotonic() - state['purged_at'] >= current_app.config['RATELIMIT_PURGE_INTERVAL']:
+            state['purged_at'] = time.monotonic()
+            self.purge()
+        now = time.time()
+        for index, limit in enumerate(limits):
+            if limit.scope == 'ip':
+                value = client_ip()
+            elif limit.scope == 'account':
+                value = submitted_account()
+                if value is None:
+                    continue
+            else:
+                value = ''
+            key = f'{endpoint}:{index}:{limit.algorithm.name}:{limit.scope}:{value}'
+            try:
+                allowed, retry_after = state['backend'].hit(key, limit.algorithm, now)
+            except (OSError, sqlite3.Error):
+                state['stats']['errors'] += 1
+                current_app.logger.exception('Rate limit backend failed; allowing the request')
+                return None
+            if not allowed:
+                state['stats']['rejected'] += 1
+                return retry_after
+        return None
+
+    def purge(self):
+        """
+        Deletes the state of keys whose windows have passed.
+
+        Returns:
+            int: The number of keys removed.
+        """
+        return current_app.extensions['ratelimit']['backend'].purge_expired()
+
+    def stats(self):
+        return dict(current_app.extensions['ratelimit']['stats'])
+
+
+ratelimit_cli = AppGroup('ratelimit', help='Manage rate-limit state.')
+
+
+@ratelimit_cli.command('purge')
+def purge_command():
+    """Delete the state of keys whose windows have passed."""
+    from app.extensions import ratelimiter
+
+    if 'ratelimit' not in current_app.extensions:
+        raise click.ClickException('Rate limiting is disabled (RATELIMIT_ENABLED).')
+    click.echo(f'Removed {ratelimiter.purge()} expired keys')
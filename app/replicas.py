@@ -0,0 +1,231 @@
+import random
+import time
+from functools import wraps
+from flask import current_app, g, has_request_context, request, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine, text
+from app.database import POOL_SIZING_OPTIONS, is_memory_sqlite
+
+READ_ONLY_METHODS = ('GET', 'HEAD', 'OPTIONS')
+PIN_SESSION_KEY = '_db_primary_until'
+
+
+def postgres_replay_lag(connection):
+    """
+    Lag probe for PostgreSQL streaming replicas.
+
+    Args:
+        connection (Connection): A connection to the replica.
+
+    Returns:
+        float: Seconds since the last replayed transaction (0 on a primary).
+    """
+    return connection.execute(text(
+        'SELECT COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)'
+    )).scalar()
+
+
+def no_lag(connection):
+    """
+    Lag probe for databases without replication metadata; reports no lag.
+    """
+    return 0.0
+
+
+DEFAULT_LAG_PROBES = {'postgresql': postgres_replay_lag}
+
+
+class ReplicaRouter:
+    """
+    Sends reads from read-only requests to replica databases.
+
+    Each URI in ``DATABASE_REPLICA_URIS`` gets its own engine (``replica0``,
+    ``replica1``, ...). :class:`RoutingSession` asks the
+    router for a replica when a SELECT would otherwise go to the default
+    engine. A replica is used only when:
+
+    * the request is a GET/HEAD/OPTIONS and the view is not marked with
+      :meth:`use_primary`,
+    * the request has not written anything (read-your-writes), and the
+      client has not written in the last ``REPLICA_PIN_SECONDS``, tracked in
+      the session cookie so a POST/redirect/GET sees its own data,
+    * its lag, measured by the lag probe at most every
+      ``REPLICA_LAG_CHECK_INTERVAL`` seconds, is within ``REPLICA_MAX_LAG``.
+
+    Everything else, including all reads outside a request, uses the primary.
+    """
+
+    def __init__(self, app=None):
+        self._lag_probe = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """
+        Creates an engine per replica URI. Must run after ``db.init_app``.
+
+        Replica engines get the same ``SQLALCHEMY_ENGINE_OPTIONS`` as the
+        primary. They are kept out of ``SQLALCHEMY_BINDS`` because
+        Flask-SQLAlchemy would then expect a table set per bind.
+
+        Args:
+            app (Flask): The application instance.
+        """
+        options = dict(app.config['SQLALCHEMY_ENGINE_OPTIONS'])
+        engines = {}
+        for i, uri in enumerate(uri for uri in app.config['DATABASE_REPLICA_URIS'] if uri):
+            engine_options = options
+            if is_memory_sqlite(uri):
+                engine_options = {k: v for k, v in options.items() if k not in POOL_SIZING_OPTIONS}
+            engines[f'replica{i}'] = create_engine(uri, **engine_options)
+        app.extensions['replicas'] = {
+            'engines': engines,
+            'lag': {},
+            'stats': {'replica_reads': 0, 'primary_reads': 0, 'lagging': 0},
+        }
+
+    def lag_probe(self, probe):
+        """
+        Registers the function that measures a replica's lag.
+
+        Can be used as a decorator. The probe receives a connection to the
+        replica and returns the lag in seconds. Without one, a probe is picked
+        by dialect (PostgreSQL replay lag, otherwise no lag).
+
+        Args:
+            probe (callable): ``probe(connection) -> float``.
+        """
+        self._lag_probe = probe
+        return probe
+
+    def use_primary(self, view):
+        """
+        Decorator that makes a view read from the primary database.
+        """
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            g._db_use_primary = True
+            return view(*args, **kwargs)
+        return wrapper
+
+    def pin_primary(self):
+        """
+        Sends the rest of the request, and the client's requests for the next
+        ``REPLICA_PIN_SECONDS``, to the primary.
+        """
+        if not has_request_context() or g.get('_db_pinned'):
+            return
+        g._db_pinned = True
+        seconds = current_app.config['REPLICA_PIN_SECONDS']
+        if seconds:
+            session[PIN_SESSION_KEY] = time.time() + seconds
+
+    def _state(self):
+        return current_app.extensions.get('replicas')
+
+    def _replica_allowed(self):
+        if not has_request_context() or request.method not in READ_ONLY_METHODS:
+            return False
+        if g.get('_db_use_primary') or g.get('_db_pinned'):
+            return False
+        return session.get(PIN_SESSION_KEY, 0) < time.time()
+
+    def _lag(self, state, key, engine):
+        checked_at, lag = state['lag'].get(key, (0.0, None))
+        now = time.monotonic()
+        if now - checked_at < current_app.config['REPLICA_LAG_CHECK_INTERVAL']:
+            return lag
+        probe = self._lag_probe or DEFAULT_LAG_PROBES.get(engine.dialect.name, no_lag)
+        try:
+            with engine.connect() as connection:
+                lag = probe(connection)
+        except Exception:
+            current_app.logger.warning('Replica %s lag probe failed', key, exc_info=True)
+            lag = None
+        state['lag'][key] = (now, lag)
+        return lag
+
+    def engines(self):
+        """
+        Returns the current app's replica engines.
+
+        Returns:
+            dict: Engines keyed by replica name.
+        """
+        state = self._state()
+        return state['engines'] if state else {}
+
+    def choose(self):
+        """
+        Picks the engine for a read, or None to use the primary.
+
+        Returns:
+            Engine: A healthy replica engine, or None.
+        """
+        state = self._state()
+        if not state or not state['engines']:
+            return None
+        if not self._replica_allowed():
+            state['stats']['primary_reads'] += 1
+            return None
+
+        # One replica per request keeps its reads on a consistent snapshot.
+        key = g.get('_db_replica')
+        if key is None:
+            max_lag = current_app.config['REPLICA_MAX_LAG']
+            healthy = []
+            for candidate, engine in state['engines'].items():
+                lag = self._lag(state, candidate, engine)
+                if lag is not None and lag <= max_lag:
+                    healthy.append(candidate)
+                else:
+                    state['stats']['lagging'] += 1
+            key = random.choice(healthy) if healthy else False
+            g._db_replica = key
+        if not key:
+            state['stats']['primary_reads'] += 1
+            return None
+        state['stats']['replica_reads'] += 1
+        return state['engines'][key]
+
+    def stats(self):
+        """
+        Returns the routing counters and last measured lag per replica.
+
+        Returns:
+            dict: Read counts by target, lag-guard rejections and lags.
+        """
+        state = self._state()
+        if not state:
+            return {}
+        stats = dict(state['stats'])
+        stats['lag'] = {key: lag for key, (_, lag) in state['lag'].items()}
+        return stats
+
+
+class RoutingSession(Session):
+    """
+    Session that routes SELECTs through the :class:`ReplicaRouter`.
+
+    Flushes and DML statements always go to the primary and pin the request
+    to it. Statements whose kind is unknown (e.g. ``text()``) and models with
+    their own ``__bind_key__`` are never routed.
+    """
+
+    def __init__(self, db, router=None, **kwargs):
+        super().__init__(db, **kwargs)
+        self.router = router
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        engine = super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+        if bind is not None or self.router is None:
+            return engine
+
+        if engine is not self._db.engines.get(None):
+            return engine
+        if self._flushing or getattr(clause, 'is_dml', False):
+            self.router.pin_primary()
+            return engine
+        if getattr(clause, 'is_select', False):
+            return self.router.choose() or engine
+        return engine
@@ -0,0 +1,221 @@
+"""
+Production server: ``python -m app.serve``.
+
+Runs the app under an embedded gunicorn master (waitress on platforms
+without ``fork``). Gunicorn gives graceful reloads and worker recycling:
+
+* ``SIGHUP`` starts new workers and retires the old ones once they finish
+  their requests, so no request is dropped. With preloading, workers are
+  forked from the already loaded app; deploy new code with ``SIGUSR2``
+  (start a new master) followed by ``SIGQUIT`` to the old one, or run with
+  ``--no-preload`` to have ``SIGHUP`` pick it up (changes to this module
+  itself still need a new master).
+* ``--max-requests`` (plus jitter) replaces each worker after that many
+  requests, bounding the damage of slow leaks.
+
+Usage:
+    python -m app.serve [--config production] [--bind 0.0.0.0:8000]
+        [--workers N] [--threads N] [--max-requests N] [--no-preload]
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+from sqlalchemy import text
+
+logger = logging.getLogger('app.serve')
+
+
+def auto_size(cores=None):
+    """
+    Picks worker and thread counts for the host.
+
+    One process per core keeps every core busy with Python code; a few
+    threads per process cover the time requests spend waiting on the
+    database or the network.
+
+    Args:
+        cores (int): CPU count (defaults to the cores this process may use).
+
+    Returns:
+        tuple: ``(workers, threads)``.
+    """
+    if cores is None:
+        cores = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count() or 1
+    return max(2, cores), 4
+
+
+def warm_database(app):
+    """
+    Opens a connection on every engine and runs a trivial query, so the
+    first request does not pay for connecting (and for SQLite PRAGMAs).
+
+    Args:
+        app (Flask): The application instance.
+    """
+    from app.extensions import db
+
+    with app.app_context():
+        for engine in [*db.engines.values(), *app.extensions['replicas']['engines'].values()]:
+            with engine.connect() as connection:
+                connection.execute(text('SELECT 1'))
+
+
+def dispose_engines(app):
+    """
+    Closes every pooled connection. Called in the master before forking: a
+    connection shared by several processes corrupts the protocol stream.
+
+    Args:
+        app (Flask): The application instance.
+    """
+    from app.extensions import db
+
+    with app.app_context():
+        for engine in [*db.engines.values(), *app.extensions['replicas']['engines'].values()]:
+            engine.dispose()
+
+
+def load_app(config_name):
+    """
+    Creates and warms the app, logging how long each step took.
+
+    Args:
+        config_name (str): Key in ``config_by_name``.
+
+    Returns:
+        Flask: The application, ready to be forked.
+    """
+    from app import create_app
+    from app.auth.availability import availability
+    from app.extensions import mail
+    from app.templating import warm_templates
+
+    start = time.perf_counter()
+    app = create_app(config_name)
+    created = time.perf_counter()
+    templates = warm_templates(app)
+    availability.ensure_loaded(app)
+    warmed = time.perf_counter()
+    logger.info('create_app(%r) took %.0f ms; warmed %d templates and the availability filter in %.0f ms',
+                config_name, (created - start) * 1000, len(templates), (warmed - created) * 1000)
+    # Background threads do not survive fork; workers start their own.
+    mail.stop_worker(app, timeout=5)
+    return app
+
+
+def forget_app_modules():
+    """
+    Drops the ``app`` package from ``sys.modules``.
+
+    ``python -m app.serve`` imports the package in the master, and forked
+    workers inherit those modules. Without preloading, each worker calls
+    this before loading the app, so a worker started by ``SIGHUP``
+    imports the code that is on disk now rather than the master's copy.
+    """
+    for name in [name for name in sys.modules if name == 'app' or name.startswith('app.')]:
+        del sys.modules[name]
+
+
+def gunicorn_application(config_name, options):
+    from gunicorn.app.base import BaseApplication
+
+    # Taken before gunicorn preloads the app (which happens before its
+    # on_starting hook), so the master's start-up time includes loading.
+    started_at = time.perf_counter()
+
+    class Server(BaseApplication):
+        def __init__(self):
+            self.flask_app = None
+            super().__init__()
+
+        def load_config(self):
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            if self.flask_app is None:
+                if not self.cfg.preload_app:
+                    forget_app_modules()
+                self.flask_app = load_app(config_name)
+            return self.flask_app
+
+    def when_ready(server):
+        app = server.app.flask_app
+        if app is not None:
+            dispose_engines(app)
+        server.log.info('Master ready in %.0f ms', (time.perf_counter() - started_at) * 1000)
+
+    def post_worker_init(worker):
+        from app.extensions import mail
+
+        start = time.perf_counter()
+        app = worker.wsgi
+        warm_database(app)
+        if app.config['MAIL_WORKER_ENABLED']:
+            mail.start_worker(app)
+        worker.log.info('Worker %s ready in %.0f ms', worker.pid, (time.perf_counter() - start) * 1000)
+
+    options.update(when_ready=when_ready, post_worker_init=post_worker_init)
+    return Server()
+
+
+def serve_waitress(config_name, bind, threads):
+    import waitress
+
+    app = load_app(config_name)
+    warm_database(app)
+    if app.config['MAIL_WORKER_ENABLED']:
+        from app.extensions import mail
+
+        mail.start_worker(app)
+    waitress.serve(app, listen=bind, threads=threads)
+
+
+def main(argv=None):
+    from app.config import config_by_name
+
+    parser = argparse.ArgumentParser(description='Run the app under a production server.')
+    parser.add_argument('--config', default=os.getenv('FLASK_CONFIG', 'production'), choices=sorted(config_by_name))
+    parser.add_argument('--bind', help='Address to listen on (defaults to SERVER_BIND).')
+    parser.add_argument('--workers', type=int, help='Worker processes (defaults to one per core).')
+    parser.add_argument('--threads', type=int, help='Threads per worker (defaults to 4).')
+    parser.add_argument('--max-requests', type=int, help='Recycle a worker after this many requests.')
+    parser.add_argument('--no-preload', action='store_true', help='Load the app in each worker instead of the master.')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    config = config_by_name[args.config]
+    auto_workers, auto_threads = auto_size()
+    bind = args.bind or config.SERVER_BIND
+    workers = args.workers or config.SERVER_WORKERS or auto_workers
+    threads = args.threads or config.SERVER_THREADS or auto_threads
+    max_requests = args.max_requests if args.max_requests is not None else config.SERVER_MAX_REQUESTS
+
+    try:
+        import gunicorn  # noqa: F401
+    except ImportError:
+        gunicorn = None
+    if gunicorn is None or not hasattr(os, 'fork'):
+        logger.info('gunicorn unavailable, serving with waitress on %s (%d threads)', bind, threads * workers)
+        serve_waitress(args.config, bind, threads * workers)
+        return
+
+    logger.info('Serving %s on %s with %d workers x %d threads', args.config, bind, workers, threads)
+    gunicorn_application(args.config, {
+        'bind': bind,
+        'workers': workers,
+        'threads': threads,
+        'worker_class': 'gthread' if threads > 1 else 'sync',
+        'preload_app': config.SERVER_PRELOAD and not args.no_preload,
+        'max_requests': max_requests,
+        'max_requests_jitter': config.SERVER_MAX_REQUESTS_JITTER,
+        'timeout': config.SERVER_TIMEOUT,
+        'graceful_timeout': config.SERVER_GRACEFUL_TIMEOUT,
+        'keepalive': config.SERVER_KEEPALIVE,
+    }).run()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,619 @@
+import os
+import re
+import secrets
+import sqlite3
+import struct
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from flask.sessions import SecureCookieSession, SessionInterface
+from markupsafe import Markup
+
+# 32 random bytes, URL-safe base64 without padding.
+SESSION_ID = re.compile(r'[A-Za-z0-9_-]{43}')
+
+FORMAT_VERSION = 1
+FLOAT = struct.Struct('>d')
+
+
+def new_session_id():
+    return secrets.token_urlsafe(32)
+
+
+def _write_varint(out, n):
+    while n >= 0x80:
+        out.append((n & 0x7f) | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def _read_varint(data, pos):
+    result = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+def _write_bytes(out, tag, data):
+    out += tag
+    _write_varint(out, len(data))
+    out += data
+
+
+def _encode(value, out):
+    if value is None:
+        out += b'N'
+    elif value is True:
+        out += b'T'
+    elif value is False:
+        out += b'F'
+    elif isinstance(value, int):
+        out += b'i'
+        _write_varint(out, value * 2 if value >= 0 else -value * 2 - 1)
+    elif isinstance(value, float):
+        out += b'f'
+        out += FLOAT.pack(value)
+    elif hasattr(value, '__html__'):
+        _write_bytes(out, b'M', str(value.__html__()).encode('utf-8'))
+    elif isinstance(value, str):
+        _write_bytes(out, b's', value.encode('utf-8'))
+    elif isinstance(value, bytes):
+        _write_bytes(out, b'b', value)
+    elif isinstance(value, datetime):
+        _write_bytes(out, b'D', value.isoformat().encode('ascii'))
+    elif isinstance(value, (list, tuple)):
+        out += b'l' if isinstance(value, list) else b't'
+        _write_varint(out, len(value))
+        for item in value:
+            _encode(item, out)
+    elif isinstance(value, dict):
+        out += b'd'
+        _write_varint(out, len(value))
+        for key, item in value.items():
+            _encode(key, out)
+            _encode(item, out)
+    else:
+        raise TypeError(f'Cannot store a {type(value).__name__} in the session')
+
+
+def _decode(data, pos):
+    tag = data[pos:pos + 1]
+    pos += 1
+    if tag == b'N':
+        return None, pos
+    if tag == b'T':
+        return True, pos
+    if tag == b'F':
+        return False, pos
+    if tag == b'i':
+        n, pos = _read_varint(data, pos)
+        return (n >> 1) if not n & 1 else -((n + 1) >> 1), pos
+    if tag == b'f':
+        return FLOAT.unpack_from(data, pos)[0], pos + FLOAT.size
+    if tag in (b's', b'M', b'b', b'D'):
+        length, pos = _read_varint(data, pos)
+        raw = bytes(data[pos:pos + length])
+        if len(raw) != length:
+            raise ValueError('Truncated session data')
+        pos += length
+        if tag == b'b':
+            return raw, pos
+        text = raw.decode('utf-8')
+        if tag == b'M':
+            return Markup(text), pos
+        if tag == b'D':
+            return datetime.fromisoformat(text), pos
+        return text, pos
+    if tag in (b'l', b't'):
+        length, pos = _read_varint(data, pos)
+        items = []
+        for _ in range(length):
+            item, pos = _decode(data, pos)
+            items.append(item)
+        return (items if tag == b'l' else tuple(items)), pos
+    if tag == b'd':
+        length, pos = _read_varint(data, pos)
+        result = {}
+        for _ in range(length):
+            key, pos = _decode(data, pos)
+            result[key], pos = _decode(data, pos)
+        return result, pos
+    raise ValueError(f'Unknown session data tag {tag!r}')
+
+
+def encode_session(data):
+    """
+    Serializes session data into a compact binary form.
+
+    Each value is a one-byte type tag followed by its payload; integers and
+    lengths are varints, so a typical session (a user id, a CSRF token and
+    a flag) takes well under 100 bytes. Supports None, bools, ints, floats,
+    str, bytes, Markup, datetimes, lists, tuples and dicts.
+
+    Args:
+        data (dict): The session contents.
+
+    Returns:
+        bytes: The encoded session.
+
+    Raises:
+        TypeError: If a value has an unsupported type.
+    """
+    out = bytearray([FORMAT_VERSION])
+    _encode(dict(data), out)
+    return bytes(out)
+
+
+def decode_session(payload):
+    """
+    Reverses :func:`encode_session`.
+
+    Args:
+        payload (bytes): The encoded session.
+
+    Returns:
+        dict: The session contents.
+
+    Raises:
+        ValueError: If the payload is corrupt or from another format version.
+    """
+    if not payload or payload[0] != FORMAT_VERSION:
+        raise ValueError('Unknown session format')
+    try:
+        data, pos = _decode(payload, 1)
+    except (IndexError, struct.error, UnicodeDecodeError) as error:
+        raise ValueError('Corrupt session data') from error
+    if pos != len(payload) or not isinstance(data, dict):
+        raise ValueError('Corrupt session data')
+    return data
+
+
+class SessionStore:
+    """
+    Interface for the stores behind server-side sessions.
+
+    Stores hold encoded payloads keyed by session id, with an absolute
+    (``time.time()``) expiry.
+    """
+
+    def load(self, sid):
+        """Returns ``(payload, expires)``, or None if missing or expired."""
+        raise NotImplementedError
+
+    def save(self, sid, payload, expires):
+        raise NotImplementedError
+
+    def touch_many(self, items):
+        """Moves the expiry of several sessions; ``items`` are ``(sid, expires)``."""
+        raise NotImplementedError
+
+    def delete(self, sid):
+        raise NotImplementedError
+
+    def purge_expired(self):
+        """Deletes every expired session and returns how many there were."""
+        raise NotImplementedError
+
+
+class MemorySessionStore(SessionStore):
+    """
+    Sessions kept in this process, least recently used dropped first.
+
+    Only suitable for a single worker process: other workers cannot see
+    the sessions.
+
+    Args:
+        max_entries (int): Maximum number of sessions kept.
+    """
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def load(self, sid):
+        with self._lock:
+            entry = self._entries.get(sid)
+            if entry is None:
+                return None
+            if entry[1] < time.time():
+                # Left for purge_expired (or LRU eviction), like the other
+                # stores leave expired rows and files.
+                return None
+            self._entries.move_to_end(sid)
+            return entry
+
+    def save(self, sid, payload, expires):
+        with self._lock:
+            self._entries[sid] = (payload, expires)
+            self._entries.move_to_end(sid)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def touch_many(self, items):
+        with self._lock:
+            for sid, expires in items:
+                entry = self._entries.get(sid)
+                if entry is not None:
+                    self._entries[sid] = (entry[0], expires)
+
+    def delete(self, sid):
+        with self._lock:
+            self._entries.pop(sid, None)
+
+    def purge_expired(self):
+        now = time.time()
+        with self._lock:
+            expired = [sid for sid, (_, expires) in self._entries.items() if expires < now]
+            for sid in expired:
+                del self._entries[sid]
+        return len(expired)
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Sessions in a SQLite file shared by every worker process.
+
+    Args:
+        path (str): Path of the SQLite database file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connection()
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS sessions ('
+            'sid TEXT PRIMARY KEY, data BLOB NOT NULL, expires REAL NOT NULL) WITHOUT ROWID'
+        )
+        conn.execute('CREATE INDEX IF NOT EXISTS ix_sessions_expires ON sessions (expires)')
+
+    def _connection(self):
+        # Connections must not cross a fork, so they are keyed by pid too.
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def load(self, sid):
+        row = self._connection().execute(
+            'SELECT data, expires FROM sessions WHERE sid = ? AND expires >= ?', (sid, time.time())
+        ).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def save(self, sid, payload, expires):
+        self._connection().execute(
+            'INSERT OR REPLACE INTO sessions (sid, data, expires) VALUES (?, ?, ?)', (sid, payload, expires)
+        )
+
+    def touch_many(self, items):
+        conn = self._connection()
+        conn.execute('BEGIN')
+        try:
+            conn.executemany('UPDATE sessions SET expires = ? WHERE sid = ?',
+                             [(expires, sid) for sid, expires in items])
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+    def delete(self, sid):
+        self._connection().execute('DELETE FROM sessions WHERE sid = ?', (sid,))
+
+    def purge_expired(self):
+        return self._connection().execute('DELETE FROM sessions WHERE expires < ?', (time.time(),)).rowcount
+
+
+class FileSystemSessionStore(SessionStore):
+    """
+    One file per session in a directory shared by every worker process.
+
+    A session's expiry is stored as its file's modification time, so
+    sliding the expiry is a single ``utime`` instead of a rewrite.
+
+    Args:
+        directory (str): Directory holding the session files.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, sid):
+        return os.path.join(self.directory, sid)
+
+    def load(self, sid):
+        path = self._path(sid)
+        try:
+            expires = os.stat(path).st_mtime
+            if expires < time.time():
+                return None
+            with open(path, 'rb') as f:
+                return f.read(), expires
+        except OSError:
+            return None
+
+    def save(self, sid, payload, expires):
+        path = self._path(sid)
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(payload)
+        os.utime(tmp_path, (expires, expires))
+        os.replace(tmp_path, path)
+
+    def touch_many(self, items):
+        for sid, expires in items:
+            try:
+                os.utime(self._path(sid), (expires, expires))
+            except FileNotFoundError:
+                pass
+
+    def delete(self, sid):
+        try:
+            os.remove(self._path(sid))
+        except FileNotFoundError:
+            pass
+
+    def purge_expired(self):
+        now = time.time()
+        removed = 0
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                try:
+                    mtime = entry.stat().st_mtime
+                    # Temporary files left by a crashed writer carry the
+                    # session's expiry too; give live writers a minute.
+                    if mtime < now or (entry.name.endswith('.tmp') and mtime < now - 60):
+                        os.remove(entry.path)
+                        removed += 1
+                except FileNotFoundError:
+                    pass
+        return removed
+
+
+class ServerSideSession(SecureCookieSession):
+    """
+    Session whose data lives in a :class:`SessionStore`; the cookie only
+    carries the random session id.
+    """
+
+    def __init__(self, initial=None, sid=None, expires=None):
+        super().__init__(initial)
+        self.sid = sid
+        self.expires = expires
+        self.rotate = False
+
+    def clear(self):
+        # Clearing happens on login and logout; a new id afterwards means an
+        # id planted in the browser beforehand is worthless.
+        super().clear()
+        self.rotate = True
+
+
+class ServerSideSessionInterface(SessionInterface):
+    """
+    Flask session interface backed by the :class:`Sessions` extension.
+
+    The cookie holds a 256-bit random id instead of the signed session
+    data, so it stays small and needs no HMAC on every response. The store
+    is written only when the session was modified. Unmodified sessions get
+    sliding expiry: once ``SESSION_TOUCH_INTERVAL`` seconds of their
+    lifetime are used up, the new expiry is queued and written in batches
+    (``touch_many``) rather than one write per request.
+    """
+
+    session_class = ServerSideSession
+
+    def __init__(self, sessions):
+        self.sessions = sessions
+
+    def lifetime(self, app, session):
+        if session.permanent:
+            return app.permanent_session_lifetime.total_seconds()
+        return app.config['SESSION_IDLE_TIMEOUT']
+
+    def open_session(self, app, request):
+        state = app.extensions['sessions']
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid and SESSION_ID.fullmatch(sid):
+            record = state['store'].load(sid)
+            if record is not None:
+                try:
+                    data = decode_session(record[0])
+                except ValueError:
+                    app.logger.warning('Discarding unreadable session %s...', sid[:8])
+                else:
+                    state['stats']['loads'] += 1
+                    return self.session_class(data, sid=sid, expires=record[1])
+            state['stats']['misses'] += 1
+        return self.session_class()
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        secure = self.get_cookie_secure(app)
+        samesite = self.get_cookie_samesite(app)
+        httponly = self.get_cookie_httponly(app)
+
+        if session.accessed:
+            response.vary.add('Cookie')
+
+        if not session:
+            if session.sid is not None and (session.modified or session.rotate):
+                self.sessions.delete(app, session.sid)
+                response.delete_cookie(name, domain=domain, path=path, secure=secure,
+                                       samesite=samesite, httponly=httponly)
+                response.vary.add('Cookie')
+            return
+
+        lifetime = self.lifetime(app, session)
+        now = time.time()
+        if session.sid is None or session.modified or session.rotate:
+            if session.sid is not None and session.rotate:
+                self.sessions.delete(app, session.sid)
+                session.sid = None
+            session.sid = session.sid or new_session_id()
+            session.expires = now + lifetime
+            self.sessions.save(app, session.sid, encode_session(session), session.expires)
+        elif session.expires - now < lifetime - app.config['SESSION_TOUCH_INTERVAL']:
+            session.expires = now + lifetime
+            self.sessions.touch(app, session.sid, session.expires)
+        else:
+            # Unchanged and recently extended: the browser's cookie is current.
+            return
+
+        response.vary.add('Cookie')
+        response.set_cookie(name, session.sid, expires=self.get_expiration_time(app, session),
+                            httponly=httponly, domain=domain, path=path, secure=secure, samesite=samesite)
+
+
+class Sessions:
+    """
+    Server-side sessions.
+
+    ``SESSION_BACKEND`` picks the store: ``memory`` (this process only),
+    ``sqlite`` or ``filesystem`` (shared by every worker; the file or
+    directory is ``SESSION_PATH``, by default in the instance folder), or
+    ``cookie`` to keep Flask's signed-cookie sessions. Expired sessions are
+    purged in bulk every ``SESSION_PURGE_INTERVAL`` seconds and by
+    ``flask sessions purge``.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        backend = app.config['SESSION_BACKEND']
+        if backend == 'cookie':
+            return
+        path = app.config['SESSION_PATH']
+        if backend == 'memory':
+            store = MemorySessionStore(max_entries=app.config['SESSION_MEMORY_MAX_ENTRIES'])
+        elif backend == 'sqlite':
+            store = SQLiteSessionStore(path or os.path.join(app.instance_path, 'sessions.db'))
+        elif backend == 'filesystem':
+            store = FileSystemSessionStore(path or os.path.join(app.instance_path, 'sessions'))
+        else:
+            raise ValueError(f'Unknown SESSION_BACKEND {backend!r}')
+
+        app.extensions['sessions'] = {
+            'store': store,
+            'pending': {},
+            'lock': threading.Lock(),
+            'flushed_at': time.monotonic(),
+            'purged_at': time.monotonic(),
+            'stats': {'loads': 0, 'misses': 0, 'saves': 0, 'deletes': 0, 'touches': 0, 'purged': 0},
+        }
+        app.session_interface = ServerSideSessionInterface(self)
+
+    def save(self, app, sid, payload, expires):
+        state = app.extensions['sessions']
+        with state['lock']:
+            state['pending'].pop(sid, None)
+        state['store'].save(sid, payload, expires)
+        state['stats']['saves'] += 1
+        if time.monotonic() - state['purged_at'] >= app.config['SESSION_PURGE_INTERVAL']:
+            self.flush(app)
+
+    def delete(self, app, sid):
+        state = app.extensions['sessions']
+        with state['lock']:
+            state['pending'].pop(sid, None)
+        state['store'].delete(sid)
+        state['stats']['deletes'] += 1
+
+    def touch(self, app, sid, expires):
+        """
+        Queues a new expiry for a session, flushing the queue once it holds
+        ``SESSION_TOUCH_BATCH`` sessions or is ``SESSION_TOUCH_FLUSH_INTERVAL``
+        seconds old.
+
+        A queued expiry that is lost (the process exits first) only means the
+        session expires up to that long earlier.
+        """
+        state = app.extensions['sessions']
+        with state['lock']:
+            state['pending'][sid] = expires
+            due = (len(state['pending']) >= app.config['SESSION_TOUCH_BATCH']
+                   or time.monotonic() - state['flushed_at'] >= app.config['SESSION_TOUCH_FLUSH_INTERVAL'])
+        if due:
+            self.flush(app)
+
+    def flush(self, app=None):
+        """
+        Writes the queued expiries, and purges expired sessions when a purge
+        is due.
+
+        Args:
+            app (Flask): The application (defaults to the current one).
+        """
+        app = app or current_app._get_current_object()
+        state = app.extensions['sessions']
+        with state['lock']:
+            pending, state['pending'] = state['pending'], {}
+            state['flushed_at'] = time.monotonic()
+            purge = time.monotonic() - state['purged_at'] >= app.config['SESSION_PURGE_INTERVAL']
+            if purge:
+                state['purged_at'] = time.monotonic()
+        if pending:
+            state['store'].touch_many(pending.items())
+            state['stats']['touches'] += len(pending)
+        if purge:
+            self.purge(app)
+
+    def purge(self, app=None):
+        """
+        Deletes every expired session from the store.
+
+        Returns:
+            int: The number of sessions removed.
+        """
+        app = app or current_app._get_current_object()
+        state = app.extensions['sessions']
+        removed = state['store'].purge_expired()
+        state['stats']['purged'] += removed
+        return removed
+
+    def stats(self):
+        """
+        Returns the session counters of the current worker.
+
+        Returns:
+            dict: Counts of loads, misses, saves, deletes, touches and purged
+                sessions, and the number of queued expiry updates.
+        """
+        state = current_app.extensions['sessions']
+        return dict(state['stats'], pending=len(state['pending']))
+
+
+sessions_cli = AppGroup('sessions', help='Manage server-side sessions.')
+
+
+@sessions_cli.command('purge')
+def purge_command():
+    """Delete every expired session."""
+    from app.extensions import sessions
+
+    if 'sessions' not in current_app.extensions:
+        raise click.ClickException('SESSION_BACKEND is "cookie"; there is no session store to purge.')
+    click.echo(f'Removed {sessions.purge()} expired sessions')
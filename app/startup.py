@@ -0,0 +1,120 @@
+import json
+import os
+import re
+import subprocess
+import sys
+import click
+from app.config import config_by_name
+
+# "import time:      1234 |       5678 |     package.module"; the indent
+# of the module name grows by two spaces per nesting level.
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)\s*$')
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Run in a fresh interpreter so nothing is imported yet.
+STARTUP_SCRIPT = '''
+import json, sys, time
+start = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+create_app(sys.argv[1])
+created = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - start) * 1000,
+    'create_app_ms': (created - imported) * 1000,
+    'modules': sorted(sys.modules),
+}))
+'''
+
+
+def parse_importtime(output):
+    """
+    Parses the ``-X importtime`` lines of an interpreter's stderr.
+
+    Args:
+        output (str): The captured stderr; other lines are ignored.
+
+    Returns:
+        list: One dict per imported module with ``module``, ``self_us``,
+            ``cumulative_us`` and nesting ``depth``, in import order.
+    """
+    imports = []
+    for line in output.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            imports.append({
+                'module': match.group(4),
+                'self_us': int(match.group(1)),
+                'cumulative_us': int(match.group(2)),
+                'depth': (len(match.group(3)) - 1) // 2,
+            })
+    return imports
+
+
+def measure_startup(config_name, importtime=True):
+    """
+    Imports the app and runs ``create_app`` in a new interpreter.
+
+    Args:
+        config_name (str): Key in ``config_by_name``.
+        importtime (bool): Also record per-module import times.
+
+    Returns:
+        dict: ``import_ms``, ``create_app_ms``, the ``modules`` loaded by
+            the end of ``create_app`` and, with ``importtime``, the parsed
+            ``imports``.
+
+    Raises:
+        RuntimeError: If the interpreter failed.
+    """
+    command = [sys.executable]
+    if importtime:
+        command += ['-X', 'importtime']
+    command += ['-c', STARTUP_SCRIPT, config_name]
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [PROJECT_ROOT, os.getenv('PYTHONPATH')])))
+    result = subprocess.run(command, cwd=PROJECT_ROOT, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f'Start-up failed:\n{result.stderr[-2000:]}')
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    if importtime:
+        report['imports'] = parse_importtime(result.stderr)
+    return report
+
+
+def package_totals(imports):
+    """
+    Sums the self time of every module per top-level package.
+
+    Returns:
+        list: ``(package, microseconds)`` pairs, slowest first.
+    """
+    totals = {}
+    for entry in imports:
+        package = entry['module'].split('.')[0]
+        totals[package] = totals.get(package, 0) + entry['self_us']
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)
+
+
+@click.command('startup-report')
+@click.option('--config', 'config_name', default=lambda: os.getenv('FLASK_CONFIG', 'default'),
+              type=click.Choice(sorted(config_by_name)), help='Config to start the app with.')
+@click.option('--top', default=15, help='Number of packages and modules to list.')
+@click.option('--runs', default=3, help='Cold starts to measure; the fastest is reported.')
+def startup_report(config_name, top, runs):
+    """Report where a cold start of the app spends its time."""
+    reports = [measure_startup(config_name) for _ in range(max(1, runs))]
+    report = min(reports, key=lambda r: r['import_ms'] + r['create_app_ms'])
+    imports = report['imports']
+
+    click.echo(f"Importing app: {report['import_ms']:.0f} ms ({len(imports)} modules)")
+    click.echo(f"create_app({config_name!r}): {report['create_app_ms']:.0f} ms")
+    click.echo(f"Modules loaded after create_app: {len(report['modules'])}")
+
+    click.echo(f"\n{'package':<30} {'self ms':>9}")
+    for package, microseconds in package_totals(imports)[:top]:
+        click.echo(f'{package:<30} {microseconds / 1000:9.1f}')
+
+    click.echo(f"\n{'module':<50} {'self ms':>9} {'cumulative ms':>14}")
+    for entry in sorted(imports, key=lambda e: e['cumulative_us'], reverse=True)[:top]:
+        click.echo(f"{entry['module']:<50} {entry['self_us'] / 1000:9.1f} {entry['cumulative_us'] / 1000:14.1f}")
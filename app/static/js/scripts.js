@@ -45,6 +45,47 @@ document.addEventListener('DOMContentLoaded', () => {
         });
     });
 
+    // Live username/email availability checks
+    document.querySelectorAll('form[data-availability-url]').forEach(form => {
+        const url = form.dataset.availabilityUrl;
+
+        ['username', 'email'].forEach(name => {
+            const field = form.querySelector(`[name="${name}"]`);
+            const hint = form.querySelector(`[data-availability-for="${name}"]`);
+            if (!field || !hint) {
+                return;
+            }
+
+            let timer = null;
+            let controller = null;
+            field.addEventListener('input', () => {
+                clearTimeout(timer);
+                hint.textContent = '';
+                const value = field.value.trim();
+                if (value.length < 2) {
+                    return;
+                }
+                timer = setTimeout(() => {
+                    if (controller) {
+                        controller.abort();
+                    }
+                    controller = new AbortController();
+                    fetch(`${url}?${name}=${encodeURIComponent(value)}`, {signal: controller.signal})
+                        .then(response => response.ok ? response.json() : null)
+                        .then(data => {
+                            if (!data || !data[name]) {
+                                return;
+                            }
+                            const available = data[name].available;
+                            hint.textContent = available ? 'Available' : `This ${name} is already taken.`;
+                            field.classList.toggle('is-invalid', !available);
+                        })
+                        .catch(() => {});
+                }, 300);
+            });
+        });
+    });
+
     // Image lazy loading
     const lazyImages = document.querySelectorAll('img.lazy');
 
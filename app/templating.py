@@ -0,0 +1,159 @@
+import os
+import shutil
+import time
+import click
+from flask import current_app, render_template, request, stream_with_context
+from flask.cli import AppGroup
+from flask.signals import before_render_template, template_rendered
+from jinja2 import FileSystemBytecodeCache
+
+HEAD_FLUSH_MARKER = '</header>'
+
+
+def configure_templates(app):
+    """
+    Sets up the Jinja environment for the app.
+
+    Outside debug mode template auto-reload is forced off, so a loaded
+    template is never stat()ed again. When ``TEMPLATE_BYTECODE_CACHE_DIR``
+    is set, compiled templates are shared through that directory, so a new
+    worker only has to unmarshal bytecode instead of parsing and compiling
+    every template. With ``TEMPLATE_WARM_ON_STARTUP`` every template is
+    loaded before the app serves its first request.
+
+    Args:
+        app (Flask): The application instance.
+    """
+    if not app.debug:
+        app.config['TEMPLATES_AUTO_RELOAD'] = False
+        app.jinja_env.auto_reload = False
+
+    directory = app.config['TEMPLATE_BYTECODE_CACHE_DIR']
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(directory)
+
+    if app.config['TEMPLATE_WARM_ON_STARTUP']:
+        warm_templates(app)
+
+
+def list_app_templates(app):
+    """
+    Lists every HTML template visible to the app, including blueprint ones.
+
+    Args:
+        app (Flask): The application instance.
+
+    Returns:
+        list: Sorted template names.
+    """
+    return sorted(name for name in app.jinja_env.list_templates() if name.endswith('.html'))
+
+
+def warm_templates(app, env=None):
+    """
+    Loads every template so it is compiled (or read from the bytecode cache)
+    and kept in the environment's in-memory cache.
+
+    Args:
+        app (Flask): The application instance.
+        env (Environment): Environment to load into (defaults to ``app.jinja_env``).
+
+    Returns:
+        list: ``(name, seconds)`` pairs, one per template.
+    """
+    env = env or app.jinja_env
+    timings = []
+    for name in list_app_templates(app):
+        start = time.perf_counter()
+        env.get_template(name)
+        timings.append((name, time.perf_counter() - start))
+    return timings
+
+
+def _stream_chunks(template, context, chunk_size):
+    """
+    Yields the rendered template in chunks.
+
+    Everything up to and including the base layout's ``</header>`` goes out
+    as soon as it is rendered, so the browser can start fetching CSS and
+    fonts while the content block is still being generated. The rest is
+    batched into chunks of at least ``chunk_size`` characters.
+    """
+    app = current_app._get_current_object()
+    buffer = []
+    size = 0
+    head_sent = False
+    for piece in template.generate(context):
+        buffer.append(piece)
+        size += len(piece)
+        if (not head_sent and HEAD_FLUSH_MARKER in piece) or size >= chunk_size:
+            head_sent = True
+            yield ''.join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield ''.join(buffer)
+    template_rendered.send(app, _async_wrapper=app.ensure_sync, template=template, context=context)
+
+
+def render_template_streamed(template_name, etag=None, **context):
+    """
+    Renders a template as a streamed response when ``STREAM_TEMPLATES`` is on.
+
+    With streaming off this behaves like ``render_template``, so views can
+    call it unconditionally. Either way the response goes through the normal
+    ``after_request`` hooks. Since a streamed body's hash is not known up
+    front, views that want conditional requests pass an ``etag`` derived
+    from their data; a matching ``If-None-Match`` gets a 304 without
+    rendering anything.
+
+    Args:
+        template_name (str): Name of the template to render.
+        etag (str): Optional strong ETag for the page.
+        **context: Template context variables.
+
+    Returns:
+        Response: The (possibly streamed) response.
+    """
+    app = current_app._get_current_object()
+    if etag is not None and etag in request.if_none_match:
+        response = app.response_class(status=304)
+        response.set_etag(etag)
+        return response
+
+    if not app.config['STREAM_TEMPLATES']:
+        response = app.make_response(render_template(template_name, **context))
+    else:
+        template = app.jinja_env.get_or_select_template(template_name)
+        app.update_template_context(context)
+        before_render_template.send(app, _async_wrapper=app.ensure_sync, template=template, context=context)
+        chunks = _stream_chunks(template, context, app.config['STREAM_CHUNK_SIZE'])
+        response = app.response_class(stream_with_context(chunks), mimetype='text/html')
+
+    if etag is not None:
+        response.set_etag(etag)
+    return response
+
+
+templates_cli = AppGroup('templates', help='Precompile and inspect the Jinja templates.')
+
+
+@templates_cli.command('compile')
+@click.option('--directory', help='Bytecode cache directory (defaults to TEMPLATE_BYTECODE_CACHE_DIR).')
+@click.option('--clear', is_flag=True, help='Empty the cache directory first.')
+def compile_command(directory, clear):
+    """Precompile every app and blueprint template into the bytecode cache."""
+    directory = directory or current_app.config['TEMPLATE_BYTECODE_CACHE_DIR']
+    if not directory:
+        raise click.UsageError('Set TEMPLATE_BYTECODE_CACHE_DIR or pass --directory.')
+    if clear and os.path.isdir(directory):
+        shutil.rmtree(directory)
+    os.makedirs(directory, exist_ok=True)
+
+    env = current_app.create_jinja_environment()
+    env.bytecode_cache = FileSystemBytecodeCache(directory)
+    timings = warm_templates(current_app, env)
+    for name, seconds in timings:
+        click.echo(f'{name:<40} {seconds * 1000:8.2f} ms')
+    click.echo(f'Compiled {len(timings)} templates into {directory}')
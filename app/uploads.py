@@ -0,0 +1,298 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from flask import current_app, url_for
+from app.assets.images import FORMAT_EXTENSIONS, encode_image, supported_formats
+
+ALLOWED_FORMATS = ('JPEG', 'PNG', 'WEBP', 'GIF')
+
+
+class UploadRejected(ValueError):
+    """
+    Raised for uploads that are too large, not an image, or in a format we
+    do not accept. The message is safe to show to the user.
+    """
+
+
+def spool_upload(stream, directory, max_bytes, chunk_size=65536):
+    """
+    Copies an upload stream to a temporary file, hashing it on the way.
+
+    Only one chunk is held in memory at a time.
+
+    Args:
+        stream: A readable binary file object.
+        directory (str): Directory for the temporary file.
+        max_bytes (int): Largest accepted upload.
+        chunk_size (int): Bytes read per iteration.
+
+    Returns:
+        tuple: ``(path, sha256_hex)`` of the spooled file.
+
+    Raises:
+        UploadRejected: If the upload is larger than ``max_bytes``.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    fd, path = tempfile.mkstemp(dir=directory, suffix='.upload')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for chunk in iter(lambda: stream.read(chunk_size), b''):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadRejected(f'Pictures must be smaller than {max_bytes // (1024 * 1024)} MB.')
+                digest.update(chunk)
+                f.write(chunk)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path, digest.hexdigest()
+
+
+def inspect_image(path, max_pixels):
+    """
+    Reads an image's format and dimensions from its header only.
+
+    ``Image.open`` parses the header lazily; no pixel data is decoded, so
+    a decompression bomb is rejected before it costs any memory.
+
+    Args:
+        path (str): Path of the spooled upload.
+        max_pixels (int): Largest accepted width * height.
+
+    Returns:
+        tuple: ``(format, width, height)``.
+
+    Raises:
+        UploadRejected: If the file is not an accepted image or too large.
+    """
+    from PIL import Image
+
+    try:
+        with Image.open(path) as image:
+            fmt, (width, height) = image.format, image.size
+    except (OSError, Image.DecompressionBombError):
+        raise UploadRejected('The file is not a valid image.') from None
+    if fmt not in ALLOWED_FORMATS:
+        raise UploadRejected('Pictures must be JPEG, PNG, WebP or GIF.')
+    if width * height > max_pixels:
+        raise UploadRejected(f'Pictures may have at most {max_pixels // 1_000_000} megapixels.')
+    return fmt, width, height
+
+
+def process_upload(job):
+    """
+    Generates the square thumbnails for one upload.
+
+    Runs in a worker process. For JPEG sources ``draft`` makes the decoder
+    scale down by up to 8x while decoding, so a 20 MP photo is never fully
+    materialised when only small thumbnails are needed. A ``.json`` manifest
+    written last marks the picture as ready.
+
+    Args:
+        job (dict): Spooled path, content key, output directory, sizes,
+            formats, quality and pixel limit.
+
+    Returns:
+        dict: The manifest written for the picture.
+    """
+    from PIL import Image, ImageOps
+
+    Image.MAX_IMAGE_PIXELS = job['max_pixels']
+    key = job['key']
+    try:
+        with Image.open(job['source']) as original:
+            largest = max(job['sizes'])
+            original.draft(original.mode, (largest, largest))
+            image = ImageOps.exif_transpose(original)
+            if image.mode not in ('RGB', 'RGBA', 'L'):
+                image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+            files = {}
+            for size in sorted(job['sizes'], reverse=True):
+                image = ImageOps.fit(image, (size, size), Image.LANCZOS)
+                for fmt in job['formats']:
+                    filename = f'{key}-{size}.{FORMAT_EXTENSIONS[fmt]}'
+                    data = encode_image(image, fmt, job['quality'])
+                    tmp_path = os.path.join(job['output_dir'], f'{filename}.{os.getpid()}.tmp')
+                    with open(tmp_path, 'wb') as f:
+                        f.write(data)
+                    os.replace(tmp_path, os.path.join(job['output_dir'], filename))
+                    files.setdefault(fmt, {})[size] = filename
+    finally:
+        os.remove(job['source'])
+    manifest = {'key': key, 'files': files}
+    tmp_path = os.path.join(job['output_dir'], f'{key}.json.{os.getpid()}.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, os.path.join(job['output_dir'], f'{key}.json'))
+    return manifest
+
+
+class Uploads:
+    """
+    Profile picture uploads processed outside the request.
+
+    :meth:`save_picture` streams the upload to a temporary file while
+    hashing it, rejects it from the image header alone if it exceeds
+    ``UPLOAD_MAX_BYTES`` or ``UPLOAD_MAX_PIXELS``, and hands it to a process
+    pool of ``UPLOAD_WORKERS`` that writes every size in
+    ``UPLOAD_PICTURE_SIZES`` as WebP and JPEG. The request returns as soon
+    as the job is queued; :func:`picture_url` serves a placeholder until the
+    thumbnails exist.
+
+    Pictures are named by content hash, so uploading an image that was
+    already processed (or is being processed) does no work at all. Memory
+    per upload is bounded by the spool chunk size in the request and by the
+    draft-mode decode in the worker, whatever the queue length.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        output_dir = os.path.join(app.static_folder, app.config['UPLOAD_PICTURE_DIR'])
+        app.extensions['uploads'] = {
+            'output_dir': output_dir,
+            'spool_dir': app.config['UPLOAD_SPOOL_DIR'] or os.path.join(app.instance_path, 'uploads'),
+            'executor': None,
+            'pending': {},
+            'lock': threading.Lock(),
+            'stats': {'uploads': 0, 'deduplicated': 0, 'rejected': 0, 'processed': 0, 'failed': 0},
+        }
+        app.add_template_global(picture_url)
+
+    def _state(self):
+        return current_app.extensions['uploads']
+
+    def _executor(self, state):
+        # Created on first upload so app start-up (and every test) does not
+        # fork worker processes it never uses.
+        with state['lock']:
+            if state['executor'] is None:
+                state['executor'] = ProcessPoolExecutor(max_workers=current_app.config['UPLOAD_WORKERS'])
+            return state['executor']
+
+    def is_ready(self, key):
+        return os.path.exists(os.path.join(self._state()['output_dir'], f'{key}.json'))
+
+    def save_picture(self, form_picture):
+        """
+        Accepts a profile picture and queues its processing.
+
+        Args:
+            form_picture (FileStorage): The uploaded picture.
+
+        Returns:
+            str: The picture key to store on the user; pass it to
+                :func:`picture_url`.
+
+        Raises:
+            UploadRejected: If the upload is not an acceptable image.
+        """
+        config = current_app.config
+        state = self._state()
+        self._reap(state)
+        os.makedirs(state['output_dir'], exist_ok=True)
+        os.makedirs(state['spool_dir'], exist_ok=True)
+        try:
+            path, digest = spool_upload(form_picture.stream, state['spool_dir'], config['UPLOAD_MAX_BYTES'])
+        except UploadRejected:
+            state['stats']['rejected'] += 1
+            raise
+        key = digest[:20]
+        with state['lock']:
+            duplicate = key in state['pending'] or self.is_ready(key)
+        if duplicate:
+            os.remove(path)
+            state['stats']['deduplicated'] += 1
+            return key
+        try:
+            inspect_image(path, config['UPLOAD_MAX_PIXELS'])
+        except UploadRejected:
+            os.remove(path)
+            state['stats']['rejected'] += 1
+            raise
+
+        future = self._executor(state).submit(process_upload, {
+            'key': key,
+            'source': path,
+            'output_dir': state['output_dir'],
+            'sizes': tuple(config['UPLOAD_PICTURE_SIZES']),
+            'formats': supported_formats(('webp', 'jpeg')),
+            'quality': config['IMAGE_QUALITY'],
+            'max_pixels': config['UPLOAD_MAX_PIXELS'],
+        })
+        with state['lock']:
+            state['pending'][key] = future
+        state['stats']['uploads'] += 1
+        return key
+
+    def _reap(self, state):
+        with state['lock']:
+            done = [key for key, future in state['pending'].items() if future.done()]
+            for key in done:
+                future = state['pending'].pop(key)
+                if future.exception() is not None:
+                    current_app.logger.error('Processing picture %s failed', key, exc_info=future.exception())
+                    state['stats']['failed'] += 1
+                else:
+                    state['stats']['processed'] += 1
+
+    def wait(self, timeout=None):
+        """
+        Blocks until every queued picture has been processed.
+
+        Args:
+            timeout (float): Seconds to wait per picture.
+        """
+        state = self._state()
+        with state['lock']:
+            futures = list(state['pending'].values())
+        for future in futures:
+            future.exception(timeout)
+        self._reap(state)
+
+    def stats(self):
+        """
+        Returns the upload counters and the number of pictures in flight.
+
+        Returns:
+            dict: Counters plus ``pending``.
+        """
+        state = self._state()
+        self._reap(state)
+        return dict(state['stats'], pending=len(state['pending']))
+
+
+def picture_url(key, size=None, fmt='webp'):
+    """
+    Returns the URL of a processed profile picture.
+
+    Args:
+        key (str): The key returned by ``save_picture``.
+        size (int): Thumbnail edge in pixels (defaults to the smallest).
+        fmt (str): 'webp' or 'jpeg'; falls back to the other if missing.
+
+    Returns:
+        str: The thumbnail URL, or the placeholder while the picture is
+            still being processed.
+    """
+    config = current_app.config
+    placeholder = url_for('static', filename=config['UPLOAD_PLACEHOLDER'])
+    if not key:
+        return placeholder
+    path = os.path.join(current_app.extensions['uploads']['output_dir'], f'{key}.json')
+    try:
+        with open(path) as f:
+            files = json.load(f)['files']
+    except (OSError, ValueError):
+        return placeholder
+    variants = files.get(fmt) or next(iter(files.values()))
+    size = str(size or min(config['UPLOAD_PICTURE_SIZES']))
+    if size not in variants:
+        return placeholder
+    return url_for('static', filename=f"{config['UPLOAD_PICTURE_DIR']}/{variants[size]}")
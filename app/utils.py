@@ -1,28 +1,24 @@
-import os
-from flask import url_for, current_app
-from flask_mail import Message
-from itsdangerous import URLSafeTimedSerializer as Serializer
-from app.extensions import mail
-from PIL import Image
-import secrets
+from flask import url_for
+from app.auth.tokens import generate_reset_token, verify_reset_token as _verify_reset_token
+from app.extensions import mail, uploads
 
 def send_reset_email(user):
     """
-    Sends a password reset email to the user.
+    Queues a password reset email to the user.
+
+    The message is stored in the mail queue and sent by the mail worker,
+    so the request does not wait on the SMTP server.
 
     Args:
         user (User): The user who requested the password reset.
     """
     token = get_reset_token(user)
-    msg = Message('Password Reset Request',
-                  sender=current_app.config['MAIL_USERNAME'],
-                  recipients=[user.email])
-    msg.body = f'''To reset your password, visit the following link:
-{url_for('auth.reset_token', token=token, _external=True)}
+    body = f'''To reset your password, visit the following link:
+{url_for('auth.reset_password', token=token, _external=True)}
 
 If you did not make this request then simply ignore this email and no changes will be made.
 '''
-    mail.send(msg)
+    mail.send('Password Reset Request', [user.email], body)
 
 def get_reset_token(user, expires_sec=1800):
     """
@@ -30,13 +26,13 @@ def get_reset_token(user, expires_sec=1800):
 
     Args:
         user (User): The user who requested the password reset.
-        expires_sec (int): The expiration time in seconds for the token (default is 30 minutes).
+        expires_sec (int): Unused; token lifetime is ``RESET_TOKEN_MAX_AGE``,
+            checked when the token is verified.
 
     Returns:
         str: The generated token.
     """
-    s = Serializer(current_app.config['SECRET_KEY'])
-    return s.dumps({'user_id': user.id}).decode('utf-8')
+    return generate_reset_token(user)
 
 def verify_reset_token(token):
     """
@@ -48,32 +44,23 @@ def verify_reset_token(token):
     Returns:
         User: The user associated with the token if valid, None otherwise.
     """
-    s = Serializer(current_app.config['SECRET_KEY'])
-    try:
-        user_id = s.loads(token, max_age=1800)['user_id']
-    except:
-        return None
-    from app.models import User
-    return User.query.get(user_id)
+    return _verify_reset_token(token)
 
-def save_picture(form_picture, output_size=(125, 125)):
+def save_picture(form_picture):
     """
-    Saves a user-uploaded picture, resizing it to the specified output size.
+    Accepts a user-uploaded picture and queues its resizing.
+
+    The picture is resized in a worker process into every size in
+    ``UPLOAD_PICTURE_SIZES``; until that finishes, ``picture_url`` returns
+    a placeholder.
 
     Args:
         form_picture (FileStorage): The uploaded picture.
-        output_size (tuple): The desired output size (width, height).
 
     Returns:
-        str: The filename of the saved picture.
-    """
-    _, f_ext = os.path.splitext(form_picture.filename)
-    picture_fn = secrets.token_hex(8) + f_ext
-    picture_path = os.path.join(current_app.root_path, 'static/profile_pics', picture_fn)
-    
-    i = Image.open(form_picture)
-    i.thumbnail(output_size)
-    i.save(picture_path)
-
-    return picture_fn
+        str: The picture key to store; pass it to ``picture_url``.
 
+    Raises:
+        UploadRejected: If the upload is too large or not an image.
+    """
+    return uploads.save_picture(form_picture)
@@ -0,0 +1,6 @@
+import os
+from app.asgi import create_asgi_app
+
+# ASGI entry point, e.g. ``uvicorn asgi:app --workers 4`` or
+# ``hypercorn asgi:app --workers 4``.
+app = create_asgi_app(os.getenv('FLASK_CONFIG', 'default'))
@@ -0,0 +1,145 @@
+"""
+Concurrent slow-I/O capacity: threaded WSGI workers vs the ASGI mode.
+
+A benchmark view performs ``--calls`` slow I/O calls of ``--io-ms`` each
+(simulated with sleeps, e.g. an SMTP round trip or an external API).
+``--clients`` concurrent clients send ``--requests`` requests through:
+
+* ``wsgi sync``   - a pool of ``--threads`` threads calling the WSGI app,
+                    like gunicorn's gthread worker; the view makes the calls
+                    one after another.
+* ``asgi sync``   - FlaskASGI with the same number of threads and the same
+                    view, to separate the effect of the server model from
+                    that of the view.
+* ``asgi async``  - FlaskASGI with an ``async def`` view that awaits the
+                    calls concurrently with ``asyncio.gather``.
+
+Runs in-process without a server, so it measures the application's
+concurrency model rather than network overhead.
+
+Usage:
+    python benchmarks/bench_asgi.py [--threads 8] [--clients 64] [--requests 256] [--calls 4] [--io-ms 50]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from app import create_app
+from app.asgi import FlaskASGI
+from app.config import TestingConfig
+
+
+def make_app(calls, io_seconds):
+    config = type('BenchConfig', (TestingConfig,), {'AVAILABILITY_FILTER_ENABLED': False})
+    app = create_app(config)
+
+    @app.route('/_bench/sync')
+    def sync_io():
+        for _ in range(calls):
+            time.sleep(io_seconds)
+        return 'ok'
+
+    @app.route('/_bench/async')
+    async def async_io():
+        await asyncio.gather(*(asyncio.sleep(io_seconds) for _ in range(calls)))
+        return 'ok'
+
+    return app
+
+
+def summarise(latencies, elapsed):
+    latencies.sort()
+    return len(latencies) / elapsed, latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.95) - 1]
+
+
+def wsgi_threads(app, path, threads, clients, requests):
+    # Clients beyond the thread count wait for a free thread, as
+    # connections wait in a worker's accept backlog; the wait counts
+    # towards their latency.
+    client = app.test_client()
+    slots = threading.BoundedSemaphore(threads)
+    remaining = iter(range(requests))
+    lock = threading.Lock()
+    latencies = []
+
+    def run_client():
+        while True:
+            with lock:
+                if next(remaining, None) is None:
+                    return
+            start = time.perf_counter()
+            with slots:
+                client.get(path)
+            with lock:
+                latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    workers = [threading.Thread(target=run_client) for _ in range(clients)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return summarise(latencies, time.perf_counter() - start)
+
+
+async def asgi_requests(asgi_app, path, clients, requests):
+    latencies = []
+    remaining = iter(range(requests))
+
+    async def request():
+        messages = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+
+        async def receive():
+            return messages.pop(0) if messages else {'type': 'http.disconnect'}
+
+        async def send(message):
+            pass
+
+        scope = {'type': 'http', 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+                 'path': path, 'root_path': '', 'query_string': b'', 'headers': [],
+                 'client': ('127.0.0.1', 50000), 'server': ('bench', 80)}
+        start = time.perf_counter()
+        await asgi_app(scope, receive, send)
+        latencies.append(time.perf_counter() - start)
+
+    async def client():
+        for _ in remaining:
+            await request()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    return summarise(latencies, time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--clients', type=int, default=64)
+    parser.add_argument('--requests', type=int, default=256)
+    parser.add_argument('--calls', type=int, default=4)
+    parser.add_argument('--io-ms', type=float, default=50)
+    args = parser.parse_args()
+
+    app = make_app(args.calls, args.io_ms / 1000)
+    asgi_app = FlaskASGI(app, threads=args.threads)
+    results = {
+        'wsgi sync': wsgi_threads(app, '/_bench/sync', args.threads, args.clients, args.requests),
+        'asgi sync': asyncio.run(asgi_requests(asgi_app, '/_bench/sync', args.clients, args.requests)),
+        'asgi async': asyncio.run(asgi_requests(asgi_app, '/_bench/async', args.clients, args.requests)),
+    }
+    asgi_app.executor.shutdown()
+
+    print(f'{args.threads} threads, {args.clients} clients, {args.requests} requests, '
+          f'{args.calls} x {args.io_ms:.0f} ms I/O per request')
+    print(f"{'model':<12} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9}")
+    for name, (rps, p50, p95) in results.items():
+        print(f'{name:<12} {rps:8.1f} {p50 * 1000:9.1f} {p95 * 1000:9.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+Throughput of loading users one ORM add at a time versus ``UserImport``.
+
+The ORM path adds and commits each user with a hashed password, as the
+registration view does. The import path streams the same JSONL records
+through :class:`app.auth.bulk.UserImport` with batched INSERTs and the
+hashing spread over ``--workers`` processes. Hashing uses ``--iterations``
+PBKDF2 rounds so the run finishes in reasonable time; raise it to see how
+much of a real import is hashing.
+
+Usage:
+    python benchmarks/bench_bulk_import.py [--users 5000] [--batch-size 1000] [--workers 0]
+                                           [--iterations 1000]
+"""
+import argparse
+import io
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from app import create_app, db
+from app.auth.bulk import UserImport, read_rows
+from app.config import TestingConfig
+from app.models import User
+
+
+def records(count):
+    for i in range(count):
+        yield json.dumps({'username': f'user{i}', 'email': f'user{i}@example.com', 'password': f'password{i}'})
+
+
+def run(mode, args):
+    config = type('BenchConfig', (TestingConfig,), {
+        'DEBUG': False,
+        'PASSWORD_HASH_PARAMS': {'iterations': args.iterations},
+        'AVAILABILITY_FILTER_ENABLED': False,
+    })
+    app = create_app(config)
+    with app.app_context():
+        db.create_all()
+        start = time.perf_counter()
+        if mode == 'orm':
+            for line in records(args.users):
+                record = json.loads(line)
+                user = User(username=record['username'], email=record['email'])
+                user.set_password(record['password'])
+                db.session.add(user)
+                db.session.commit()
+        else:
+            stream = io.StringIO('\n'.join(records(args.users)))
+            UserImport(batch_size=args.batch_size, workers=args.workers).run(read_rows(stream, 'jsonl'))
+        elapsed = time.perf_counter() - start
+        assert db.session.scalar(db.select(db.func.count(User.id))) == args.users
+        db.drop_all()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, default=5000)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--workers', type=int, default=0, help='0 for one process per CPU')
+    parser.add_argument('--iterations', type=int, default=1000)
+    args = parser.parse_args()
+
+    print(f"{'mode':<8} {'seconds':>9} {'users/s':>10}")
+    for mode in ('orm', 'import'):
+        seconds = run(mode, args)
+        print(f'{mode:<8} {seconds:9.2f} {args.users / seconds:10.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+Password verification throughput per algorithm and per core.
+
+For each available backend, hashes a password with its minimum
+(OWASP-recommended) parameters, or with parameters calibrated to
+``--target-ms``, then measures:
+
+* ``1 thread``  - verifications per second on one core, i.e. logins/sec/core.
+* ``pool``      - verifications per second through Passwords.verify() with
+                  ``--workers`` pool threads fed by ``--clients`` concurrent
+                  callers, plus how many calls were turned away as busy.
+
+Usage:
+    python benchmarks/bench_passwords.py [--seconds 3] [--workers N] [--clients 32] [--target-ms 100]
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from app import create_app
+from app.config import TestingConfig
+from app.extensions import passwords
+from app.passwords import PasswordHasherBusy, available_backends, calibrate
+
+
+def single_thread(backend, stored, seconds):
+    count = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        backend.verify(stored, 'correct horse battery staple')
+        count += 1
+    return count / seconds
+
+
+def pooled(app, stored, seconds, clients):
+    counts = {'ok': 0, 'busy': 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def client():
+        with app.app_context():
+            while time.perf_counter() < deadline:
+                try:
+                    passwords.verify(stored, 'correct horse battery staple')
+                    key = 'ok'
+                except PasswordHasherBusy:
+                    key = 'busy'
+                    time.sleep(0.001)
+                with lock:
+                    counts[key] += 1
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return counts['ok'] / seconds, counts['busy']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--seconds', type=float, default=3)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--queue', type=int, default=8)
+    parser.add_argument('--target-ms', type=float, help='Calibrate each backend to this hash time.')
+    args = parser.parse_args()
+
+    print(f'{os.cpu_count()} cores, {args.workers} pool workers, {args.clients} clients')
+    print(f"{'algorithm':<10} {'ms/hash':>8} {'1 thread/s':>11} {'pool/s':>9} {'per core':>9} {'busy':>7}  params")
+    for name, backend in available_backends().items():
+        if args.target_ms:
+            params, _ = calibrate(backend, args.target_ms / 1000)
+        else:
+            params = dict(backend.minimum)
+        config = type('BenchConfig', (TestingConfig,), {
+            'PASSWORD_HASH_ALGORITHM': name,
+            'PASSWORD_HASH_PARAMS': params,
+            'PASSWORD_VERIFY_WORKERS': args.workers,
+            'PASSWORD_VERIFY_QUEUE': args.queue,
+            'AVAILABILITY_FILTER_ENABLED': False,
+        })
+        app = create_app(config)
+        stored = backend.hash('correct horse battery staple', params)
+
+        rate = single_thread(backend, stored, args.seconds)
+        pool_rate, busy = pooled(app, stored, args.seconds, args.clients)
+        per_core = pool_rate / min(args.workers, os.cpu_count() or 1)
+        print(f'{name:<10} {1000 / rate:8.1f} {rate:11.1f} {pool_rate:9.1f} {per_core:9.1f} {busy:7d}  {params}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+Rate-limit backend throughput under thread contention.
+
+``--threads`` threads each make ``--hits`` checks against ``--keys``
+distinct keys (one IP per key), for the in-process backend with one lock
+and with ``--shards`` locks, and for the shared SQLite and filesystem
+backends. Reports checks per second and the fraction rejected.
+
+Usage:
+    python benchmarks/bench_ratelimit.py [--threads 8] [--hits 5000] [--keys 1000]
+        [--shards 64] [--limit "ip 100/minute"]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from app.ratelimit import FileSystemRateLimitBackend, Limit, MemoryRateLimitBackend, SQLiteRateLimitBackend
+
+
+def hammer(backend, algorithm, threads, hits, keys):
+    # Keys carry the algorithm, as the limiter's do, since state formats differ.
+    rejected = [0]
+    lock = threading.Lock()
+    barrier = threading.Barrier(threads + 1)
+
+    def worker():
+        local_rejected = 0
+        names = [f'auth.login:0:{algorithm.name}:ip:10.0.{k // 256}.{k % 256}' for k in range(keys)]
+        barrier.wait()
+        for _ in range(hits):
+            allowed, _ = backend.hit(random.choice(names), algorithm, time.time())
+            local_rejected += not allowed
+        with lock:
+            rejected[0] += local_rejected
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in workers:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    total = threads * hits
+    return total / elapsed, rejected[0] / total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--hits', type=int, default=5000)
+    parser.add_argument('--keys', type=int, default=1000)
+    parser.add_argument('--shards', type=int, default=64)
+    parser.add_argument('--limit', default='ip 100/minute')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        backends = {
+            'memory, 1 lock': MemoryRateLimitBackend(shards=1),
+            f'memory, {args.shards} locks': MemoryRateLimitBackend(shards=args.shards),
+            'sqlite': SQLiteRateLimitBackend(os.path.join(directory, 'ratelimit.db')),
+            'filesystem': FileSystemRateLimitBackend(os.path.join(directory, 'ratelimit')),
+        }
+        print(f'{args.threads} threads x {args.hits} checks over {args.keys} keys, limit {args.limit!r}')
+        print(f"{'backend':<20} {'checks/s':>10} {'rejected':>9}")
+        for algorithm_name in ('sliding-window', 'token-bucket'):
+            algorithm = Limit(f'{args.limit} {algorithm_name}').algorithm
+            print(algorithm_name)
+            for name, backend in backends.items():
+                rate, rejected = hammer(backend, algorithm, args.threads, args.hits, args.keys)
+                print(f'  {name:<18} {rate:10.0f} {rejected:9.1%}')
+
+
+if __name__ == '__main__':
+    main()
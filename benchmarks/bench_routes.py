@@ -0,0 +1,306 @@
+"""
+Latency and throughput of every blueprint route, with a regression gate.
+
+Seeds a SQLite file with ``--users`` synthetic users (10k by default; try
+1000000), then measures each route in ``ROUTES``:
+
+* ``micro`` - in-process through the Flask test client, one request at a
+              time, so only the application code is measured.
+* ``macro`` - over HTTP against gunicorn (``--workers`` processes) driven
+              by ``--clients`` keep-alive client threads, which adds the
+              server, the network stack and contention between workers.
+              Also reports the resident memory of every worker.
+
+Per route it reports requests, errors (non-2xx/3xx), RPS and p50/p95/p99
+latency. ``--output`` saves the results as JSON; ``--baseline`` compares
+against a saved run and exits with status 1 when a route's p95 grew, or
+its RPS dropped, by more than ``--tolerance``, or when any route returned
+errors.
+
+Usage:
+    python benchmarks/bench_routes.py [--mode micro|macro|both] [--users 10000]
+        [--seconds 5] [--workers 4] [--clients 16]
+        [--output results.json] [--baseline baseline.json] [--tolerance 0.15]
+"""
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from app import create_app, db
+from app.config import ProductionConfig
+from bench_uniqueness import seed
+
+# (name, path). ``{user}`` is replaced by a random seeded username per
+# request, so lookups are spread across the table instead of hitting one row.
+ROUTES = (
+    ('main.home', '/'),
+    ('main.about', '/about'),
+    ('main.dashboard', '/dashboard'),
+    ('main.contact', '/contact'),
+    ('auth.login', '/auth/login'),
+    ('auth.register', '/auth/register'),
+    ('auth.reset_request', '/auth/reset_request'),
+    ('auth.check_availability', '/auth/check-availability?username={user}'),
+)
+
+
+def percentile(sorted_samples, fraction):
+    if not sorted_samples:
+        return 0.0
+    index = min(len(sorted_samples) - 1, int(len(sorted_samples) * fraction))
+    return sorted_samples[index]
+
+
+def summarise(samples, errors, seconds):
+    samples.sort()
+    return {
+        'requests': len(samples),
+        'errors': errors,
+        'rps': round(len(samples) / seconds, 1),
+        'p50_ms': round(percentile(samples, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(samples, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(samples, 0.99) * 1000, 3),
+    }
+
+
+def expand(path, users):
+    return path.replace('{user}', f'user{random.randrange(users * 2)}')
+
+
+def snapshot_path(directory):
+    # Kept next to the benchmark database; the default instance/ snapshot
+    # is the live one, which running workers merge into their filters.
+    return os.path.join(directory, 'availability.bloom')
+
+
+def bench_config(database_uri, directory):
+    return type('BenchConfig', (ProductionConfig,), {
+        'SQLALCHEMY_DATABASE_URI': database_uri,
+        'PASSWORD_CALIBRATE_ON_STARTUP': False,
+        'AVAILABILITY_FILTER_SNAPSHOT': snapshot_path(directory),
+    })
+
+
+def run_micro(database_uri, directory, users, seconds):
+    app = create_app(bench_config(database_uri, directory))
+    client = app.test_client()
+    results = {}
+    for name, path in ROUTES:
+        # Warm-up: first render compiles templates and fills caches.
+        for _ in range(10):
+            client.get(expand(path, users))
+        samples, errors = [], 0
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            response = client.get(expand(path, users))
+            samples.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+        results[name] = summarise(samples, errors, seconds)
+    return {'routes': results}
+
+
+def free_port():
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        return probe.getsockname()[1]
+
+
+def wait_for_server(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f'gunicorn did not start on port {port}')
+
+
+def child_pids(pid):
+    try:
+        with open(f'/proc/{pid}/task/{pid}/children') as f:
+            return [int(child) for child in f.read().split()]
+    except OSError:
+        return []
+
+
+def rss_mb(pid):
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+
+def load(port, path, users, seconds, clients):
+    samples, errors = [], [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def client():
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+        local, local_errors = [], 0
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                connection.request('GET', expand(path, users))
+                response = connection.getresponse()
+                response.read()
+                if response.status >= 400:
+                    local_errors += 1
+            except (OSError, http.client.HTTPException):
+                local_errors += 1
+                connection.close()
+                connection = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+                continue
+            local.append(time.perf_counter() - start)
+        connection.close()
+        with lock:
+            samples.extend(local)
+            errors[0] += local_errors
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return summarise(samples, errors[0], seconds)
+
+
+def run_macro(database_uri, directory, users, seconds, workers, clients):
+    if shutil.which('gunicorn') is None:
+        raise SystemExit('gunicorn is not installed; run with --mode micro or pip install gunicorn')
+    port = free_port()
+    env = dict(os.environ, FLASK_CONFIG='production', SQLALCHEMY_DATABASE_URI=database_uri,
+               AVAILABILITY_FILTER_SNAPSHOT=snapshot_path(directory))
+    server = subprocess.Popen(
+        ['gunicorn', '--workers', str(workers), '--bind', f'127.0.0.1:{port}',
+         '--keep-alive', '30', '--log-level', 'warning', 'run:app'],
+        cwd=os.path.join(os.path.dirname(__file__), os.pardir), env=env,
+    )
+    try:
+        wait_for_server(port)
+        results = {}
+        for name, path in ROUTES:
+            load(port, path, users, 1, clients)
+            results[name] = load(port, path, users, seconds, clients)
+        worker_rss = [rss_mb(pid) for pid in child_pids(server.pid)]
+        return {'routes': results, 'master_rss_mb': rss_mb(server.pid), 'worker_rss_mb': worker_rss}
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def compare(results, baseline, tolerance):
+    """
+    Lists the routes that regressed against a baseline run.
+
+    A route that returned errors always counts as regressed, so a broken
+    page cannot pass the gate on the speed of its error page.
+
+    Returns:
+        list: ``(mode, route, metric, baseline, current)`` for each regression.
+    """
+    regressions = []
+    for mode, current in results['modes'].items():
+        previous = baseline.get('modes', {}).get(mode, {}).get('routes', {})
+        for route, metrics in current['routes'].items():
+            before = previous.get(route)
+            if metrics['errors']:
+                regressions.append((mode, route, 'errors', before['errors'] if before else None,
+                                    metrics['errors']))
+            if not before:
+                continue
+            if metrics['p95_ms'] > before['p95_ms'] * (1 + tolerance):
+                regressions.append((mode, route, 'p95_ms', before['p95_ms'], metrics['p95_ms']))
+            if metrics['rps'] < before['rps'] * (1 - tolerance):
+                regressions.append((mode, route, 'rps', before['rps'], metrics['rps']))
+    return regressions
+
+
+def print_table(mode, result):
+    print(f'\n{mode}')
+    print(f"{'route':<26} {'requests':>9} {'errors':>7} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for route, m in result['routes'].items():
+        print(f"{route:<26} {m['requests']:9d} {m['errors']:7d} {m['rps']:9.1f} "
+              f"{m['p50_ms']:9.3f} {m['p95_ms']:9.3f} {m['p99_ms']:9.3f}"
+              + ('  FAILING' if m['errors'] else ''))
+    if 'worker_rss_mb' in result:
+        print(f"RSS MB: master {result['master_rss_mb']}, workers {result['worker_rss_mb']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--mode', choices=('micro', 'macro', 'both'), default='micro')
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--output', help='Write the results to this JSON file.')
+    parser.add_argument('--baseline', help='Fail if results regress against this JSON file.')
+    parser.add_argument('--tolerance', type=float, default=0.15)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    try:
+        database_uri = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+        app = create_app(bench_config(database_uri, directory))
+        with app.app_context():
+            db.create_all()
+            start = time.perf_counter()
+            seed(args.users)
+            print(f'Seeded {args.users} users in {time.perf_counter() - start:.1f}s')
+
+        results = {
+            'users': args.users,
+            'seconds': args.seconds,
+            'python': platform.python_version(),
+            'cpus': os.cpu_count(),
+            'modes': {},
+        }
+        if args.mode in ('micro', 'both'):
+            results['modes']['micro'] = run_micro(database_uri, directory, args.users, args.seconds)
+            print_table('micro (test client)', results['modes']['micro'])
+        if args.mode in ('macro', 'both'):
+            results['modes']['macro'] = run_macro(database_uri, directory, args.users, args.seconds,
+                                                  args.workers, args.clients)
+            print_table(f'macro (gunicorn, {args.workers} workers, {args.clients} clients)',
+                        results['modes']['macro'])
+    finally:
+        shutil.rmtree(directory)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f'\nSaved results to {args.output}')
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        for mode, route, metric, before, now in regressions:
+            print(f'REGRESSION {mode} {route} {metric}: {before} -> {now}')
+        if regressions:
+            sys.exit(1)
+        print(f'No regressions beyond {args.tolerance:.0%} against {args.baseline}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""
+SQLite writer/reader concurrency with and without the production tuning.
+
+Runs writer and reader processes (standing in for gunicorn workers) against
+one SQLite file for a fixed time, once per profile:
+
+* ``baseline`` - Config: rollback journal, default pysqlite settings.
+* ``tuned``    - ProductionConfig: WAL, synchronous=NORMAL, busy_timeout,
+                 mmap_size and cache_size PRAGMAs plus the pool options.
+
+Writers register users one transaction at a time; readers run the
+registration availability check. Reports throughput, latency percentiles
+and the number of "database is locked" errors per role.
+
+Usage:
+    python benchmarks/bench_sqlite_concurrency.py [--writers 4] [--readers 8] [--seconds 10]
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from sqlalchemy import insert
+from sqlalchemy.exc import OperationalError
+from app import create_app, db
+from app.auth.validators import check_availability
+from app.config import Config, ProductionConfig
+from app.models import User
+
+PROFILES = {'baseline': Config, 'tuned': ProductionConfig}
+
+
+def make_config(profile, uri):
+    return type('BenchConfig', (PROFILES[profile],), {
+        'SQLALCHEMY_DATABASE_URI': uri,
+        'AVAILABILITY_FILTER_ENABLED': False,
+        'PASSWORD_CALIBRATE_ON_STARTUP': False,
+    })
+
+
+def seed(uri, count):
+    app = create_app(make_config('baseline', uri))
+    with app.app_context():
+        db.create_all()
+        db.session.execute(insert(User), [
+            {'username': f'seed{i}', 'email': f'seed{i}@example.com', 'password_hash': 'x'}
+            for i in range(count)
+        ])
+        db.session.commit()
+        db.engine.dispose()
+
+
+def worker(profile, uri, role, index, seconds, users):
+    app = create_app(make_config(profile, uri))
+    latencies = []
+    errors = 0
+    with app.app_context():
+        deadline = time.monotonic() + seconds
+        n = 0
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            try:
+                if role == 'writer':
+                    name = f'{profile}-w{index}-{n}'
+                    db.session.add(User(username=name, email=f'{name}@example.com', password_hash='x'))
+                    db.session.commit()
+                else:
+                    name = f'seed{random.randrange(users * 2)}'
+                    check_availability(username=name, email=f'{name}@example.com')
+                    db.session.rollback()
+            except OperationalError:
+                db.session.rollback()
+                errors += 1
+                continue
+            finally:
+                n += 1
+            latencies.append(time.perf_counter() - start)
+    return role, latencies, errors
+
+
+def run(profile, args, directory):
+    uri = f"sqlite:///{os.path.join(directory, f'{profile}.db')}"
+    seed(uri, args.users)
+    jobs = [(profile, uri, 'writer', i, args.seconds, args.users) for i in range(args.writers)]
+    jobs += [(profile, uri, 'reader', i, args.seconds, args.users) for i in range(args.readers)]
+    with multiprocessing.Pool(len(jobs)) as pool:
+        results = pool.starmap(worker, jobs)
+
+    summary = {}
+    for role in ('writer', 'reader'):
+        latencies = sorted(l for r, lat, _ in results if r == role for l in lat)
+        errors = sum(e for r, _, e in results if r == role)
+        if latencies:
+            p50 = statistics.median(latencies)
+            p99 = latencies[max(0, int(len(latencies) * 0.99) - 1)]
+        else:
+            p50 = p99 = 0.0
+        summary[role] = (len(latencies) / args.seconds, p50, p99, errors)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--users', type=int, default=10000)
+    args = parser.parse_args()
+
+    print(f"{'profile':<9} {'role':<7} {'ops/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'locked':>7}")
+    with tempfile.TemporaryDirectory() as directory:
+        for profile in PROFILES:
+            summary = run(profile, args, directory)
+            for role, (rate, p50, p99, errors) in summary.items():
+                print(f'{profile:<9} {role:<7} {rate:9.0f} {p50 * 1000:9.2f} {p99 * 1000:9.2f} {errors:7d}')
+
+
+if __name__ == '__main__':
+    main()
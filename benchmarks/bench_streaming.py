@@ -0,0 +1,96 @@
+"""
+Time-to-first-byte and peak memory of buffered vs streamed dashboard renders.
+
+A synthetic dashboard extending base.html-like layout renders a table of
+N rows per user. For each size the page is requested through the Flask
+test client with ``STREAM_TEMPLATES`` off and on; TTFB is the time until
+the first body chunk is available, and peak memory is the tracemalloc
+high-water mark while the whole body is consumed.
+
+Usage:
+    python benchmarks/bench_streaming.py [--rows 1000 10000 50000]
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from flask import request
+from jinja2 import ChoiceLoader, DictLoader
+from app import create_app
+from app.config import Config
+from app.templating import render_template_streamed
+
+TEMPLATES = {
+    'bench/layout.html': (
+        '<!DOCTYPE html><html><head><title>Dashboard</title>'
+        '<link rel="stylesheet" href="/static/css/styles.css"></head><body>'
+        '<header><nav><ul><li>Home</li><li>Dashboard</li></ul></nav></header>'
+        '<main>{% block content %}{% endblock %}</main><footer></footer></body></html>'
+    ),
+    'bench/dashboard.html': (
+        '{% extends "bench/layout.html" %}{% block content %}<table>'
+        '{% for row in rows %}<tr><td>{{ row.id }}</td><td>{{ row.name }}</td>'
+        '<td>{{ row.email }}</td><td>{{ "%.2f"|format(row.score) }}</td></tr>{% endfor %}'
+        '</table>{% endblock %}'
+    ),
+}
+
+
+class BenchConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    RESPONSE_CACHE_BACKEND = 'null'
+
+
+def make_rows(count):
+    for i in range(count):
+        yield {'id': i, 'name': f'user{i}', 'email': f'user{i}@example.com', 'score': i * 0.37}
+
+
+def measure(client, rows):
+    tracemalloc.start()
+    start = time.perf_counter()
+    response = client.get(f'/bench?rows={rows}', buffered=False)
+    body = iter(response.response)
+    first = next(body)
+    ttfb = time.perf_counter() - start
+    size = len(first) + sum(len(chunk) for chunk in body)
+    total = time.perf_counter() - start
+    response.close()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return ttfb, total, peak, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000, 50000])
+    args = parser.parse_args()
+
+    app = create_app(BenchConfig)
+    app.jinja_loader = ChoiceLoader([DictLoader(TEMPLATES), app.jinja_loader])
+
+    def dashboard():
+        rows = make_rows(int(request.args['rows']))
+        return render_template_streamed('bench/dashboard.html', rows=rows)
+
+    app.add_url_rule('/bench', 'main.bench', dashboard)
+    client = app.test_client()
+    client.get('/bench?rows=10')
+
+    print(f"{'rows':>8} {'mode':<9} {'ttfb ms':>9} {'total ms':>9} {'peak KB':>9} {'body KB':>9}")
+    for rows in args.rows:
+        for streamed in (False, True):
+            app.config['STREAM_TEMPLATES'] = streamed
+            ttfb, total, peak, size = measure(client, rows)
+            mode = 'streamed' if streamed else 'buffered'
+            print(f'{rows:>8} {mode:<9} {ttfb * 1000:9.2f} {total * 1000:9.2f} '
+                  f'{peak / 1024:9.0f} {size / 1024:9.0f}')
+
+
+if __name__ == '__main__':
+    main()
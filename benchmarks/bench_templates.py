@@ -0,0 +1,59 @@
+"""
+First-load latency of every template, with and without the bytecode cache.
+
+"cold" is what a fresh worker pays today: parse and compile from source.
+"bytecode" is the same load once ``flask templates compile`` has filled
+the cache directory. Each measurement uses a brand-new Jinja environment,
+so the in-memory template cache never helps.
+
+Usage:
+    python benchmarks/bench_templates.py [--rounds N]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from jinja2 import FileSystemBytecodeCache
+from app import create_app
+from app.templating import list_app_templates, warm_templates
+
+
+def first_load(app, name, bytecode_cache=None):
+    env = app.create_jinja_environment()
+    env.bytecode_cache = bytecode_cache
+    start = time.perf_counter()
+    env.get_template(name)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rounds', type=int, default=20)
+    args = parser.parse_args()
+
+    app = create_app()
+    with tempfile.TemporaryDirectory() as directory:
+        cache = FileSystemBytecodeCache(directory)
+        env = app.create_jinja_environment()
+        env.bytecode_cache = cache
+        warm_templates(app, env)
+
+        print(f"{'template':<32} {'cold ms':>10} {'bytecode ms':>12} {'speedup':>8}")
+        total_cold = total_cached = 0
+        for name in list_app_templates(app):
+            cold = statistics.median(first_load(app, name) for _ in range(args.rounds))
+            cached = statistics.median(first_load(app, name, cache) for _ in range(args.rounds))
+            total_cold += cold
+            total_cached += cached
+            print(f'{name:<32} {cold * 1000:10.3f} {cached * 1000:12.3f} {cold / cached:7.1f}x')
+        print(f"{'all templates':<32} {total_cold * 1000:10.3f} {total_cached * 1000:12.3f} "
+              f'{total_cold / total_cached:7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
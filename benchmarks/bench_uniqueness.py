@@ -0,0 +1,105 @@
+"""
+Registration validation latency against a large user table.
+
+Seeds a SQLite file with N users (1M by default), then times the
+uniqueness checks a RegistrationForm runs:
+
+* ``orm``    - the old validators: two ``filter_by(...).first()`` queries that
+               load full User rows (case-sensitive).
+* ``lower``  - case-insensitive ``lower()`` comparisons without the expression
+               indexes, i.e. what a naive case-insensitive check costs.
+* ``exists`` - check_availability(): one SELECT with two EXISTS subqueries
+               served by the ``lower()`` expression indexes.
+
+Usage:
+    python benchmarks/bench_uniqueness.py [--users 1000000] [--lookups 2000]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from sqlalchemy import func, insert
+from app import create_app, db
+from app.auth.validators import check_availability
+from app.config import Config
+from app.models import User
+
+
+def seed(count, batch_size=50000):
+    rows = ({'username': f'user{i}', 'email': f'user{i}@example.com', 'password_hash': 'x'}
+            for i in range(count))
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == batch_size:
+            db.session.execute(insert(User), batch)
+            batch = []
+    if batch:
+        db.session.execute(insert(User), batch)
+    db.session.commit()
+
+
+def timed(check, names):
+    samples = []
+    for name in names:
+        start = time.perf_counter()
+        check(name)
+        samples.append(time.perf_counter() - start)
+        db.session.rollback()
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.99) - 1]
+
+
+def orm_check(name):
+    User.query.filter_by(username=name).first()
+    User.query.filter_by(email=f'{name}@example.com').first()
+
+
+def lower_check(name):
+    User.query.filter(func.lower(User.username) == name.lower()).first()
+    User.query.filter(func.lower(User.email) == f'{name}@example.com'.lower()).first()
+
+
+def exists_check(name):
+    check_availability(username=name, email=f'{name}@example.com')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, default=1000000)
+    parser.add_argument('--lookups', type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        config = type('BenchConfig', (Config,), {
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(directory, 'bench.db')}",
+        })
+        app = create_app(config)
+        with app.app_context():
+            db.create_all()
+            start = time.perf_counter()
+            seed(args.users)
+            print(f'Seeded {args.users} users in {time.perf_counter() - start:.1f}s')
+
+            names = [f'User{random.randrange(args.users * 2)}' for _ in range(args.lookups)]
+            results = {'orm': timed(orm_check, names), 'exists': timed(exists_check, names)}
+
+            db.session.execute(db.text('DROP INDEX ix_user_username_lower'))
+            db.session.execute(db.text('DROP INDEX ix_user_email_lower'))
+            lower_names = names[:max(1, args.lookups // 100)]
+            results['lower'] = timed(lower_check, lower_names)
+
+        print(f"{'check':<8} {'p50 ms':>10} {'p99 ms':>10}")
+        for name in ('orm', 'lower', 'exists'):
+            p50, p99 = results[name]
+            print(f'{name:<8} {p50 * 1000:10.3f} {p99 * 1000:10.3f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""
+Profile picture upload cost for large photos.
+
+Generates a ``--megapixels`` JPEG (20 MP by default) and compares:
+
+* ``inline``   - the old save_picture: full decode, thumbnail and save in
+                 the request thread.
+* ``pipeline`` - Uploads.save_picture: time until the request can return
+                 (spool + header check + enqueue), then time until every
+                 thumbnail is written.
+
+Peak resident memory is reported for the measuring process (inline) and
+for the worker processes (pipeline), which is where decoding happens.
+
+Usage:
+    python benchmarks/bench_uploads.py [--megapixels 20] [--rounds 5]
+"""
+import argparse
+import io
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from PIL import Image
+from werkzeug.datastructures import FileStorage
+from app import create_app
+from app.config import TestingConfig
+from app.extensions import uploads
+
+
+def make_photo(megapixels):
+    width = int((megapixels * 1_000_000 * 3 / 2) ** 0.5)
+    height = int(width * 2 / 3)
+    # Noise compresses like a real photo; a flat colour would not.
+    image = Image.frombytes('RGB', (width, height), os.urandom(width * height * 3))
+    buffer = io.BytesIO()
+    image.save(buffer, format='JPEG', quality=90)
+    return buffer.getvalue(), (width, height)
+
+
+def peak_rss_mb(who):
+    # ru_maxrss is KiB on Linux.
+    return resource.getrusage(who).ru_maxrss / 1024
+
+
+def inline(data, output_dir, rounds):
+    elapsed = []
+    for i in range(rounds):
+        start = time.perf_counter()
+        image = Image.open(io.BytesIO(data))
+        image.thumbnail((125, 125))
+        image.save(os.path.join(output_dir, f'inline{i}.jpg'))
+        elapsed.append(time.perf_counter() - start)
+    return min(elapsed)
+
+
+def pipeline(app, data, rounds):
+    accept, total = [], []
+    with app.test_request_context():
+        for i in range(rounds):
+            # Vary one byte so every round misses the dedupe check.
+            payload = data[:-3] + bytes([i % 256]) + data[-2:]
+            start = time.perf_counter()
+            uploads.save_picture(FileStorage(stream=io.BytesIO(payload), filename='photo.jpg'))
+            accept.append(time.perf_counter() - start)
+            uploads.wait()
+            total.append(time.perf_counter() - start)
+    return min(accept), min(total)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--megapixels', type=float, default=20)
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+
+    data, size = make_photo(args.megapixels)
+    print(f'{size[0]}x{size[1]} JPEG, {len(data) / 1024 / 1024:.1f} MB, best of {args.rounds}')
+
+    tmpdir = tempfile.mkdtemp()
+    try:
+        config = type('BenchConfig', (TestingConfig,), {
+            'UPLOAD_SPOOL_DIR': os.path.join(tmpdir, 'spool'),
+            'UPLOAD_MAX_PIXELS': int(args.megapixels * 2_000_000),
+            'UPLOAD_MAX_BYTES': len(data) * 2,
+            'UPLOAD_WORKERS': 1,
+            'AVAILABILITY_FILTER_ENABLED': False,
+        })
+        app = create_app(config)
+        app.extensions['uploads']['output_dir'] = os.path.join(tmpdir, 'pics')
+
+        baseline_rss = peak_rss_mb(resource.RUSAGE_SELF)
+        accept, total = pipeline(app, data, args.rounds)
+        worker_rss = peak_rss_mb(resource.RUSAGE_CHILDREN)
+        inline_seconds = inline(data, tmpdir, args.rounds)
+        inline_rss = peak_rss_mb(resource.RUSAGE_SELF)
+
+        print(f"{'mode':<10} {'request ms':>11} {'done ms':>9} {'peak RSS MB':>12}")
+        print(f"{'inline':<10} {inline_seconds * 1000:11.1f} {inline_seconds * 1000:9.1f} "
+              f"{inline_rss:12.1f}  (process was {baseline_rss:.1f} before)")
+        print(f"{'pipeline':<10} {accept * 1000:11.1f} {total * 1000:9.1f} {worker_rss:12.1f}  (worker)")
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""
+Cost of the logged-in navigation bar with and without the user cache.
+
+Every page's nav checks ``current_user``. Without the cache each request
+loads the User row; with it, the snapshot comes from the per-process
+cache. Renders ``--path`` ``--requests`` times for a logged-in user and
+reports the time and SQL statements per request.
+
+Usage:
+    python benchmarks/bench_user_cache.py [--requests 2000] [--path /about]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from app import create_app, db
+from app.config import TestingConfig
+from app.models import User
+from app.query_audit import audit_queries
+
+
+def run(enabled, path, requests):
+    config = type('BenchConfig', (TestingConfig,), {'USER_CACHE_ENABLED': enabled, 'DEBUG': False})
+    app = create_app(config)
+    with app.app_context():
+        db.create_all()
+        user = User(username='bench', email='bench@example.com', password_hash='x')
+        db.session.add(user)
+        db.session.commit()
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['user_id'] = user.id
+        for _ in range(20):
+            client.get(path)
+
+        with audit_queries(explain=False) as audit:
+            start = time.perf_counter()
+            for _ in range(requests):
+                client.get(path)
+            elapsed = time.perf_counter() - start
+        return elapsed / requests, len(audit) / requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--path', default='/about')
+    args = parser.parse_args()
+
+    print(f"{'user cache':<12} {'ms/request':>11} {'queries/request':>16}")
+    for enabled in (False, True):
+        seconds, queries = run(enabled, args.path, args.requests)
+        print(f"{'on' if enabled else 'off':<12} {seconds * 1000:11.3f} {queries:16.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,25 @@
+"""Add case-insensitive username/email indexes
+
+Revision ID: 5f3c2a1b9d7e
+Revises: 0987654321cd
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '5f3c2a1b9d7e'
+down_revision = '0987654321cd'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Expression indexes so lower(username) / lower(email) lookups are
+    # index seeks rather than table scans.
+    op.create_index('ix_user_username_lower', 'user', [sa.text('lower(username)')])
+    op.create_index('ix_user_email_lower', 'user', [sa.text('lower(email)')])
+
+def downgrade():
+    op.drop_index('ix_user_email_lower', table_name='user')
+    op.drop_index('ix_user_username_lower', table_name='user')
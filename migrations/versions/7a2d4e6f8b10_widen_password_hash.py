@@ -0,0 +1,26 @@
+"""Widen user.password_hash for argon2id/scrypt hashes
+
+Revision ID: 7a2d4e6f8b10
+Revises: 5f3c2a1b9d7e
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '7a2d4e6f8b10'
+down_revision = '5f3c2a1b9d7e'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # Werkzeug scrypt hashes are ~160 characters, longer than the old limit.
+    with op.batch_alter_table('user') as batch_op:
+        batch_op.alter_column('password_hash', existing_type=sa.String(length=128),
+                              type_=sa.String(length=255), existing_nullable=False)
+
+def downgrade():
+    with op.batch_alter_table('user') as batch_op:
+        batch_op.alter_column('password_hash', existing_type=sa.String(length=255),
+                              type_=sa.String(length=128), existing_nullable=False)
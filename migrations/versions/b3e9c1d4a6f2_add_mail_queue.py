@@ -0,0 +1,36 @@
+"""Add mail_queue table for the outbound mail worker
+
+Revision ID: b3e9c1d4a6f2
+Revises: 7a2d4e6f8b10
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'b3e9c1d4a6f2'
+down_revision = '7a2d4e6f8b10'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table('mail_queue',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('sender', sa.String(length=120), nullable=False),
+        sa.Column('recipients', sa.Text(), nullable=False),
+        sa.Column('subject', sa.String(length=255), nullable=False),
+        sa.Column('body', sa.Text(), nullable=False),
+        sa.Column('status', sa.String(length=16), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('next_attempt_at', sa.DateTime(), nullable=False),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('sent_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_mail_queue_status_next_attempt_at', 'mail_queue', ['status', 'next_attempt_at'])
+
+def downgrade():
+    op.drop_index('ix_mail_queue_status_next_attempt_at', table_name='mail_queue')
+    op.drop_table('mail_queue')
@@ -0,0 +1,54 @@
+"""Replace password_reset with the password_reset_request table the model uses
+
+Revision ID: c4d8e2f1a9b3
+Revises: b3e9c1d4a6f2
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.sql import func
+
+# revision identifiers, used by Alembic.
+revision = 'c4d8e2f1a9b3'
+down_revision = 'b3e9c1d4a6f2'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # PasswordResetRequest (and 'flask auth prune-resets') use a
+    # password_reset_request table keyed by an indexed timestamp; the old
+    # table's created_at becomes that timestamp.
+    op.create_table('password_reset_request',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('token', sa.String(length=128), nullable=False),
+        sa.Column('timestamp', sa.DateTime(timezone=True), server_default=func.now(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('token')
+    )
+    op.create_index('ix_password_reset_request_timestamp', 'password_reset_request', ['timestamp'])
+    op.execute(
+        'INSERT INTO password_reset_request (id, user_id, token, timestamp) '
+        'SELECT id, user_id, token, created_at FROM password_reset'
+    )
+    op.drop_table('password_reset')
+
+def downgrade():
+    op.create_table(
+        'password_reset',
+        sa.Column('id', sa.Integer, primary_key=True, autoincrement=True),
+        sa.Column('user_id', sa.Integer, sa.ForeignKey('user.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('token', sa.String(length=128), nullable=False, unique=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=func.now(), nullable=False),
+        sa.Column('expires_at', sa.DateTime(timezone=True), nullable=False),
+    )
+    # The expiry was never stored in the new table; treat the rows as expired.
+    op.execute(
+        'INSERT INTO password_reset (id, user_id, token, created_at, expires_at) '
+        'SELECT id, user_id, token, timestamp, timestamp FROM password_reset_request '
+        'WHERE user_id IS NOT NULL AND timestamp IS NOT NULL'
+    )
+    op.drop_index('ix_password_reset_request_timestamp', table_name='password_reset_request')
+    op.drop_table('password_reset_request')
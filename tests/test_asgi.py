@@ -0,0 +1,93 @@
+# tests/test_asgi.py
+
+import asyncio
+import time
+import unittest
+from app import create_app
+from app.asgi import FlaskASGI
+from app.config import TestingConfig
+
+
+def call(asgi_app, method='GET', path='/', body=b'', headers=()):
+    """Sends one request through an ASGI app and collects the response."""
+    messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0) if messages else {'type': 'http.disconnect'}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        'type': 'http', 'http_version': '1.1', 'method': method, 'scheme': 'http',
+        'path': path, 'root_path': '', 'query_string': b'',
+        'headers': [(name.encode(), value.encode()) for name, value in headers],
+        'client': ('127.0.0.1', 50000), 'server': ('testserver', 80),
+    }
+
+    async def run():
+        await asgi_app(scope, receive, send)
+        return sent
+
+    return asyncio.run(run())
+
+
+class ASGITests(unittest.TestCase):
+
+    def setUp(self):
+        """Set up the test environment."""
+        self.app = create_app(TestingConfig)
+        self.asgi = FlaskASGI(self.app, threads=4)
+
+    def tearDown(self):
+        """Tear down the test environment."""
+        self.asgi.executor.shutdown()
+
+    def test_serves_pages(self):
+        sent = call(self.asgi, path='/about')
+        self.assertEqual(sent[0]['type'], 'http.response.start')
+        self.assertEqual(sent[0]['status'], 200)
+        self.assertIn((b'content-type', b'text/html; charset=utf-8'), sent[0]['headers'])
+        body = b''.join(message.get('body', b'') for message in sent[1:])
+        self.assertIn(b'</html>', body)
+        self.assertFalse(sent[-1]['more_body'])
+
+    def test_passes_request_body(self):
+        @self.app.route('/echo', methods=['POST'])
+        def echo():
+            from flask import request
+            return request.get_data()
+
+        sent = call(self.asgi, method='POST', path='/echo', body=b'hello',
+                    headers=[('content-type', 'text/plain'), ('content-length', '5')])
+        self.assertEqual(b''.join(message.get('body', b'') for message in sent[1:]), b'hello')
+
+    def test_async_views_await_concurrently(self):
+        @self.app.route('/fan-out')
+        async def fan_out():
+            await asyncio.gather(*(asyncio.sleep(0.1) for _ in range(5)))
+            return 'done'
+
+        start = time.perf_counter()
+        sent = call(self.asgi, path='/fan-out')
+        self.assertEqual(sent[0]['status'], 200)
+        self.assertLess(time.perf_counter() - start, 0.4)
+
+    def test_lifespan(self):
+        messages = [{'type': 'lifespan.startup'}, {'type': 'lifespan.shutdown'}]
+        sent = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message)
+
+        asyncio.run(self.asgi({'type': 'lifespan'}, receive, send))
+        self.assertEqual([m['type'] for m in sent],
+                         ['lifespan.startup.complete', 'lifespan.shutdown.complete'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,204 @@
+# tests/test_assets.py
+
+import gzip
+import importlib.util
+import os
+import shutil
+import tempfile
+import unittest
+from flask import url_for
+from PIL import Image
+from app import create_app
+from app.assets.compress import compress_static, scan_precompressed
+from app.assets.fonts import build_fonts, scan_usage
+from app.assets.helpers import responsive_image
+from app.assets.images import build_images, width_buckets
+from app.assets.manifest import AssetManifest, build_manifest
+from app.config import Config
+
+
+class TestConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+
+
+class ResponsiveImageTests(unittest.TestCase):
+
+    def setUp(self):
+        """Create a static folder with a single source image."""
+        self.static_folder = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.static_folder, 'images'))
+        self.source = os.path.join(self.static_folder, 'images', 'sample.jpg')
+        Image.new('RGB', (800, 400), (200, 30, 30)).save(self.source)
+
+    def tearDown(self):
+        shutil.rmtree(self.static_folder)
+
+    def build(self, **kwargs):
+        return build_images(self.static_folder, widths=(320, 640), formats=('webp', 'jpeg'),
+                            workers=1, **kwargs)
+
+    def test_width_buckets_never_upscale(self):
+        """Test that widths larger than the source are dropped."""
+        self.assertEqual(width_buckets(800, (320, 640, 1024)), [320, 640, 800])
+        self.assertEqual(width_buckets(2000, (320, 640, 1024)), [320, 640, 1024])
+        self.assertEqual(width_buckets(200, (320, 640)), [200])
+
+    def test_build_writes_hashed_variants(self):
+        """Test that variants are written with content hashes and recorded in the manifest."""
+        manifest, report = self.build()
+        entry = manifest['images/sample.jpg']
+        self.assertEqual(entry['width'], 800)
+        self.assertEqual([v['width'] for v in entry['variants']['webp']], [320, 640])
+        for variant in entry['variants']['jpeg']:
+            self.assertTrue(os.path.exists(os.path.join(self.static_folder, variant['file'])))
+            self.assertRegex(variant['file'], r'sample-\d+w\.[0-9a-f]{10}\.jpg$')
+        self.assertEqual(report[0][1], 'built')
+
+    def test_unchanged_sources_are_skipped(self):
+        """Test that a second build skips images whose content has not changed."""
+        self.build()
+        _, report = self.build()
+        self.assertEqual(report[0][1], 'unchanged')
+
+        Image.new('RGB', (800, 400), (30, 30, 200)).save(self.source)
+        _, report = self.build()
+        self.assertEqual(report[0][1], 'built')
+
+    def test_helper_renders_picture_markup(self):
+        """Test that the Jinja helper emits <picture> markup from the manifest."""
+        manifest, _ = self.build()
+        app = create_app(TestConfig)
+        app.extensions['image_manifest'] = manifest
+        with app.test_request_context():
+            html = responsive_image('images/sample.jpg', alt='Sample', class_='hero')
+            fallback = responsive_image('images/missing.jpg', alt='Missing')
+
+        self.assertTrue(html.startswith('<picture><source type="image/webp"'))
+        self.assertIn(' 320w, ', html)
+        self.assertIn('class="hero"', html)
+        self.assertIn('width="800" height="400"', html)
+        self.assertEqual(fallback, '<img src="/static/images/missing.jpg" alt="Missing" loading="lazy" decoding="async">')
+
+
+class AssetManifestTests(unittest.TestCase):
+
+    def setUp(self):
+        """Create a static folder with a stylesheet and fingerprint it."""
+        self.static_folder = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.static_folder, 'css'))
+        self.css = b'body { margin: 0; }\n' * 100
+        with open(os.path.join(self.static_folder, 'css', 'styles.css'), 'wb') as f:
+            f.write(self.css)
+        with open(os.path.join(self.static_folder, 'robots.txt'), 'w') as f:
+            f.write('User-agent: *')
+        self.manifest_path = os.path.join(self.static_folder, 'build', 'manifest.json')
+        entries = build_manifest(self.static_folder, self.manifest_path)
+        del entries['robots.txt']
+        self.manifest = AssetManifest(entries)
+
+        self.app = create_app(TestConfig)
+        self.app.static_folder = self.static_folder
+        self.app.extensions['asset_manifest'] = self.manifest
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        shutil.rmtree(self.static_folder)
+
+    def test_url_for_returns_fingerprinted_path(self):
+        """Test that url_for('static') resolves hashed names from the manifest."""
+        with self.app.test_request_context():
+            url = url_for('static', filename='css/styles.css')
+            self.assertRegex(url, r'^/static/css/styles\.[0-9a-f]{12}\.css$')
+            self.assertEqual(url_for('static', filename='js/other.js'), '/static/js/other.js')
+
+    def test_fingerprinted_path_is_immutable(self):
+        """Test that hashed paths are served with a far-future immutable lifetime."""
+        response = self.client.get('/static/' + self.manifest.url_path('css/styles.css'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, self.css)
+        self.assertTrue(response.cache_control.immutable)
+        self.assertEqual(response.cache_control.max_age, 31536000)
+
+    def test_unhashed_path_revalidates_with_etag(self):
+        """Test that plain paths use a strong ETag and answer 304 when it matches."""
+        response = self.client.get('/static/css/styles.css')
+        etag, weak = response.get_etag()
+        self.assertEqual(etag, self.manifest.digest('css/styles.css'))
+        self.assertFalse(weak)
+        self.assertTrue(response.cache_control.no_cache)
+
+        response = self.client.get('/static/css/styles.css', headers={'If-None-Match': f'"{etag}"'})
+        self.assertEqual(response.status_code, 304)
+
+        response = self.client.get('/static/robots.txt')
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNotNone(response.get_etag()[0])
+
+    def test_precompressed_variant_is_negotiated(self):
+        """Test that .gz/.br siblings are chosen from Accept-Encoding."""
+        report = compress_static(self.static_folder)
+        self.assertIn('css/styles.css', [row[0] for row in report])
+        self.app.extensions['static_encodings'] = scan_precompressed(self.static_folder)
+
+        response = self.client.get('/static/css/styles.css', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(response.mimetype, 'text/css')
+        self.assertIn('Accept-Encoding', response.vary)
+        self.assertEqual(gzip.decompress(response.data), self.css)
+        self.assertEqual(response.get_etag()[0], self.manifest.digest('css/styles.css') + '-gzip')
+
+        response = self.client.get('/static/css/styles.css', headers={'Accept-Encoding': 'gzip;q=0.5, br'})
+        self.assertEqual(response.headers['Content-Encoding'], 'br')
+
+        response = self.client.get('/static/css/styles.css')
+        self.assertNotIn('Content-Encoding', response.headers)
+        self.assertEqual(response.data, self.css)
+
+
+class FontSubsetTests(unittest.TestCase):
+
+    def setUp(self):
+        """Create a static folder with two Roboto faces, a template and a stylesheet."""
+        self.static_folder = tempfile.mkdtemp()
+        fonts = os.path.join(create_app(TestConfig).static_folder, 'fonts')
+        os.makedirs(os.path.join(self.static_folder, 'fonts'))
+        for name in ('Roboto-Regular.ttf', 'Roboto-Black.ttf'):
+            shutil.copy(os.path.join(fonts, name), os.path.join(self.static_folder, 'fonts'))
+
+        self.template = os.path.join(self.static_folder, 'page.html')
+        with open(self.template, 'w', encoding='utf-8') as f:
+            f.write('{% block content %}<h1>Caf&eacute; \u2603</h1>{{ user.name }}{% endblock %}')
+        self.stylesheet = os.path.join(self.static_folder, 'styles.css')
+        with open(self.stylesheet, 'w') as f:
+            f.write('.note { font-style: italic; } .x::before { content: "\u2192"; }')
+
+    def tearDown(self):
+        shutil.rmtree(self.static_folder)
+
+    def test_scan_finds_glyphs_and_faces(self):
+        """Test that template text, CSS content and implied faces are detected."""
+        codepoints, faces = scan_usage([self.template], [self.stylesheet])
+        self.assertIn(ord('\u00e9'), codepoints)
+        self.assertIn(ord('\u2603'), codepoints)
+        self.assertIn(ord('\u2192'), codepoints)
+        self.assertNotIn(ord('{'), codepoints - set(range(0x20, 0x7f)))
+        self.assertEqual(faces, {(400, 'normal'), (400, 'italic'), (700, 'normal'), (700, 'italic')})
+
+    @unittest.skipUnless(importlib.util.find_spec('fontTools'), 'fontTools is not installed')
+    def test_build_drops_unused_weights(self):
+        """Test that used faces are subsetted to WOFF2 and unused ones are dropped."""
+        manifest, report = build_fonts(self.static_folder, [self.template], [])
+        sizes = {name: (before, after) for name, before, after in report}
+        self.assertIsNone(sizes['Roboto-Black.ttf'][1])
+        self.assertLess(sizes['Roboto-Regular.ttf'][1], sizes['Roboto-Regular.ttf'][0])
+        self.assertEqual(len(manifest['preload']), 1)
+
+        with open(os.path.join(self.static_folder, manifest['stylesheet'])) as f:
+            css = f.read()
+        self.assertIn('font-display: swap;', css)
+        self.assertIn("src: url('fonts/Roboto-Regular.", css)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,154 @@
+# tests/test_availability.py
+
+import os
+import shutil
+import tempfile
+import unittest
+from sqlalchemy import event
+from app import create_app, db
+from app.auth.availability import SNAPSHOT_HEADER, availability
+from app.bloom import BloomFilter
+from app.config import Config
+from app.models import User
+
+
+class TestConfig(Config):
+    TESTING = True
+    WTF_CSRF_ENABLED = False
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    AVAILABILITY_FILTER_CAPACITY = 1000
+
+
+class BloomFilterTests(unittest.TestCase):
+
+    def test_no_false_negatives(self):
+        bloom = BloomFilter(capacity=1000, error_rate=0.01)
+        items = [f'user{i}' for i in range(1000)]
+        for item in items:
+            bloom.add(item)
+        self.assertTrue(all(item in bloom for item in items))
+
+    def test_false_positive_rate_near_target(self):
+        bloom = BloomFilter(capacity=1000, error_rate=0.01)
+        for i in range(1000):
+            bloom.add(f'user{i}')
+        false_positives = sum(f'other{i}' in bloom for i in range(10000))
+        self.assertLess(false_positives / 10000, 0.03)
+
+    def test_round_trip(self):
+        bloom = BloomFilter(capacity=100)
+        bloom.add('alice')
+        restored = BloomFilter.from_bytes(bloom.to_bytes())
+        self.assertIn('alice', restored)
+        self.assertEqual(restored.count, 1)
+        with self.assertRaises(ValueError):
+            BloomFilter.from_bytes(b'XXXX' + bloom.to_bytes()[4:])
+
+
+class AvailabilityEndpointTests(unittest.TestCase):
+
+    def setUp(self):
+        """Set up the test environment."""
+        self.tmpdir = tempfile.mkdtemp()
+        TestConfig.AVAILABILITY_FILTER_SNAPSHOT = os.path.join(self.tmpdir, 'availability.bloom')
+        self.app = create_app(TestConfig)
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        db.session.add(User(username='TestUser', email='Test@Example.com', password_hash='x'))
+        db.session.commit()
+        availability.rebuild(self.app)
+
+    def tearDown(self):
+        """Tear down the test environment."""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+        shutil.rmtree(self.tmpdir)
+
+    def count_queries(self):
+        statements = []
+        event.listen(db.engine, 'before_cursor_execute',
+                     lambda conn, cursor, statement, *args: statements.append(statement))
+        return statements
+
+    def test_unknown_values_skip_the_database(self):
+        statements = self.count_queries()
+        response = self.client.get('/auth/check-availability?username=newcomer&email=new@example.com')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json['username']['available'])
+        self.assertTrue(response.json['email']['available'])
+        self.assertEqual(statements, [])
+
+    def test_taken_values_are_confirmed_by_the_database(self):
+        statements = self.count_queries()
+        response = self.client.get('/auth/check-availability?username=testuser&email=TEST@example.com')
+        self.assertFalse(response.json['username']['available'])
+        self.assertFalse(response.json['email']['available'])
+        self.assertEqual(len(statements), 1)
+
+    def test_new_users_are_added_on_insert(self):
+        db.session.add(User(username='Another', email='another@example.com', password_hash='x'))
+        db.session.commit()
+        response = self.client.get('/auth/check-availability?username=another')
+        self.assertFalse(response.json['username']['available'])
+
+    def test_renamed_users_are_added_on_update(self):
+        user = db.session.scalar(db.select(User))
+        user.username = 'Renamed'
+        db.session.commit()
+        response = self.client.get('/auth/check-availability?username=renamed')
+        self.assertFalse(response.json['username']['available'])
+
+    def test_unchanged_values_are_not_re_added_on_update(self):
+        state = self.app.extensions['availability_filter']
+        count = state.bloom.count
+        user = db.session.scalar(db.select(User))
+        user.password_hash = 'changed'
+        db.session.commit()
+        self.assertEqual(state.bloom.count, count)
+        user.email = 'new@example.com'
+        db.session.commit()
+        self.assertEqual(state.bloom.count, count + 1)
+
+    def test_snapshot_from_another_process_is_merged(self):
+        state = self.app.extensions['availability_filter']
+        outside = availability._new_filter(self.app)
+        outside.add('u:outsider')
+        path = self.app.config['AVAILABILITY_FILTER_SNAPSHOT']
+        with open(path, 'wb') as f:
+            f.write(SNAPSHOT_HEADER.pack(0) + outside.to_bytes())
+        os.utime(path, ns=(state.snapshot_mtime + 10 ** 9, state.snapshot_mtime + 10 ** 9))
+        state.refreshed_at = 0
+        self.client.get('/auth/check-availability?username=newcomer')
+        self.assertIn('u:outsider', state.bloom)
+        self.assertIn('u:testuser', state.bloom)
+
+    def test_requires_a_value(self):
+        self.assertEqual(self.client.get('/auth/check-availability').status_code, 400)
+        self.assertEqual(self.client.get('/auth/check-availability?username=' + 'x' * 51).status_code, 400)
+
+    def test_snapshot_is_loaded_and_topped_up(self):
+        db.session.add(User(username='Later', email='later@example.com', password_hash='x'))
+        db.session.commit()
+        state = self.app.extensions['availability_filter']
+        state.bloom = BloomFilter(num_bits=8, num_hashes=1)
+        availability.load(self.app)
+        self.assertEqual(state.max_id, 2)
+        self.assertIn('u:testuser', state.bloom)
+        self.assertIn('u:later', state.bloom)
+
+    def test_stats(self):
+        self.client.get('/auth/check-availability?username=newcomer')
+        self.client.get('/auth/check-availability?username=testuser')
+        stats = availability.stats()
+        self.assertEqual(stats['lookups'], 2)
+        self.assertEqual(stats['filter_negatives'], 1)
+        self.assertEqual(stats['db_checks'], 1)
+        self.assertEqual(stats['false_positives'], 0)
+        self.assertIn('estimated_false_positive_rate', stats)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,158 @@
+# tests/test_bulk.py
+
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from sqlalchemy import event
+from app import create_app, db
+from app.auth.bulk import ImportAborted, UserImport, export_users, read_rows
+from app.config import TestingConfig
+from app.models import User
+
+
+class BulkUserTests(unittest.TestCase):
+
+    def setUp(self):
+        """Set up the test environment."""
+        self.app = create_app(TestingConfig)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        existing = User(username='Alice', email='alice@example.com')
+        existing.set_password('old-password')
+        db.session.add(existing)
+        db.session.commit()
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """Tear down the test environment."""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+        shutil.rmtree(self.tmpdir)
+
+    def write_file(self, name, content):
+        path = os.path.join(self.tmpdir, name)
+        with open(path, 'w', newline='') as f:
+            f.write(content)
+        return path
+
+    def run_import(self, lines, fmt='jsonl', **options):
+        importer = UserImport(workers=1, **options)
+        stats = importer.run(read_rows(io.StringIO('\n'.join(lines)), fmt))
+        return stats, importer
+
+    def user(self, username):
+        return db.session.scalar(db.select(User).where(db.func.lower(User.username) == username.lower()))
+
+    def test_import_hashes_passwords_and_keeps_hashes(self):
+        stats, importer = self.run_import([
+            'username,email,password,password_hash',
+            'bob,bob@example.com,secret,',
+            'carol,carol@example.com,,pbkdf2:sha256:1000$salt$hash',
+            ',nobody@example.com,secret,',
+        ], fmt='csv')
+        self.assertEqual((stats['inserted'], stats['invalid'], stats['hashed']), (2, 1, 1))
+        self.assertEqual(importer.errors, [(4, 'username and email are required')])
+        self.assertTrue(self.user('bob').check_password('secret'))
+        self.assertEqual(self.user('carol').password_hash, 'pbkdf2:sha256:1000$salt$hash')
+
+    def test_conflicts_are_case_insensitive(self):
+        row = json.dumps({'username': 'ALICE', 'email': 'new@example.com', 'password': 'new-password'})
+        stats, _ = self.run_import([row], on_conflict='skip')
+        self.assertEqual((stats['inserted'], stats['skipped']), (0, 1))
+        self.assertTrue(self.user('alice').check_password('old-password'))
+
+        stats, _ = self.run_import([row], on_conflict='update')
+        self.assertEqual(stats['updated'], 1)
+        db.session.expire_all()
+        alice = self.user('alice')
+        self.assertEqual((alice.username, alice.email), ('ALICE', 'new@example.com'))
+        self.assertTrue(alice.check_password('new-password'))
+        self.assertEqual(db.session.scalar(db.select(db.func.count(User.id))), 1)
+
+    def test_update_keeps_password_when_none_is_given(self):
+        row = json.dumps({'username': 'alice', 'email': 'ALICE@example.com'})
+        stats, _ = self.run_import([row], on_conflict='update')
+        self.assertEqual(stats['updated'], 1)
+        db.session.expire_all()
+        self.assertTrue(self.user('alice').check_password('old-password'))
+
+    def test_rows_matching_two_users_and_repeated_rows_are_rejected(self):
+        self.run_import([json.dumps({'username': 'bob', 'email': 'bob@example.com'})])
+        stats, importer = self.run_import([
+            json.dumps({'username': 'alice', 'email': 'bob@example.com'}),
+            json.dumps({'username': 'dave', 'email': 'dave@example.com'}),
+            json.dumps({'username': 'Dave', 'email': 'other@example.com'}),
+        ], on_conflict='update')
+        self.assertEqual((stats['conflicts'], stats['duplicates'], stats['inserted']), (1, 1, 1))
+        self.assertEqual([line for line, _ in importer.errors], [1, 3])
+
+    def test_errors_are_reported_as_they_happen_and_capped(self):
+        reported = []
+        lines = [json.dumps({'username': '', 'email': f'user{i}@example.com'}) for i in range(5)]
+        stats, importer = self.run_import(lines, batch_size=2, max_errors=2,
+                                          on_error=lambda line, reason: reported.append(line))
+        self.assertEqual(stats['invalid'], 5)
+        self.assertEqual(reported, [1, 2, 3, 4, 5])
+        self.assertEqual([line for line, _ in importer.errors], [1, 2])
+
+    def test_fail_rolls_back_the_open_transaction(self):
+        lines = [json.dumps({'username': f'user{i}', 'email': f'user{i}@example.com'}) for i in range(6)]
+        lines.append(json.dumps({'username': 'alice', 'email': 'x@example.com'}))
+        with self.assertRaises(ImportAborted):
+            self.run_import(lines, on_conflict='fail', batch_size=2, commit_every=2)
+        # The first two batches were committed; the third is rolled back
+        # with the batch that conflicts.
+        self.assertEqual(db.session.scalar(db.select(db.func.count(User.id))), 5)
+
+    def test_batches_are_single_statements(self):
+        statements = []
+        event.listen(db.engine, 'before_cursor_execute',
+                     lambda conn, cursor, statement, *args: statements.append(statement))
+        lines = [json.dumps({'username': f'user{i}', 'email': f'user{i}@example.com'}) for i in range(10)]
+        stats, _ = self.run_import(lines, batch_size=4)
+        self.assertEqual(stats['inserted'], 10)
+        self.assertEqual(sum(1 for s in statements if s.lstrip().upper().startswith('INSERT')), 3)
+
+    def test_passwords_are_hashed_in_worker_processes(self):
+        lines = [json.dumps({'username': f'user{i}', 'email': f'user{i}@example.com', 'password': f'pw{i}'})
+                 for i in range(6)]
+        importer = UserImport(workers=2, batch_size=4)
+        stats = importer.run(read_rows(io.StringIO('\n'.join(lines)), 'jsonl'))
+        self.assertEqual(stats['inserted'], 6)
+        self.assertTrue(self.user('user5').check_password('pw5'))
+
+    def test_export_round_trip(self):
+        for fmt in ('csv', 'jsonl'):
+            with self.subTest(fmt=fmt):
+                stream = io.StringIO()
+                self.assertEqual(export_users(stream, fmt, batch_size=1), 1)
+                stream.seek(0)
+                records = [record for _, record in read_rows(stream, fmt)]
+                alice = self.user('alice')
+                self.assertEqual(records, [{'username': 'Alice', 'email': 'alice@example.com',
+                                            'password_hash': alice.password_hash}])
+
+    def test_commands(self):
+        path = self.write_file('users.jsonl', json.dumps({'username': 'bob', 'email': 'bob@example.com'}))
+        runner = self.app.test_cli_runner()
+        result = runner.invoke(args=['users', 'import', path, '--workers', '1'])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn('Imported 1 users', result.output)
+
+        export_path = os.path.join(self.tmpdir, 'export.csv')
+        result = runner.invoke(args=['users', 'export', export_path])
+        self.assertIn('Exported 2 users', result.output)
+        with open(export_path) as f:
+            self.assertEqual(f.readline().strip(), 'username,email,password_hash')
+
+        result = runner.invoke(args=['users', 'import', self.write_file('users.txt', '')])
+        self.assertNotEqual(result.exit_code, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
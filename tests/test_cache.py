@@ -0,0 +1,142 @@
+# tests/test_cache.py
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from flask import session
+from app import create_app
+from app.cache import LRUCacheBackend, SQLiteCacheBackend
+from app.config import Config
+from app.extensions import response_cache
+
+
+class TestConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    COMPRESS_RESPONSES = True
+    COMPRESS_MIN_SIZE = 10
+
+
+class CacheBackendTests(unittest.TestCase):
+
+    def test_lru_evicts_least_recently_used(self):
+        """Test that the LRU backend evicts by entry count in LRU order."""
+        cache = LRUCacheBackend(max_entries=2)
+        cache.set('a', b'1')
+        cache.set('b', b'2')
+        cache.get('a')
+        cache.set('c', b'3')
+        self.assertEqual(cache.get('a'), b'1')
+        self.assertIsNone(cache.get('b'))
+
+    def test_lru_respects_byte_limit_and_ttl(self):
+        """Test that the LRU backend enforces its size budget and expiry."""
+        cache = LRUCacheBackend(max_bytes=10)
+        cache.set('a', b'x' * 6)
+        cache.set('b', b'y' * 6)
+        self.assertIsNone(cache.get('a'))
+        cache.set('huge', b'z' * 11)
+        self.assertIsNone(cache.get('huge'))
+
+        cache.set('short', b'1', ttl=0.01)
+        time.sleep(0.02)
+        self.assertIsNone(cache.get('short'))
+
+    def test_sqlite_backend_is_shared(self):
+        """Test that two SQLite backends on one file see each other's entries."""
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'cache.db')
+            first, second = SQLiteCacheBackend(path), SQLiteCacheBackend(path)
+            first.set('main.index:/?|gzip|anon', (200, [], b'body'))
+            self.assertEqual(second.get('main.index:/?|gzip|anon'), (200, [], b'body'))
+            second.delete_prefix('main.index:')
+            self.assertIsNone(first.get('main.index:/?|gzip|anon'))
+        finally:
+            shutil.rmtree(directory)
+
+
+class ResponseCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        """Register a cached view that counts its renders."""
+        self.app = create_app(TestConfig)
+        self.renders = 0
+
+        def page():
+            self.renders += 1
+            return '<p>cached page</p>' * 10
+
+        def login():
+            session['user_id'] = 1
+            return 'ok'
+
+        def personal():
+            self.renders += 1
+            session['visited'] = True
+            return 'personal'
+
+        self.app.add_url_rule('/page', 'main.page', response_cache.cached()(page))
+        self.app.add_url_rule('/login', 'main.login', login)
+        self.app.add_url_rule('/personal', 'main.personal', response_cache.cached()(personal))
+        self.client = self.app.test_client()
+
+    def stats(self):
+        with self.app.app_context():
+            return response_cache.stats()
+
+    def test_second_request_is_a_hit(self):
+        """Test that the view renders once and later requests hit the cache."""
+        first = self.client.get('/page')
+        second = self.client.get('/page')
+        self.assertEqual(self.renders, 1)
+        self.assertEqual(first.headers['X-Cache'], 'MISS')
+        self.assertEqual(second.headers['X-Cache'], 'HIT')
+        self.assertEqual(first.data, second.data)
+        self.assertEqual(self.stats()['hits'], 1)
+        self.assertEqual(self.stats()['misses'], 1)
+
+    def test_key_varies_on_accept_encoding(self):
+        """Test that compressed and identity responses are cached separately."""
+        plain = self.client.get('/page')
+        self.client.get('/page', headers={'Accept-Encoding': 'gzip'})
+        compressed = self.client.get('/page', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(self.renders, 2)
+        self.assertEqual(compressed.headers['Content-Encoding'], 'gzip')
+        self.assertNotIn('Content-Encoding', plain.headers)
+
+    def test_authenticated_requests_bypass(self):
+        """Test that logged-in users never read or fill the cache."""
+        self.client.get('/login')
+        self.client.get('/page')
+        self.client.get('/page')
+        self.assertEqual(self.renders, 2)
+        self.assertEqual(self.stats()['bypasses'], 2)
+
+    def test_pages_that_write_the_session_are_not_stored(self):
+        """Test that a render touching the session is never served to others."""
+        self.client.get('/personal')
+        self.app.test_client().get('/personal')
+        self.assertEqual(self.renders, 2)
+        self.assertEqual(self.stats()['stores'], 0)
+
+    def test_pages_with_csrf_tokens_are_not_stored(self):
+        """Test that the contact form's CSRF token is never cached."""
+        first = self.client.get('/contact')
+        second = self.app.test_client().get('/contact')
+        self.assertNotEqual(second.headers.get('X-Cache'), 'HIT')
+        self.assertNotEqual(first.data, second.data)
+
+    def test_invalidate_drops_endpoint(self):
+        """Test that invalidating an endpoint forces a fresh render."""
+        self.client.get('/page')
+        with self.app.app_context():
+            response_cache.invalidate('main.page')
+        self.client.get('/page')
+        self.assertEqual(self.renders, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
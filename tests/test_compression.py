@@ -0,0 +1,62 @@
+# tests/test_compression.py
+
+import gzip
+import unittest
+from flask import stream_with_context
+from app import create_app
+from app.config import Config
+
+
+class TestConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    COMPRESS_RESPONSES = True
+    COMPRESS_MIN_SIZE = 100
+
+
+class CompressionTests(unittest.TestCase):
+
+    def setUp(self):
+        """Register a few views under the main blueprint's endpoint namespace."""
+        self.app = create_app(TestConfig)
+        self.app.add_url_rule('/big', 'main.big', lambda: '<p>hello</p>' * 100)
+        self.app.add_url_rule('/small', 'main.small', lambda: '<p>hi</p>')
+        self.app.add_url_rule('/other', 'other', lambda: '<p>hello</p>' * 100)
+
+        def streamed():
+            def generate():
+                for _ in range(10):
+                    yield '<p>chunk</p>' * 10
+            return self.app.response_class(stream_with_context(generate()), mimetype='text/html')
+
+        self.app.add_url_rule('/streamed', 'main.streamed', streamed)
+        self.client = self.app.test_client()
+
+    def test_large_response_is_compressed(self):
+        """Test that blueprint responses above the threshold are gzipped."""
+        response = self.client.get('/big', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response.vary)
+        self.assertEqual(gzip.decompress(response.data), b'<p>hello</p>' * 100)
+
+    def test_small_and_foreign_responses_are_untouched(self):
+        """Test that small responses and other blueprints are left alone."""
+        response = self.client.get('/small', headers={'Accept-Encoding': 'gzip'})
+        self.assertNotIn('Content-Encoding', response.headers)
+        response = self.client.get('/other', headers={'Accept-Encoding': 'gzip'})
+        self.assertNotIn('Content-Encoding', response.headers)
+        response = self.client.get('/big')
+        self.assertNotIn('Content-Encoding', response.headers)
+
+    def test_streamed_response_is_compressed_incrementally(self):
+        """Test that streamed responses keep streaming while compressed."""
+        response = self.client.get('/streamed', headers={'Accept-Encoding': 'gzip'}, buffered=False)
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertNotIn('Content-Length', response.headers)
+        chunks = list(response.response)
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(gzip.decompress(b''.join(chunks)), b'<p>chunk</p>' * 100)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+# tests/test_database.py
+
+import os
+import shutil
+import tempfile
+import unittest
+from app import create_app, db
+from app.config import ProductionConfig, TestingConfig
+
+
+class ProductionDatabaseTests(unittest.TestCase):
+
+    def setUp(self):
+        """Set up the test environment."""
+        self.tmpdir = tempfile.mkdtemp()
+        config = type('FileConfig', (ProductionConfig,), {
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(self.tmpdir, 'app.db')}",
+            'AVAILABILITY_FILTER_ENABLED': False,
+            'PASSWORD_CALIBRATE_ON_STARTUP': False,
+        })
+        self.app = create_app(config)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+
+    def tearDown(self):
+        """Tear down the test environment."""
+        db.session.remove()
+        db.engine.dispose()
+        self.app_context.pop()
+        shutil.rmtree(self.tmpdir)
+
+    def pragma(self, name):
+        return db.session.execute(db.text(f'PRAGMA {name}')).scalar()
+
+    def test_pragmas_applied_on_connect(self):
+        self.assertEqual(self.pragma('journal_mode'), 'wal')
+        self.assertEqual(self.pragma('synchronous'), 1)
+        self.assertEqual(self.pragma('busy_timeout'), ProductionConfig.SQLITE_PRAGMAS['busy_timeout'])
+        self.assertEqual(self.pragma('cache_size'), -64000)
+
+    def test_pool_options(self):
+        self.assertEqual(db.engine.pool.size(), ProductionConfig.SQLALCHEMY_ENGINE_OPTIONS['pool_size'])
+        self.assertTrue(db.engine.pool._pre_ping)
+
+
+class ConfigSelectionTests(unittest.TestCase):
+
+    def test_create_app_by_name(self):
+        app = create_app('testing')
+        self.assertTrue(app.config['TESTING'])
+        self.assertEqual(app.config['SQLALCHEMY_DATABASE_URI'], TestingConfig.SQLALCHEMY_DATABASE_URI)
+
+    def test_memory_database_drops_pool_sizing(self):
+        config = type('MemoryConfig', (ProductionConfig,), {
+            'SQLALCHEMY_DATABASE_URI': 'sqlite://',
+            'PASSWORD_CALIBRATE_ON_STARTUP': False,
+        })
+        app = create_app(config)
+        self.assertNotIn('pool_size', app.config['SQLALCHEMY_ENGINE_OPTIONS'])
+        with app.app_context():
+            self.assertEqual(db.session.execute(db.text('SELECT 1')).scalar(), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+# tests/test_instrumentation.py
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from app import create_app, db
+from app.config import TestingConfig
+from app.extensions import instrumentation
+from app.templating import render_template_streamed
+
+
+class InstrumentationTests(unittest.TestCase):
+
+    def setUp(self):
+        """Set up the test environment."""
+        self.tmpdir = tempfile.mkdtemp()
+        config = type('InstrumentedConfig', (TestingConfig,), {
+            'INSTRUMENTATION_ENABLED': True,
+            'PROFILE_DIR': os.path.join(self.tmpdir, 'profiles'),
+            'PROFILE_CONTROL_FILE': os.path.join(self.tmpdir, 'profiling.json'),
+            'PROFILE_CONTROL_INTERVAL': 0,
+        })
+        self.app = create_app(config)
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+    def tearDown(self):
+        """Tear down the test environment."""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+        shutil.rmtree(self.tmpdir)
+
+    def test_disabled_installs_nothing(self):
+        app = create_app(TestingConfig)
+        self.assertNotIn('instrumentation', app.extensions)
+        self.assertNotIn('metrics', app.view_functions)
+        self.assertNotIn('Server-Timing', app.test_client().get('/about').headers)
+
+    def test_server_timing_header(self):
+        response = self.client.get('/about')
+        header = response.headers['Server-Timing']
+        self.assertIn('app;dur=', header)
+        self.assertIn('tpl;dur=', header)
+
+    def test_records_sql_and_templates_per_endpoint(self):
+        self.client.post('/auth/login', data={'email': 'nobody@example.com', 'password': 'password123'})
+        self.client.get('/about')
+        snapshot = instrumentation.snapshot()
+        self.assertGreaterEqual(snapshot['auth.login']['sql_queries'], 1)
+        self.assertGreater(snapshot['main.about']['template_seconds'], 0)
+        self.assertGreater(snapshot['main.about']['response_bytes'], 0)
+
+    def test_prometheus_endpoint(self):
+        self.client.get('/about')
+        self.client.get('/about')
+        response = self.client.get('/metrics')
+        self.assertTrue(response.mimetype.startswith('text/plain'))
+        body = response.get_data(as_text=True)
+        self.assertIn('flask_requests_total{endpoint="main.about"} 2', body)
+        self.assertIn('flask_request_duration_seconds_count{endpoint="main.about"} 2', body)
+        self.assertNotIn('endpoint="metrics"', body)
+
+    def test_profiler_switches_on_at_runtime(self):
+        self.client.get('/about')
+        self.assertFalse(os.path.exists(self.app.config['PROFILE_DIR']))
+
+        result = self.app.test_cli_runner().invoke(args=['profiling', 'start', '--every', '2'])
+        self.assertIn('Profiling every 2th request', result.output)
+        with open(self.app.config['PROFILE_CONTROL_FILE']) as f:
+            self.assertEqual(json.load(f)['every'], 2)
+        for _ in range(4):
+            self.client.get('/about')
+        self.assertEqual(len(os.listdir(self.app.config['PROFILE_DIR'])), 2)
+
+        self.app.test_cli_runner().invoke(args=['profiling', 'stop'])
+        for _ in range(4):
+            self.client.get('/about')
+        self.assertEqual(len(os.listdir(self.app.config['PROFILE_DIR'])), 2)
+
+    def test_metrics_scrapes_do_not_hold_the_profiler(self):
+        self.app.test_cli_runner().invoke(args=['profiling', 'start', '--every', '1'])
+        self.client.get('/metrics')
+        self.client.get('/about')
+        self.assertFalse(self.app.extensions['instrumentation']['profiler_lock'].locked())
+        self.assertEqual(len(os.listdir(self.app.config['PROFILE_DIR'])), 1)
+
+    def test_streamed_responses_are_recorded_when_closed(self):
+        self.app.config['STREAM_TEMPLATES'] = True
+        self.app.add_url_rule('/streamed', 'main.streamed', lambda: render_template_streamed('core/about.html'))
+        self.app.test_cli_runner().invoke(args=['profiling', 'start', '--every', '1'])
+        response = self.client.get('/streamed', buffered=False)
+        self.assertTrue(response.is_streamed)
+        self.assertNotIn('main.streamed', instrumentation.snapshot())
+        body = response.get_data()
+        response.close()
+        metrics = instrumentation.snapshot()['main.streamed']
+        self.assertEqual(metrics['requests'], 1)
+        self.assertGreater(metrics['template_seconds'], 0)
+        self.assertEqual(metrics['response_bytes'], len(body))
+        self.assertFalse(self.app.extensions['instrumentation']['profiler_lock'].locked())
+        self.assertEqual(len(os.listdir(self.app.config['PROFILE_DIR'])), 1)
+
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,211 @@
+# tests/test_mail.py
+
+import importlib.util
+import smtplib
+import socket
+import unittest
+from datetime import datetime, timedelta
+from app import create_app, db
+from app.config import TestingConfig
+from app.extensions import mail
+from app.mail import is_transient, smtp_connect
+from app.models import OutgoingMail, User
+
+
+class RecordingSMTP:
+    """SMTP stand-in that records messages and can fail on demand."""
+
+    def __init__(self, server, errors=None):
+        self.server = server
+        self.errors = errors or []
+
+    def send_message(self, message):
+        if self.errors:
+            raise self.errors.pop(0)
+        self.server.messages.append(message)
+
+    def noop(self):
+        return (250, b'OK')
+
+    def quit(self):
+        pass
+
+
+class RecordingServer:
+
+    def __init__(self, errors=None):
+        self.messages = []
+        self.connections = 0
+        self.errors = errors or []
+
+    def connect(self, config):
+        self.connections += 1
+        return RecordingSMTP(self, self.errors)
+
+
+class MailQueueTests(unittest.TestCase):
+
+    def setUp(self):
+        """Set up the test environment."""
+        self.app = create_app(TestingConfig)
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.server = RecordingServer()
+        self.app.extensions['mail']['pool'].connect = self.server.connect
+
+    def tearDown(self):
+        """Tear down the test environment."""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_send_only_enqueues(self):
+        message = mail.send('Hello', ['a@example.com'], 'Body')
+        self.assertEqual(message.status, 'queued')
+        self.assertEqual(self.server.messages, [])
+        self.assertEqual(mail.stats()['queue'], {'queued': 1})
+
+    def test_flush_reuses_one_connection_per_batch(self):
+        for i in range(5):
+            mail.send(f'Message {i}', [f'user{i}@example.com'], 'Body')
+        self.assertEqual(mail.flush(), 5)
+        self.assertEqual(len(self.server.messages), 5)
+        self.assertEqual(self.server.messages[0]['To'], 'user0@example.com')
+        self.assertEqual(self.server.connections, 1)
+        stats = mail.stats()
+        self.assertEqual(stats['sent'], 5)
+        self.assertEqual(stats['queue'], {'sent': 5})
+
+    def test_pooled_connection_survives_batches(self):
+        self.app.config['MAIL_BATCH_SIZE'] = 2
+        for i in range(5):
+            mail.send(f'Message {i}', ['a@example.com'], 'Body')
+        mail.flush()
+        self.assertEqual(mail.stats()['batches'], 3)
+        self.assertEqual(self.server.connections, 1)
+
+    def test_transient_failure_is_retried_with_backoff(self):
+        self.server.errors.append(smtplib.SMTPServerDisconnected('gone'))
+        message = mail.send('Hello', ['a@example.com'], 'Body')
+        mail.flush()
+        db.session.refresh(message)
+        self.assertEqual(message.status, 'queued')
+        self.assertEqual(message.attempts, 1)
+        self.assertGreater(message.next_attempt_at, datetime.utcnow() + timedelta(seconds=20))
+
+        message.next_attempt_at = datetime.utcnow()
+        db.session.commit()
+        mail.flush()
+        db.session.refresh(message)
+        self.assertEqual(message.status, 'sent')
+        self.assertEqual(self.server.connections, 2)
+
+    def test_connection_failure_defers_the_whole_batch(self):
+        attempts = []
+
+        def refuse(config):
+            attempts.append(config)
+            raise ConnectionRefusedError()
+
+        self.app.extensions['mail']['pool'].connect = refuse
+        for i in range(3):
+            mail.send(f'Message {i}', ['a@example.com'], 'Body')
+        self.assertEqual(mail.flush(), 3)
+        self.assertEqual(len(attempts), 1)
+        messages = db.session.scalars(db.select(OutgoingMail).order_by(OutgoingMail.id)).all()
+        self.assertEqual([m.attempts for m in messages], [1, 0, 0])
+        self.assertEqual({m.status for m in messages}, {'queued'})
+        self.assertEqual({m.next_attempt_at for m in messages}, {messages[0].next_attempt_at})
+
+    def test_batch_stops_before_the_claim_expires(self):
+        self.app.config['MAIL_CLAIM_SECONDS'] = 2 * self.app.config['MAIL_TIMEOUT']
+        mail.send('Hello', ['a@example.com'], 'Body')
+        mail.process_batch()
+        message = db.session.scalar(db.select(OutgoingMail))
+        self.assertEqual((message.status, message.attempts), ('queued', 0))
+        self.assertLessEqual(message.next_attempt_at, datetime.utcnow())
+        self.assertEqual(self.server.messages, [])
+
+    def test_permanent_failure_is_dead_lettered(self):
+        self.server.errors.append(smtplib.SMTPRecipientsRefused({'a@example.com': (550, b'No such user')}))
+        message = mail.send('Hello', ['a@example.com'], 'Body')
+        mail.send('Other', ['b@example.com'], 'Body')
+        mail.flush()
+        db.session.refresh(message)
+        self.assertEqual(message.status, 'dead')
+        self.assertEqual(len(self.server.messages), 1)
+
+    def test_error_classification(self):
+        """Test that SMTP refusals are permanent unless every code is 4xx."""
+        self.assertTrue(is_transient(smtplib.SMTPServerDisconnected('gone')))
+        self.assertTrue(is_transient(ConnectionRefusedError()))
+        self.assertTrue(is_transient(smtplib.SMTPRecipientsRefused({'a@example.com': (451, b'Try later')})))
+        self.assertFalse(is_transient(smtplib.SMTPRecipientsRefused({
+            'a@example.com': (451, b'Try later'), 'b@example.com': (550, b'No such user')})))
+        self.assertFalse(is_transient(smtplib.SMTPSenderRefused(553, b'Bad sender', 'x@example.com')))
+        self.assertFalse(is_transient(smtplib.SMTPNotSupportedError()))
+
+    def test_max_attempts_dead_letters(self):
+        self.app.config['MAIL_MAX_ATTEMPTS'] = 2
+        self.server.errors.extend([ConnectionRefusedError(), ConnectionRefusedError()])
+        message = mail.send('Hello', ['a@example.com'], 'Body')
+        for _ in range(2):
+            mail.flush()
+            db.session.refresh(message)
+            message.next_attempt_at = datetime.utcnow()
+            db.session.commit()
+        self.assertEqual(message.status, 'dead')
+        result = self.app.test_cli_runner().invoke(args=['mail', 'requeue-dead'])
+        self.assertIn('Requeued 1 messages', result.output)
+
+    def test_claimed_messages_are_not_claimed_twice(self):
+        mail.send('Hello', ['a@example.com'], 'Body')
+        self.assertEqual(len(mail._claim(10)), 1)
+        self.assertEqual(mail._claim(10), [])
+
+    def test_reset_request_queues_email(self):
+        user = User(username='testuser', email='test@example.com')
+        user.set_password('password123')
+        db.session.add(user)
+        db.session.commit()
+        response = self.client.post('/auth/reset_request', data={'email': 'test@example.com'})
+        self.assertEqual(response.status_code, 302)
+        queued = OutgoingMail.query.one()
+        self.assertEqual(queued.recipients, 'test@example.com')
+        self.assertIn('/auth/reset_password/', queued.body)
+
+    @unittest.skipUnless(importlib.util.find_spec('aiosmtpd'), 'aiosmtpd is not installed')
+    def test_delivers_to_local_smtp_server(self):
+        from aiosmtpd.controller import Controller
+        from aiosmtpd.handlers import Sink
+
+        class Recorder(Sink):
+            def __init__(self):
+                self.envelopes = []
+
+            async def handle_DATA(self, server, session, envelope):
+                self.envelopes.append(envelope)
+                return '250 OK'
+
+        with socket.socket() as probe:
+            probe.bind(('127.0.0.1', 0))
+            port = probe.getsockname()[1]
+        handler = Recorder()
+        controller = Controller(handler, hostname='127.0.0.1', port=port)
+        controller.start()
+        try:
+            self.app.config.update(MAIL_SERVER='127.0.0.1', MAIL_PORT=port)
+            pool = self.app.extensions['mail']['pool']
+            pool.connect = smtp_connect
+            mail.send('Hello', ['a@example.com', 'b@example.com'], 'Body')
+            mail.flush()
+            pool.close()
+        finally:
+            controller.stop()
+        self.assertEqual(handler.envelopes[0].rcpt_tos, ['a@example.com', 'b@example.com'])
+
+
+if __name__ == '__main__':
+    unittest.main()
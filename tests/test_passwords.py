@@ -0,0 +1,93 @@
+# tests/test_passwords.py
+
+import unittest
+from app import create_app, db
+from app.config import TestingConfig
+from app.extensions import passwords
+from app.models import User
+from app.passwords import PasswordHasherBusy, Pbkdf2Backend, ScryptBackend, available_backends, calibrate
+
+
+class PasswordHashingTests(unittest.TestCase):
+
+    def setUp(self):
+        """Set up the test environment."""
+        self.app = create_app(TestingConfig)
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+    def tearDown(self):
+        """Tear down the test environment."""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_hash_and_verify(self):
+        stored = passwords.hash('password123')
+        self.assertTrue(stored.startswith('pbkdf2:sha256:1000$'))
+        self.assertTrue(passwords.verify(stored, 'password123'))
+        self.assertFalse(passwords.verify(stored, 'wrong'))
+        self.assertFalse(passwords.verify('garbage', 'password123'))
+
+    def test_every_backend_verifies(self):
+        for name, backend in available_backends().items():
+            params = {'pbkdf2': {'iterations': 1000}, 'scrypt': {'n': 1024, 'r': 8, 'p': 1},
+                      'argon2id': {'time_cost': 1, 'memory_cost': 8, 'parallelism': 1}}[name]
+            stored = backend.hash('secret', params)
+            self.assertTrue(passwords.verify(stored, 'secret'), name)
+            self.assertEqual(backend.params(stored), params)
+
+    def test_needs_rehash(self):
+        self.assertFalse(passwords.needs_rehash(passwords.hash('x')))
+        self.assertTrue(passwords.needs_rehash(Pbkdf2Backend().hash('x', {'iterations': 500})))
+        self.assertFalse(passwords.needs_rehash(Pbkdf2Backend().hash('x', {'iterations': 2000})))
+        self.assertTrue(passwords.needs_rehash(ScryptBackend().hash('x', {'n': 1024, 'r': 8, 'p': 1})))
+
+    def test_check_password_upgrades_outdated_hash(self):
+        user = User(username='old', email='old@example.com',
+                    password_hash=ScryptBackend().hash('password123', {'n': 1024, 'r': 8, 'p': 1}))
+        self.assertTrue(user.check_password('password123'))
+        self.assertTrue(user.password_hash.startswith('pbkdf2:'))
+        self.assertFalse(user.check_password('wrong'))
+        self.assertEqual(passwords.stats()['rehashes'], 1)
+
+    def test_calibrate_never_goes_below_minimum(self):
+        backend = Pbkdf2Backend()
+        params, _ = calibrate(backend, 0.001, minimum={'iterations': 1000})
+        self.assertGreaterEqual(params['iterations'], 1000)
+
+    def test_saturated_pool_rejects(self):
+        state = self.app.extensions['passwords']
+        stored = passwords.hash('x')
+        held = 0
+        while state['slots'].acquire(blocking=False):
+            held += 1
+        try:
+            with self.assertRaises(PasswordHasherBusy):
+                passwords.verify(stored, 'x')
+        finally:
+            for _ in range(held):
+                state['slots'].release()
+        self.assertTrue(passwords.verify(stored, 'x'))
+
+    def test_login_sets_session(self):
+        user = User(username='testuser', email='test@example.com')
+        user.set_password('password123')
+        db.session.add(user)
+        db.session.commit()
+
+        response = self.client.post('/auth/login', data={'email': 'Test@Example.com', 'password': 'wrong'})
+        self.assertIn(b'Invalid email or password.', response.data)
+        response = self.client.post('/auth/login', data={'email': 'nobody@example.com', 'password': 'x'})
+        self.assertIn(b'Invalid email or password.', response.data)
+
+        response = self.client.post('/auth/login', data={'email': 'Test@Example.com', 'password': 'password123'})
+        self.assertEqual(response.status_code, 302)
+        with self.client.session_transaction() as session:
+            self.assertEqual(session['user_id'], user.id)
+
+
+if __name__ == '__main__':
+    unittest.main()
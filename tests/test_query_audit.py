@@ -0,0 +1,83 @@
+# tests/test_query_audit.py
+
+import unittest
+from app import create_app, db
+from app.config import TestingConfig
+from app.models import User
+from app.query_audit import assert_max_queries, audit_queries, statement_shape
+
+
+class QueryAuditTests(unittest.TestCase):
+
+    def setUp(self):
+        """Set up the test environment."""
+        self.app = create_app(TestingConfig)
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        for i in range(6):
+            db.session.add(User(username=f'user{i}', email=f'user{i}@example.com', password_hash='x'))
+        db.session.commit()
+        self.ids = [user.id for user in User.query.all()]
+        db.session.expunge_all()
+
+    def tearDown(self):
+        """Tear down the test environment."""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_statement_shape(self):
+        self.assertEqual(statement_shape("SELECT * FROM user WHERE id = 5 AND name = 'bob'"),
+                         'SELECT * FROM user WHERE id = ? AND name = ?')
+        self.assertEqual(statement_shape('SELECT * FROM user WHERE id IN (?, ?,\n ?)'),
+                         'SELECT * FROM user WHERE id IN (?)')
+        self.assertEqual(statement_shape('SELECT anon_1.id FROM anon_1'), 'SELECT anon_1.id FROM anon_1')
+
+    def test_assert_max_queries(self):
+        with assert_max_queries(1):
+            User.query.all()
+        with self.assertRaisesRegex(AssertionError, 'at most 1 queries'):
+            with assert_max_queries(1):
+                User.query.all()
+                User.query.count()
+
+    def test_detects_n_plus_one(self):
+        with self.assertRaisesRegex(AssertionError, 'Likely N\\+1 query \\(6x\\)'):
+            with assert_max_queries(10):
+                for user_id in self.ids:
+                    db.session.get(User, user_id)
+
+    def test_slow_queries_capture_explain(self):
+        with audit_queries(slow_ms=0) as audit:
+            User.query.filter_by(username='user1').all()
+        slow = audit.report()['slow']
+        self.assertEqual(len(slow), 1)
+        self.assertTrue(any('user' in line for line in slow[0]['explain']['plan']))
+        self.assertTrue(slow[0]['explain']['opcodes'])
+
+    def test_listeners_removed_after_block(self):
+        with audit_queries() as audit:
+            pass
+        User.query.all()
+        self.assertEqual(len(audit), 0)
+
+    def test_request_report_and_toolbar(self):
+        config = type('AuditConfig', (TestingConfig,), {'QUERY_AUDIT_ENABLED': True})
+        app = create_app(config)
+        client = app.test_client()
+        with app.app_context():
+            db.create_all()
+        client.post('/auth/login', data={'email': 'nobody@example.com', 'password': 'password123'})
+        response = client.get('/about')
+        self.assertEqual(response.headers['X-Query-Count'], '0')
+        self.assertIn(b'0 queries', response.data)
+        reports = client.get('/_queries').get_json()
+        self.assertEqual(reports[0]['endpoint'], 'main.about')
+        self.assertGreaterEqual(reports[1]['count'], 1)
+        self.assertEqual(reports[1]['endpoint'], 'auth.login')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+# tests/test_ratelimit.py
+
+import os
+import shutil
+import tempfile
+import unittest
+from sqlalchemy import event
+from app import create_app, db
+from app.config import TestingConfig
+from app.ratelimit import (FileSystemRateLimitBackend, Limit, MemoryRateLimitBackend, SlidingWindowLog,
+                           SQLiteRateLimitBackend, TokenBucket)
+
+
+class TestConfig(TestingConfig):
+    RATELIMIT_LIMITS = {
+        'auth.login': ('ip 3/minute', 'account 2/minute token-bucket'),
+        'auth.check_availability': ('ip 2/minute',),
+    }
+
+
+class AlgorithmTests(unittest.TestCase):
+
+    def run_hits(self, algorithm, times):
+        state, results = None, []
+        for now in times:
+            state, allowed, retry_after = algorithm.hit(state, now)
+            results.append((allowed, round(retry_after, 3)))
+        return results
+
+    def test_sliding_window_log(self):
+        results = self.run_hits(SlidingWindowLog(2, 10), [0, 1, 2, 10.5, 11.5])
+        self.assertEqual(results, [(True, 0), (True, 0), (False, 8), (True, 0), (True, 0)])
+
+    def test_token_bucket_refills(self):
+        results = self.run_hits(TokenBucket(2, 10), [0, 0, 0, 5, 5])
+        self.assertEqual(results, [(True, 0), (True, 0), (False, 5), (True, 0), (False, 5)])
+
+    def test_parse_limits(self):
+        limit = Limit('account 10/15minutes token-bucket')
+        self.assertEqual((limit.scope, limit.period), ('account', 900))
+        self.assertIsInstance(limit.algorithm, TokenBucket)
+        self.assertIsInstance(Limit('ip 5/hour').algorithm, SlidingWindowLog)
+        for spec in ('ip', 'everyone 1/minute', 'ip many/minute', 'ip 1/minute leaky'):
+            with self.assertRaises(ValueError):
+                Limit(spec)
+
+
+class BackendTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_backends_agree(self):
+        backends = [
+            MemoryRateLimitBackend(shards=4),
+            SQLiteRateLimitBackend(os.path.join(self.tmpdir, 'ratelimit.db')),
+            FileSystemRateLimitBackend(os.path.join(self.tmpdir, 'ratelimit')),
+        ]
+        for backend in backends:
+            for spec in ('ip 2/minute', 'ip 2/minute token-bucket'):
+                with self.subTest(backend=type(backend).__name__, spec=spec):
+                    algorithm = Limit(spec).algorithm
+                    allowed = [backend.hit(spec, algorithm, 1000 + i)[0] for i in range(3)]
+                    self.assertEqual(allowed, [True, True, False])
+                    self.assertTrue(backend.hit(spec, algorithm, 1000 + 120)[0])
+
+    def test_sweep_keeps_live_keys(self):
+        """Test that a full shard drops expired keys but not live lockouts."""
+        backend = MemoryRateLimitBackend(shards=1, max_keys=100)
+        short, long = SlidingWindowLog(1, 10), SlidingWindowLog(1, 60)
+        for i in range(50):
+            backend.hit(f'old{i}', short, 0)
+        for i in range(50):
+            backend.hit(f'live{i}', long, 0)
+        backend.hit('new', long, 20)
+        self.assertEqual([backend.hit(f'live{i}', long, 21)[0] for i in range(50)], [False] * 50)
+
+    def test_sqlite_state_is_shared(self):
+        path = os.path.join(self.tmpdir, 'ratelimit.db')
+        first, second = SQLiteRateLimitBackend(path), SQLiteRateLimitBackend(path)
+        algorithm = Limit('ip 1/minute').algorithm
+        self.assertTrue(first.hit('key', algorithm, 1000)[0])
+        self.assertFalse(second.hit('key', algorithm, 1001)[0])
+
+
+class RateLimiterTests(unittest.TestCase):
+
+    def setUp(self):
+        """Set up the test environment."""
+        self.app = create_app(TestConfig)
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+    def tearDown(self):
+        """Tear down the test environment."""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def login(self, email):
+        return self.client.post('/auth/login', data={'email': email, 'password': 'wrong'})
+
+    def test_rejections_carry_retry_after_and_skip_the_database(self):
+        self.login('a@example.com')
+        self.login('b@example.com')
+        self.login('c@example.com')
+        statements = []
+        event.listen(db.engine, 'before_cursor_execute',
+                     lambda conn, cursor, statement, *args: statements.append(statement))
+        response = self.login('d@example.com')
+        self.assertEqual(response.status_code, 429)
+        self.assertGreaterEqual(int(response.headers['Retry-After']), 1)
+        self.assertEqual(statements, [])
+
+    def test_account_limit_is_per_account(self):
+        self.assertNotEqual(self.login('victim@example.com').status_code, 429)
+        self.assertNotEqual(self.login('VICTIM@example.com').status_code, 429)
+        self.assertEqual(self.login('victim@example.com').status_code, 429)
+
+    def test_only_posts_are_counted(self):
+        for _ in range(5):
+            self.assertEqual(self.client.get('/auth/login').status_code, 200)
+        self.assertNotEqual(self.login('a@example.com').status_code, 429)
+
+    def test_endpoint_methods_throttle_availability_gets(self):
+        for email in ('a@example.com', 'b@example.com'):
+            self.assertEqual(self.client.get(f'/auth/check-availability?email={email}').status_code, 200)
+        self.assertEqual(self.client.get('/auth/check-availability?email=c@example.com').status_code, 429)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+# tests/test_replicas.py
+
+import os
+import shutil
+import tempfile
+import unittest
+from sqlalchemy import func, select
+from app import create_app, db
+from app.config import TestingConfig
+from app.extensions import replicas
+from app.models import User
+
+
+class ReplicaRoutingTests(unittest.TestCase):
+
+    def setUp(self):
+        """Set up a primary and a replica SQLite file with different rows."""
+        self.tmpdir = tempfile.mkdtemp()
+        primary = os.path.join(self.tmpdir, 'primary.db')
+        replica = os.path.join(self.tmpdir, 'replica.db')
+        config = type('ReplicaConfig', (TestingConfig,), {
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{primary}',
+            'DATABASE_REPLICA_URIS': (f'sqlite:///{replica}',),
+            'AVAILABILITY_FILTER_ENABLED': False,
+        })
+        self.app = create_app(config)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        db.metadata.create_all(replicas.engines()['replica0'])
+        db.session.add(User(username='primary', email='primary@example.com', password_hash='x'))
+        db.session.commit()
+        db.session.remove()
+
+    def tearDown(self):
+        """Tear down the test environment."""
+        db.session.remove()
+        for engine in [*db.engines.values(), *replicas.engines().values()]:
+            engine.dispose()
+        self.app_context.pop()
+        self.app.extensions['replicas']['lag'].clear()
+        replicas._lag_probe = None
+        shutil.rmtree(self.tmpdir)
+
+    def user_count(self):
+        return db.session.scalar(select(func.count(User.id)))
+
+    def test_get_requests_read_from_the_replica(self):
+        with self.app.test_request_context('/', method='GET'):
+            self.assertEqual(self.user_count(), 0)
+            db.session.remove()
+        self.assertEqual(replicas.stats()['replica_reads'], 1)
+
+    def test_post_requests_and_non_request_code_use_the_primary(self):
+        self.assertEqual(self.user_count(), 1)
+        db.session.remove()
+        with self.app.test_request_context('/', method='POST'):
+            self.assertEqual(self.user_count(), 1)
+            db.session.remove()
+
+    def test_writes_pin_the_request_to_the_primary(self):
+        with self.app.test_request_context('/', method='GET'):
+            db.session.add(User(username='new', email='new@example.com', password_hash='x'))
+            db.session.flush()
+            self.assertEqual(self.user_count(), 2)
+            db.session.rollback()
+            db.session.remove()
+
+    def test_recent_writes_pin_the_client(self):
+        with self.app.test_request_context('/', method='POST') as ctx:
+            db.session.add(User(username='new', email='new@example.com', password_hash='x'))
+            db.session.commit()
+            db.session.remove()
+            pinned_until = ctx.session['_db_primary_until']
+        with self.app.test_request_context('/', method='GET') as ctx:
+            ctx.session['_db_primary_until'] = pinned_until
+            self.assertEqual(self.user_count(), 2)
+            db.session.remove()
+
+    def test_use_primary_decorator(self):
+        view = replicas.use_primary(self.user_count)
+        with self.app.test_request_context('/', method='GET'):
+            self.assertEqual(view(), 1)
+            db.session.remove()
+
+    def test_lagging_replica_is_skipped(self):
+        replicas.lag_probe(lambda connection: 60.0)
+        with self.app.test_request_context('/', method='GET'):
+            self.assertEqual(self.user_count(), 1)
+            db.session.remove()
+        self.assertEqual(replicas.stats()['lag'], {'replica0': 60.0})
+
+
+if __name__ == '__main__':
+    unittest.main()
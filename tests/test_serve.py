@@ -0,0 +1,32 @@
+# tests/test_serve.py
+
+import importlib.util
+import unittest
+from app.serve import auto_size, dispose_engines, gunicorn_application, load_app, warm_database
+
+
+class ServeTests(unittest.TestCase):
+
+    def test_auto_size(self):
+        self.assertEqual(auto_size(1), (2, 4))
+        self.assertEqual(auto_size(8), (8, 4))
+
+    def test_load_app_warms_templates(self):
+        app = load_app('testing')
+        self.assertTrue(any(name == 'base.html' for _, name in app.jinja_env.cache))
+        warm_database(app)
+        dispose_engines(app)
+
+    @unittest.skipUnless(importlib.util.find_spec('gunicorn'), 'gunicorn is not installed')
+    def test_gunicorn_options(self):
+        server = gunicorn_application('testing', {'bind': '127.0.0.1:0', 'workers': 3, 'threads': 2,
+                                                  'preload_app': True, 'max_requests': 500})
+        self.assertEqual(server.cfg.workers, 3)
+        self.assertEqual(server.cfg.threads, 2)
+        self.assertTrue(server.cfg.preload_app)
+        self.assertEqual(server.cfg.max_requests, 500)
+        self.assertIsNotNone(server.cfg.post_worker_init)
+
+
+if __name__ == '__main__':
+    unittest.main()
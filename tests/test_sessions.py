@@ -0,0 +1,179 @@
+# tests/test_sessions.py
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from datetime import datetime
+from flask import session
+from markupsafe import Markup
+from app import create_app
+from app.config import TestingConfig
+from app.extensions import sessions
+from app.sessions import (FileSystemSessionStore, MemorySessionStore, SQLiteSessionStore, decode_session,
+                          encode_session)
+
+
+class TestConfig(TestingConfig):
+    SESSION_BACKEND = 'memory'
+    SESSION_TOUCH_INTERVAL = 0
+    SESSION_TOUCH_BATCH = 2
+
+
+class EncodingTests(unittest.TestCase):
+
+    def test_round_trip(self):
+        """Test that every supported type survives encoding."""
+        data = {
+            'user_id': 42, 'negative': -7, 'big': 2 ** 70, 'ratio': 0.5, '_permanent': True,
+            'missing': None, 'raw': b'\x00\xff', 'when': datetime(2024, 5, 1, 12, 30),
+            '_flashes': [('error', 'Invalid email or password.')], 'html': Markup('<b>hi</b>'),
+            'nested': {'a': [1, 2, {'b': False}]},
+        }
+        decoded = decode_session(encode_session(data))
+        self.assertEqual(decoded, data)
+        self.assertIsInstance(decoded['_flashes'][0], tuple)
+        self.assertIsInstance(decoded['html'], Markup)
+
+    def test_compact(self):
+        """Test that a typical logged-in session encodes to under 100 bytes."""
+        data = {'user_id': 12345, '_permanent': True, 'csrf_token': 'f' * 40}
+        self.assertLess(len(encode_session(data)), 100)
+
+    def test_rejects_corrupt_data_and_unknown_types(self):
+        payload = encode_session({'user_id': 1})
+        for bad in (payload[:-1], b'\x09' + payload[1:], b''):
+            with self.assertRaises(ValueError):
+                decode_session(bad)
+        with self.assertRaises(TypeError):
+            encode_session({'value': object()})
+
+
+class SessionStoreTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def stores(self):
+        return [
+            MemorySessionStore(),
+            SQLiteSessionStore(os.path.join(self.tmpdir, 'sessions.db')),
+            FileSystemSessionStore(os.path.join(self.tmpdir, 'sessions')),
+        ]
+
+    def test_save_load_touch_delete(self):
+        for store in self.stores():
+            with self.subTest(store=type(store).__name__):
+                now = time.time()
+                store.save('live', b'data', now + 60)
+                self.assertEqual(store.load('live')[0], b'data')
+                store.touch_many([('live', now + 120), ('gone', now + 120)])
+                self.assertAlmostEqual(store.load('live')[1], now + 120, places=2)
+                store.delete('live')
+                self.assertIsNone(store.load('live'))
+
+    def test_purge_expired(self):
+        for store in self.stores():
+            with self.subTest(store=type(store).__name__):
+                now = time.time()
+                store.save('old1', b'x', now - 10)
+                store.save('old2', b'x', now - 10)
+                store.save('live', b'x', now + 60)
+                self.assertIsNone(store.load('old1'))
+                self.assertEqual(store.purge_expired(), 2)
+                self.assertIsNotNone(store.load('live'))
+
+    def test_memory_store_evicts_least_recently_used(self):
+        store = MemorySessionStore(max_entries=2)
+        expires = time.time() + 60
+        store.save('a', b'1', expires)
+        store.save('b', b'2', expires)
+        store.load('a')
+        store.save('c', b'3', expires)
+        self.assertIsNotNone(store.load('a'))
+        self.assertIsNone(store.load('b'))
+
+
+class ServerSideSessionTests(unittest.TestCase):
+
+    def setUp(self):
+        self.app = create_app(TestConfig)
+
+        @self.app.route('/_test/set/<value>')
+        def set_value(value):
+            session['value'] = value
+            return 'ok'
+
+        @self.app.route('/_test/get')
+        def get_value():
+            return session.get('value', '')
+
+        @self.app.route('/_test/clear')
+        def clear():
+            session.clear()
+            session['value'] = 'fresh'
+            return 'ok'
+
+        self.client = self.app.test_client()
+
+    def session_cookie(self):
+        cookie = self.client.get_cookie(self.app.config['SESSION_COOKIE_NAME'])
+        return cookie.value if cookie else None
+
+    def stats(self):
+        with self.app.app_context():
+            return sessions.stats()
+
+    def test_cookie_carries_only_the_id(self):
+        self.client.get('/_test/set/hello')
+        sid = self.session_cookie()
+        self.assertEqual(len(sid), 43)
+        self.assertEqual(self.client.get('/_test/get').text, 'hello')
+
+    def test_anonymous_requests_get_no_cookie(self):
+        response = self.client.get('/_test/get')
+        self.assertNotIn('Set-Cookie', response.headers)
+        self.assertEqual(self.stats()['saves'], 0)
+
+    def test_unmodified_sessions_are_not_rewritten(self):
+        self.client.get('/_test/set/hello')
+        self.client.get('/_test/get')
+        self.client.get('/_test/get')
+        self.assertEqual(self.stats()['saves'], 1)
+
+    def test_expiry_slides_in_batches(self):
+        other = self.app.test_client()
+        self.client.get('/_test/set/hello')
+        other.get('/_test/set/there')
+        store = self.app.extensions['sessions']['store']
+        sid = self.session_cookie()
+        first_expiry = store.load(sid)[1]
+        time.sleep(0.01)
+        self.client.get('/_test/get')
+        self.assertEqual(self.stats()['pending'], 1)
+        self.assertEqual(store.load(sid)[1], first_expiry)
+        other.get('/_test/get')
+        stats = self.stats()
+        self.assertEqual((stats['pending'], stats['touches']), (0, 2))
+        self.assertGreater(store.load(sid)[1], first_expiry)
+
+    def test_clear_rotates_the_session_id(self):
+        self.client.get('/_test/set/hello')
+        old_sid = self.session_cookie()
+        self.client.get('/_test/clear')
+        self.assertNotEqual(self.session_cookie(), old_sid)
+        self.assertIsNone(self.app.extensions['sessions']['store'].load(old_sid))
+        self.assertEqual(self.client.get('/_test/get').text, 'fresh')
+
+    def test_unknown_ids_start_a_new_session(self):
+        self.client.set_cookie(self.app.config['SESSION_COOKIE_NAME'], 'x' * 43)
+        self.assertEqual(self.client.get('/_test/get').text, '')
+        self.assertEqual(self.stats()['misses'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
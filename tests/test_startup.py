@@ -0,0 +1,38 @@
+# tests/test_startup.py
+
+import unittest
+from app import create_app
+from app.config import TestingConfig
+from app.startup import measure_startup, package_totals, parse_importtime
+
+IMPORTTIME_OUTPUT = '''import time: self [us] | cumulative | imported package
+import time:       120 |        120 |   _io
+import time:       300 |        420 | app.config
+import time:      1000 |       1500 |     flask.app
+import time:       500 |       2000 |   flask
+some other stderr line
+'''
+
+
+class StartupTests(unittest.TestCase):
+
+    def test_parse_importtime(self):
+        imports = parse_importtime(IMPORTTIME_OUTPUT)
+        self.assertEqual([entry['module'] for entry in imports], ['_io', 'app.config', 'flask.app', 'flask'])
+        self.assertEqual(imports[2], {'module': 'flask.app', 'self_us': 1000, 'cumulative_us': 1500, 'depth': 2})
+        self.assertEqual(package_totals(imports), [('flask', 1500), ('app', 300), ('_io', 120)])
+
+    def test_heavy_dependencies_load_lazily(self):
+        report = measure_startup('testing', importtime=False)
+        for module in ('PIL', 'smtplib', 'fontTools'):
+            self.assertNotIn(module, report['modules'])
+
+    def test_availability_filter_loads_on_first_use(self):
+        app = create_app(TestingConfig)
+        state = app.extensions['availability_filter']
+        self.assertFalse(state.ready)
+        self.assertFalse(state.load_attempted)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+# tests/test_templating.py
+
+import os
+import shutil
+import tempfile
+import unittest
+from jinja2 import ChoiceLoader, DictLoader
+from app import create_app
+from app.config import Config
+from app.templating import list_app_templates, render_template_streamed
+
+
+class TestConfig(Config):
+    TESTING = True
+    DEBUG = False
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+
+
+class TemplateCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def test_blueprint_templates_are_listed(self):
+        """Test that app and blueprint templates are all discovered."""
+        templates = list_app_templates(create_app(TestConfig))
+        for name in ('base.html', 'errors/404.html', 'core/index.html', 'auth/login.html'):
+            self.assertIn(name, templates)
+
+    def test_auto_reload_is_off_outside_debug(self):
+        """Test that production apps never re-stat loaded templates."""
+        app = create_app(TestConfig)
+        self.assertFalse(app.jinja_env.auto_reload)
+
+    def test_compile_command_fills_bytecode_cache(self):
+        """Test that 'flask templates compile' writes one cache file per template."""
+        app = create_app(TestConfig)
+        result = app.test_cli_runner().invoke(args=['templates', 'compile', '--directory', self.cache_dir])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertEqual(len(os.listdir(self.cache_dir)), len(list_app_templates(app)))
+
+    def test_startup_warms_from_bytecode_cache(self):
+        """Test that warming at startup loads every template into memory."""
+        config = type('WarmConfig', (TestConfig,), {
+            'TEMPLATE_BYTECODE_CACHE_DIR': self.cache_dir,
+            'TEMPLATE_WARM_ON_STARTUP': True,
+        })
+        app = create_app(config)
+        self.assertEqual(len(app.jinja_env.cache), len(list_app_templates(app)))
+        self.assertTrue(os.listdir(self.cache_dir))
+
+
+class StreamingRenderTests(unittest.TestCase):
+
+    def setUp(self):
+        """Register a view rendering a large synthetic page."""
+        config = type('StreamConfig', (TestConfig,), {'STREAM_TEMPLATES': True, 'STREAM_CHUNK_SIZE': 1024})
+        self.app = create_app(config)
+        self.app.jinja_loader = ChoiceLoader([
+            DictLoader({
+                'layout.html': '<html><head></head><body><header><nav></nav></header>'
+                               '<main>{% block content %}{% endblock %}</main></body></html>',
+                'big.html': '{% extends "layout.html" %}{% block content %}'
+                            '{% for i in rows %}<tr><td>{{ i }}</td></tr>{% endfor %}{% endblock %}',
+            }),
+            self.app.jinja_loader,
+        ])
+        self.app.add_url_rule('/big', 'main.big', lambda: render_template_streamed(
+            'big.html', etag='v1', rows=range(1000)))
+        self.client = self.app.test_client()
+
+    def test_head_is_flushed_before_content(self):
+        """Test that the layout head arrives as its own first chunk."""
+        response = self.client.get('/big', buffered=False)
+        self.assertTrue(response.is_streamed)
+        chunks = [chunk.decode() for chunk in response.response]
+        self.assertIn('</header>', chunks[0])
+        self.assertNotIn('<tr>', chunks[0])
+        self.assertGreater(len(chunks), 3)
+        self.assertEqual(''.join(chunks).count('<tr>'), 1000)
+
+    def test_matching_etag_returns_304(self):
+        """Test that a matching If-None-Match skips rendering."""
+        response = self.client.get('/big', headers={'If-None-Match': '"v1"'})
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get('/big')
+        self.assertEqual(response.get_etag(), ('v1', False))
+
+    def test_buffered_when_streaming_is_off(self):
+        """Test that the same view renders normally with streaming disabled."""
+        self.app.config['STREAM_TEMPLATES'] = False
+        response = self.client.get('/big')
+        self.assertIsNotNone(response.content_length)
+        self.assertEqual(response.data.count(b'<tr>'), 1000)
+
+
+if __name__ == '__main__':
+    unittest.main()
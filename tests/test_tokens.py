@@ -0,0 +1,122 @@
+# tests/test_tokens.py
+
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timedelta, timezone
+from flask_migrate import upgrade
+from sqlalchemy import text
+from app import create_app, db
+from app.auth.commands import prune_reset_requests
+from app.auth.tokens import _serializer, generate_reset_token, revoke_reset_token, verify_reset_token
+from app.config import TestingConfig
+from app.models import PasswordResetRequest, User
+
+
+class ResetTokenTests(unittest.TestCase):
+
+    def setUp(self):
+        """Set up the test environment."""
+        self.app = create_app(TestingConfig)
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.user = User(username='testuser', email='test@example.com')
+        self.user.set_password('password123')
+        db.session.add(self.user)
+        db.session.commit()
+
+    def tearDown(self):
+        """Tear down the test environment."""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_round_trip(self):
+        token = generate_reset_token(self.user)
+        self.assertIsInstance(token, str)
+        self.assertEqual(verify_reset_token(token), self.user)
+
+    def test_serializer_is_cached(self):
+        self.assertIs(_serializer('key'), _serializer('key'))
+        self.assertIsNot(_serializer('key'), _serializer('other'))
+
+    def test_invalid_tokens(self):
+        token = generate_reset_token(self.user)
+        self.assertIsNone(verify_reset_token(token + 'x'))
+        self.assertIsNone(verify_reset_token('garbage'))
+        self.app.config['SECRET_KEY'] = 'rotated'
+        self.assertIsNone(verify_reset_token(token))
+
+    def test_password_change_invalidates_token(self):
+        token = generate_reset_token(self.user)
+        self.user.set_password('new-password')
+        db.session.commit()
+        self.assertIsNone(verify_reset_token(token))
+
+    def test_revoked_token(self):
+        token = generate_reset_token(self.user)
+        revoke_reset_token(token)
+        self.assertIsNone(verify_reset_token(token))
+
+    def test_reset_password_view(self):
+        token = generate_reset_token(self.user)
+        response = self.client.post(f'/auth/reset_password/{token}', data={
+            'password': 'brand-new-pass', 'confirm_password': 'brand-new-pass'})
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(db.session.get(User, self.user.id).check_password('brand-new-pass'))
+        response = self.client.get(f'/auth/reset_password/{token}')
+        self.assertEqual(response.status_code, 302)
+
+    def test_prune_deletes_old_rows_in_batches(self):
+        now = datetime.now(timezone.utc)
+        for i in range(25):
+            db.session.add(PasswordResetRequest(user_id=self.user.id, token=f'old{i}',
+                                                timestamp=now - timedelta(hours=2)))
+        db.session.add(PasswordResetRequest(user_id=self.user.id, token='fresh', timestamp=now))
+        db.session.commit()
+        self.assertEqual(prune_reset_requests(timedelta(hours=1), batch_size=10), 25)
+        self.assertEqual([r.token for r in PasswordResetRequest.query.all()], ['fresh'])
+
+    def test_prune_command(self):
+        result = self.app.test_cli_runner().invoke(args=['auth', 'prune-resets', '--batch-size', '5'])
+        self.assertIn('Deleted 0 password reset requests', result.output)
+
+
+class PruneMigratedSchemaTests(unittest.TestCase):
+    # Runs against the schema the migrations build, not db.create_all().
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        config = type('MigratedConfig', (TestingConfig,), {
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(self.tmpdir, 'app.db')}",
+        })
+        self.app = create_app(config)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        upgrade(directory=os.path.join(os.path.dirname(__file__), os.pardir, 'migrations'))
+
+    def tearDown(self):
+        db.session.remove()
+        db.engine.dispose()
+        self.app_context.pop()
+        shutil.rmtree(self.tmpdir)
+
+    def test_prune_runs_on_upgraded_schema(self):
+        # The migrated user table has NOT NULL columns the model does not map.
+        user_id = db.session.execute(text(
+            'INSERT INTO "user" (username, email, password_hash, is_active, is_admin) '
+            "VALUES ('testuser', 'test@example.com', 'x', 1, 0)"
+        )).lastrowid
+        now = datetime.now(timezone.utc)
+        db.session.add(PasswordResetRequest(user_id=user_id, token='old', timestamp=now - timedelta(hours=2)))
+        db.session.add(PasswordResetRequest(user_id=user_id, token='fresh', timestamp=now))
+        db.session.commit()
+        self.assertEqual(prune_reset_requests(timedelta(hours=1)), 1)
+        self.assertEqual([r.token for r in PasswordResetRequest.query.all()], ['fresh'])
+
+
+if __name__ == '__main__':
+    unittest.main()
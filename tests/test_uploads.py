@@ -0,0 +1,90 @@
+# tests/test_uploads.py
+
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from PIL import Image
+from werkzeug.datastructures import FileStorage
+from app import create_app
+from app.config import TestingConfig
+from app.extensions import uploads
+from app.uploads import UploadRejected, picture_url
+
+
+def image_upload(size=(400, 300), fmt='JPEG', color=(200, 30, 30), filename='photo.jpg'):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, color).save(buffer, format=fmt)
+    buffer.seek(0)
+    return FileStorage(stream=buffer, filename=filename)
+
+
+class UploadPipelineTests(unittest.TestCase):
+
+    def setUp(self):
+        """Set up the test environment."""
+        self.tmpdir = tempfile.mkdtemp()
+        config = type('UploadTestConfig', (TestingConfig,), {
+            'UPLOAD_SPOOL_DIR': os.path.join(self.tmpdir, 'spool'),
+            'UPLOAD_WORKERS': 1,
+        })
+        self.app = create_app(config)
+        self.app.extensions['uploads']['output_dir'] = os.path.join(self.tmpdir, 'pics')
+        self.request_context = self.app.test_request_context()
+        self.request_context.push()
+
+    def tearDown(self):
+        """Tear down the test environment."""
+        executor = self.app.extensions['uploads']['executor']
+        if executor is not None:
+            executor.shutdown()
+        self.request_context.pop()
+        shutil.rmtree(self.tmpdir)
+
+    def test_save_returns_key_and_processes_all_sizes(self):
+        key = uploads.save_picture(image_upload())
+        uploads.wait(timeout=30)
+        output_dir = self.app.extensions['uploads']['output_dir']
+        for size in self.app.config['UPLOAD_PICTURE_SIZES']:
+            with Image.open(os.path.join(output_dir, f'{key}-{size}.jpg')) as image:
+                self.assertEqual(image.size, (size, size))
+            self.assertTrue(os.path.exists(os.path.join(output_dir, f'{key}-{size}.webp')))
+        self.assertEqual(os.listdir(self.app.config['UPLOAD_SPOOL_DIR']), [])
+        self.assertEqual(uploads.stats()['processed'], 1)
+
+    def test_picture_url_uses_placeholder_until_ready(self):
+        self.assertTrue(picture_url(None).endswith('avatar-placeholder.svg'))
+        self.assertTrue(picture_url('0' * 20).endswith('avatar-placeholder.svg'))
+        key = uploads.save_picture(image_upload())
+        uploads.wait(timeout=30)
+        self.assertTrue(picture_url(key, 256).endswith(f'{key}-256.webp'))
+
+    def test_identical_uploads_are_deduplicated(self):
+        first = uploads.save_picture(image_upload())
+        uploads.wait(timeout=30)
+        second = uploads.save_picture(image_upload(filename='copy.jpg'))
+        self.assertEqual(first, second)
+        self.assertEqual(uploads.stats()['deduplicated'], 1)
+        self.assertNotEqual(first, uploads.save_picture(image_upload(color=(0, 0, 255))))
+        uploads.wait(timeout=30)
+
+    def test_rejects_too_many_pixels_from_header(self):
+        self.app.config['UPLOAD_MAX_PIXELS'] = 100 * 100
+        with self.assertRaises(UploadRejected):
+            uploads.save_picture(image_upload(size=(200, 200), fmt='PNG', filename='big.png'))
+        self.assertIsNone(self.app.extensions['uploads']['executor'])
+
+    def test_rejects_oversized_and_invalid_files(self):
+        self.app.config['UPLOAD_MAX_BYTES'] = 1024
+        with self.assertRaises(UploadRejected):
+            uploads.save_picture(FileStorage(stream=io.BytesIO(os.urandom(4096)), filename='big.jpg'))
+        self.app.config['UPLOAD_MAX_BYTES'] = 1024 * 1024
+        with self.assertRaises(UploadRejected):
+            uploads.save_picture(FileStorage(stream=io.BytesIO(b'not an image'), filename='x.jpg'))
+        self.assertEqual(uploads.stats()['rejected'], 2)
+        self.assertEqual(os.listdir(self.app.config['UPLOAD_SPOOL_DIR']), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
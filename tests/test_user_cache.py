@@ -0,0 +1,85 @@
+# tests/test_user_cache.py
+
+import unittest
+from sqlalchemy import event
+from app import create_app, db
+from app.auth.user_cache import UserSnapshot, user_cache
+from app.config import TestingConfig
+from app.models import User
+
+
+class UserCacheTests(unittest.TestCase):
+    # No app context is kept pushed: each lookup runs in its own request
+    # context (and so its own ``g``), as real requests do.
+
+    def setUp(self):
+        """Set up the test environment."""
+        self.app = create_app(TestingConfig)
+        with self.app.app_context():
+            db.create_all()
+            user = User(username='testuser', email='test@example.com', password_hash='x')
+            db.session.add(user)
+            db.session.commit()
+            self.user_id = user.id
+            self.engine = db.engine
+
+    def tearDown(self):
+        """Tear down the test environment."""
+        with self.app.app_context():
+            db.drop_all()
+
+    def count_queries(self):
+        statements = []
+        event.listen(self.engine, 'before_cursor_execute',
+                     lambda conn, cursor, statement, *args: statements.append(statement))
+        return statements
+
+    def lookup(self, user_id):
+        with self.app.test_request_context():
+            return user_cache.get(user_id)
+
+    def stats(self):
+        with self.app.app_context():
+            return user_cache.stats()
+
+    def test_snapshot_has_no_instance_dict(self):
+        snapshot = self.lookup(self.user_id)
+        self.assertIsInstance(snapshot, UserSnapshot)
+        self.assertEqual((snapshot.username, snapshot.email), ('testuser', 'test@example.com'))
+        self.assertFalse(hasattr(snapshot, '__dict__'))
+
+    def test_one_query_per_request_and_none_after(self):
+        statements = self.count_queries()
+        with self.app.test_request_context():
+            user_cache.get(self.user_id)
+            user_cache.get(self.user_id)
+        self.lookup(self.user_id)
+        self.assertEqual(len(statements), 1)
+        stats = self.stats()
+        self.assertEqual((stats['misses'], stats['request_hits'], stats['hits']), (1, 1, 1))
+        self.assertAlmostEqual(stats['hit_rate'], 2 / 3)
+
+    def test_update_and_delete_invalidate(self):
+        self.lookup(self.user_id)
+        with self.app.app_context():
+            db.session.get(User, self.user_id).username = 'renamed'
+            db.session.commit()
+        self.assertEqual(self.lookup(self.user_id).username, 'renamed')
+
+        with self.app.app_context():
+            db.session.delete(db.session.get(User, self.user_id))
+            db.session.commit()
+        self.assertIsNone(self.lookup(self.user_id))
+
+    def test_current_user_uses_the_cache(self):
+        client = self.app.test_client()
+        with client.session_transaction() as session:
+            session['user_id'] = self.user_id
+        statements = self.count_queries()
+        self.assertIn(b'Logout', client.get('/about').data)
+        self.assertIn(b'Logout', client.get('/about').data)
+        self.assertEqual(len(statements), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
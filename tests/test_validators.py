@@ -0,0 +1,76 @@
+# tests/test_validators.py
+
+import unittest
+from sqlalchemy import event
+from app import create_app, db
+from app.auth.forms import RegistrationForm
+from app.auth.validators import check_availability
+from app.config import Config
+from app.models import User
+
+
+class TestConfig(Config):
+    TESTING = True
+    WTF_CSRF_ENABLED = False
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+
+
+class AvailabilityTests(unittest.TestCase):
+
+    def setUp(self):
+        """Set up the test environment."""
+        self.app = create_app(TestConfig)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        db.session.add(User(username='TestUser', email='Test@Example.com', password_hash='x'))
+        db.session.commit()
+
+    def tearDown(self):
+        """Tear down the test environment."""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def count_queries(self):
+        statements = []
+        event.listen(db.engine, 'before_cursor_execute',
+                     lambda conn, cursor, statement, *args: statements.append(statement))
+        return statements
+
+    def test_lookup_ignores_case(self):
+        """Test that availability checks are case-insensitive."""
+        self.assertEqual(check_availability(username='testuser', email=' TEST@example.COM '),
+                         {'username': True, 'email': True})
+        self.assertEqual(check_availability(username='other', email='other@example.com'),
+                         {'username': False, 'email': False})
+        self.assertEqual(check_availability(email='test@example.com'),
+                         {'username': False, 'email': True})
+
+    def test_registration_form_uses_one_query(self):
+        """Test that both uniqueness validators share a single round trip."""
+        statements = self.count_queries()
+        with self.app.test_request_context(method='POST', data={
+            'username': 'TESTUSER',
+            'email': 'test@example.com',
+            'password': 'password123',
+            'confirm_password': 'password123',
+        }):
+            form = RegistrationForm()
+            self.assertFalse(form.validate())
+
+        self.assertEqual(len(statements), 1)
+        self.assertIn('EXISTS', statements[0].upper())
+        self.assertIn('username', form.errors)
+        self.assertIn('email', form.errors)
+
+    def test_lookup_uses_expression_index(self):
+        """Test that SQLite plans the lookup as an index search."""
+        plan = db.session.execute(db.text(
+            "EXPLAIN QUERY PLAN SELECT 1 FROM user WHERE lower(username) = 'testuser'"
+        )).all()
+        self.assertIn('ix_user_username_lower', ' '.join(str(row[-1]) for row in plan))
+
+
+if __name__ == '__main__':
+    unittest.main()